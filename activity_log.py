@@ -0,0 +1,100 @@
+import itertools
+import time
+from collections import deque
+from datetime import datetime
+
+
+class ActivityLog:
+    """Log lines posted from any thread and handed to the GUI in batches
+
+    post() only appends to a bounded deque (atomic, no lock), so the audio
+    thread never waits on the GUI. The GUI thread drains it periodically:
+    a line repeating the previous one bumps a counter on that line instead
+    of adding a new one, new lines beyond max_per_second are summarized as
+    one "suppressed" line, and only the latest max_lines are retained.
+    """
+    def __init__(self, max_lines=500, max_pending=1000, max_per_second=20):
+        self.max_per_second = max_per_second
+        # (time, number, message) waiting for the GUI thread; the oldest are
+        # dropped if it falls behind
+        self.pending = deque(maxlen=max_pending)
+        # next() on a count is atomic, so posters in any thread can number lines
+        self.posted = itertools.count(1)
+        self.taken = 0
+        # Retained lines as [time, message, repeats], oldest first
+        self.lines = deque(maxlen=max_lines)
+        self.tokens = float(max_per_second)
+        self.refilled = time.monotonic()
+        # Lines rate limited or dropped since the last summary
+        self.suppressed = 0
+
+    def post(self, message):
+        """Queue a line; safe to call from any thread"""
+        self.pending.append((time.time(), next(self.posted), message))
+
+    def refill(self, now):
+        """Top up the rate limiter, holding at most one second worth of lines"""
+        self.tokens = min(self.max_per_second, self.tokens + (now - self.refilled) * self.max_per_second)
+        self.refilled = now
+
+    @staticmethod
+    def render(line):
+        """Text of a retained line, with its timestamp and repeat count"""
+        timestamp, message, repeats = line
+        text = f"[{datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')}] {message}"
+        return f"{text} (×{repeats})" if repeats > 1 else text
+
+    def retain(self, timestamp, message, added):
+        """Keep a new line, preceded by the summary of what was suppressed before it"""
+        if self.suppressed:
+            self.lines.append([timestamp, f"… {self.suppressed} mensagens suprimidas", 1])
+            added.append(self.lines[-1])
+            self.suppressed = 0
+        if message is not None:
+            self.lines.append([timestamp, message, 1])
+            added.append(self.lines[-1])
+
+    def drain(self):
+        """Take the queued lines; returns (new text of the last shown line or None, new lines)
+
+        The first item is set when lines repeating the last retained one
+        only bumped its counter. Call from the GUI thread only.
+        """
+        updated = False
+        added = []
+        self.refill(time.monotonic())
+        timestamp = time.time()
+        while self.pending:
+            timestamp, number, message = self.pending.popleft()
+            # Numbers skipped since the last line taken were dropped by the
+            # bounded deque (posters racing each other can arrive out of order)
+            self.suppressed += max(0, number - self.taken - 1)
+            self.taken = max(self.taken, number)
+
+            last = self.lines[-1] if self.lines else None
+            if last is not None and last[1] == message:
+                last[0] = timestamp
+                last[2] += 1
+                updated = updated or not added
+                continue
+            if self.tokens < 1:
+                self.suppressed += 1
+                continue
+            self.tokens -= 1
+            self.retain(timestamp, message, added)
+
+        # Once the flood is over, say how much of it was left out
+        if self.suppressed and self.tokens >= 1:
+            self.tokens -= 1
+            self.retain(timestamp, None, added)
+
+        # Lines added and evicted again in the same batch are never shown
+        added = added[-self.lines.maxlen:]
+        new_last = None
+        if updated and len(added) < len(self.lines):
+            new_last = self.render(self.lines[-len(added) - 1])
+        return new_last, [self.render(line) for line in added]
+
+    def clear(self):
+        """Forget the retained lines"""
+        self.lines.clear()
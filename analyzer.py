@@ -0,0 +1,148 @@
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Band edges in Hz for the energy summary of every analysis frame
+ANALYSIS_BANDS = (0.0, 500.0, 2000.0, 6000.0)
+
+
+class OverloadDetector:
+    """Streaming detector of sudden loudness spikes and sustained high tones
+
+    Audio is analyzed with an incremental STFT: samples are appended to a
+    short history and every complete frame (frame_size samples, one every
+    hop) is transformed, all frames of a chunk in one batched rfft. Band
+    energies come from one product of the power spectra with a band matrix.
+
+    A frame louder than the slow loudness baseline by spike_db is a spike;
+    a tonal peak above tone_min_hz standing tone_db over the median of its
+    region for tone_seconds is a sustained tone. Either drives the target
+    protection to 1, and the protection level follows it with a fast
+    attack and a slow release, one step per chunk.
+    """
+    def __init__(self, sample_rate=44100, frame_size=1024, hop=512, spike_db=12.0,
+                 tone_db=20.0, tone_min_hz=2000.0, tone_seconds=0.5, floor_db=-50.0,
+                 attack_ms=20.0, release_ms=1500.0, baseline_seconds=2.0):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.hop = hop
+        self.spike_db = spike_db
+        self.tone_frames_needed = max(1, int(round(tone_seconds * sample_rate / hop)))
+        self.floor_db = floor_db
+        # Tone thresholds as power ratios, so frames are classified without logs
+        self.tone_ratio = 10 ** (tone_db / 10)
+        self.attack_ms = attack_ms
+        self.release_ms = release_ms
+        # Per-frame smoothing of the loudness baseline
+        self.baseline_coeff = math.exp(-hop / (baseline_seconds * sample_rate))
+
+        self.window = np.hanning(frame_size).astype(np.float32)
+        # Power of a full-scale-RMS signal summed over the one-sided spectrum
+        self.full_scale_power = 0.5 * frame_size * float(np.sum(self.window ** 2)) * 32768.0 ** 2
+        self.floor_power = self.full_scale_power * 10 ** (floor_db / 10)
+
+        freqs = np.fft.rfftfreq(frame_size, 1.0 / sample_rate)
+        edges = list(ANALYSIS_BANDS) + [sample_rate / 2 + 1]
+        self.band_matrix = np.stack(
+            [(freqs >= low) & (freqs < high) for low, high in zip(edges[:-1], edges[1:])], axis=1
+        ).astype(np.float32)
+        self.tone_start = int(np.searchsorted(freqs, tone_min_hz))
+        self.tone_median = (len(freqs) - self.tone_start) // 2
+        self.freqs = freqs
+
+        # Samples not yet consumed by a frame, followed by room for one chunk
+        self.samples = np.zeros(frame_size, dtype=np.float32)
+        self.filled = 0
+        self.resize(0)
+        self.reset()
+
+    def resize(self, frames):
+        """Make room for chunks of a given length, keeping the pending samples"""
+        pending = self.samples[:self.filled].copy()
+        self.samples = np.zeros(self.frame_size + frames, dtype=np.float32)
+        self.samples[:self.filled] = pending
+        # Every frame that can start in the buffer; a chunk uses the first few
+        self.frame_view = sliding_window_view(self.samples, self.frame_size)[::self.hop]
+
+    def reset(self):
+        """Forget the analysis history and drop the protection to zero"""
+        self.filled = 0
+        self.baseline_db = None
+        self.tone_run = 0
+        self.target = 0.0
+        self.protection = 0.0
+        self.previous_protection = 0.0
+        self.band_power = np.zeros(len(ANALYSIS_BANDS))
+        self.level_db = -120.0
+        self.tone_hz = 0.0
+        self.reason = None  # 'spike', 'tone' or None
+
+    @property
+    def band_db(self):
+        """Energy of each analysis band in the latest frame, in dB relative to full scale"""
+        return 10 * np.log10(np.maximum(self.band_power, 1e-12) / self.full_scale_power)
+
+    def analyze(self, block):
+        """Analyze a (channels, n) block at int16 scale and update the protection level"""
+        frames = block.shape[1]
+        if frames + self.frame_size > len(self.samples):
+            self.resize(frames)
+
+        # Append the channel average to the history
+        total = self.filled + frames
+        mono = self.samples[self.filled:total]
+        np.mean(block, axis=0, out=mono)
+
+        count = (total - self.frame_size) // self.hop + 1 if total >= self.frame_size else 0
+        spike = tone = False
+        if count:
+            spectra = np.fft.rfft(self.frame_view[:count] * self.window, axis=-1)
+            power = spectra.real ** 2 + spectra.imag ** 2
+
+            # Loudness and band energies of every frame, in dB relative to full scale
+            band_power = power @ self.band_matrix
+            level_db = 10 * np.log10(np.maximum(band_power.sum(axis=1), 1e-12) / self.full_scale_power)
+            self.band_power = band_power[-1]
+
+            # Tonality of the high region: strongest bin over the median bin
+            high = power[:, self.tone_start:]
+            peak_bin = np.argmax(high, axis=1)
+            peak = high[np.arange(count), peak_bin]
+            median = np.partition(high, self.tone_median, axis=1)[:, self.tone_median]
+            tonal = (peak > median * self.tone_ratio) & (peak > self.floor_power)
+
+            # A few frames per chunk: the scalar state steps once per frame
+            level_db = level_db.tolist()
+            tonal = tonal.tolist()
+            for index in range(count):
+                if self.baseline_db is None:
+                    self.baseline_db = level_db[index]
+                if level_db[index] > self.floor_db and level_db[index] - self.baseline_db > self.spike_db:
+                    spike = True
+                self.baseline_db = (self.baseline_coeff * self.baseline_db
+                                    + (1 - self.baseline_coeff) * level_db[index])
+                self.tone_run = self.tone_run + 1 if tonal[index] else 0
+            tone = self.tone_run >= self.tone_frames_needed
+
+            self.level_db = level_db[-1]
+            self.tone_hz = float(self.freqs[self.tone_start + peak_bin[-1]]) if tone else 0.0
+
+            # Keep the samples the next frame still needs
+            consumed = count * self.hop
+            self.filled = total - consumed
+            self.samples[:self.filled] = self.samples[consumed:total]
+        else:
+            self.filled = total
+
+        self.reason = 'spike' if spike else 'tone' if tone else None
+        self.target = 1.0 if spike or tone else 0.0
+
+        # Smooth the protection towards the target, one step per chunk
+        time_ms = frames / self.sample_rate * 1e3
+        rate_ms = self.attack_ms if self.target > self.protection else self.release_ms
+        self.previous_protection = self.protection
+        self.protection += (self.target - self.protection) * (1 - math.exp(-time_ms / rate_ms))
+        if self.protection < 1e-3 and self.target == 0.0:
+            self.protection = 0.0
+        return self.protection
@@ -0,0 +1,197 @@
+import multiprocessing
+import threading
+
+from meters import SharedLevelMeter, SharedSpectrumMeter
+
+
+def run_worker(conn, meter_name, spectrum_name, processor_class, settings, band):
+    """Child process entry point: capture, filter and play until told to stop
+
+    Control messages arrive over the pipe, log lines go back over it and
+    levels are published through shared memory.
+    """
+    processor = processor_class(**settings)
+    processor.lowcut, processor.highcut = band
+    processor.meter = SharedLevelMeter(meter_name)
+    processor.spectrum = SharedSpectrumMeter(spectrum_name, processor.sample_rate)
+    audio_thread = None
+    # Log lines come from the audio thread, replies from this one
+    send_lock = threading.Lock()
+
+    def send(*message):
+        with send_lock:
+            conn.send(message)
+
+    def send_log(message):
+        send('log', message)
+
+    def run_audio(*args):
+        processor.process_audio(*args)
+        # Stopped, or the streams failed to open or run: the parent stops showing a session
+        try:
+            send('ended')
+        except OSError:
+            pass
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                # Parent went away
+                break
+
+            command = message[0]
+            if command == 'start':
+                _, input_device, output_device, mode = message
+                audio_thread = threading.Thread(
+                    target=run_audio,
+                    args=(input_device, output_device, mode, send_log),
+                    daemon=True
+                )
+                audio_thread.start()
+            elif command == 'set_mode':
+                processor.set_mode(message[1])
+            elif command == 'set_filter':
+                _, lowcut, highcut, filter_order = message
+                processor.retune(lowcut, highcut, filter_order)
+            elif command == 'set_notches':
+                processor.set_notches(message[1])
+            elif command == 'set_gain':
+                processor.set_gain(message[1])
+            elif command == 'set_auto_notches':
+                processor.set_auto_notches(message[1])
+            elif command == 'set_auto_protect':
+                processor.set_auto_protect(message[1])
+            elif command == 'set_limiter':
+                processor.set_limiter(message[1])
+            elif command == 'set_impulse_response':
+                processor.set_impulse_response(message[1])
+            elif command == 'set_chunk_size':
+                processor.set_chunk_size(message[1])
+            elif command == 'set_auto_tune':
+                processor.set_auto_tune(message[1])
+            elif command == 'start_recording':
+                processor.start_recording(*message[1:])
+            elif command == 'stop_recording':
+                recorder = processor.stop_recording()
+                if recorder is not None:
+                    send_log(recorder.summary())
+            elif command == 'metrics':
+                send('metrics', processor.get_metrics())
+            elif command == 'stop':
+                break
+    finally:
+        recorder = processor.stop_recording()
+        if recorder is not None:
+            send_log(recorder.summary())
+        processor.stop()
+        if audio_thread is not None:
+            audio_thread.join(timeout=2.0)
+        processor.registry.close()
+        processor.meter.close()
+        processor.spectrum.close()
+        send('stopped')
+        conn.close()
+
+
+class AudioProcessHost:
+    """Parent-side handle of an audio processor running in a child process"""
+    def __init__(self, processor_class, settings, band):
+        self.processor_class = processor_class
+        self.settings = settings
+        self.band = band
+        self.conn = None
+        self.process = None
+        self.meter = None
+        self.spectrum = None
+        self.listener = None
+        self.metrics = {}
+        self.stopping = False
+
+    def start(self, input_device, output_device, mode, log_callback, on_exit=None):
+        """Spawn the child process and start audio in it
+
+        on_exit is called from the listener thread once the child's audio
+        has ended: stopped, failed to open or run its streams, or the
+        child process died.
+        """
+        self.meter = SharedLevelMeter()
+        self.spectrum = SharedSpectrumMeter(sample_rate=self.settings['sample_rate'])
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=run_worker,
+            args=(child_conn, self.meter.name, self.spectrum.name, self.processor_class,
+                  self.settings, self.band),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+        self.listener = threading.Thread(target=self.listen, args=(log_callback, on_exit), daemon=True)
+        self.listener.start()
+        self.send('start', input_device, output_device, mode)
+
+    def listen(self, log_callback, on_exit=None):
+        """Forward log lines from the child until it stops"""
+        stopped = False
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == 'log':
+                log_callback(message[1])
+            elif message[0] == 'metrics':
+                self.metrics = message[1]
+            elif message[0] == 'ended':
+                # The child already logged why
+                if on_exit is not None:
+                    on_exit()
+            elif message[0] == 'stopped':
+                stopped = True
+                break
+
+        if not stopped and not self.stopping:
+            # The pipe closed without a goodbye: the child crashed or was killed
+            process = self.process
+            if process is not None:
+                process.join(timeout=1.0)
+            code = process.exitcode if process is not None else None
+            log_callback(f"✗ Erro: o processo de áudio terminou inesperadamente (código {code})")
+        if on_exit is not None:
+            on_exit()
+
+    def send(self, *message):
+        """Send a control message to the child"""
+        try:
+            self.conn.send(message)
+        except (BrokenPipeError, OSError):
+            pass
+
+    def get_metrics(self):
+        """Latest metrics received from the child, requesting fresh ones
+
+        The reply arrives asynchronously, so callers polling periodically
+        always see values at most one poll old.
+        """
+        self.send('metrics')
+        return self.metrics
+
+    def stop(self, timeout=3.0):
+        """Ask the child to stop, and terminate it if it does not"""
+        if self.process is None:
+            return
+        self.stopping = True
+        self.send('stop')
+        self.listener.join(timeout=timeout)
+        self.process.join(timeout=timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+        self.meter.close(unlink=True)
+        self.spectrum.close(unlink=True)
+        self.process = None
+        self.meter = None
+        self.spectrum = None
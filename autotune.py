@@ -0,0 +1,305 @@
+import math
+import random
+import time
+from collections import deque
+
+import numpy as np
+import pyaudio
+
+from buffers import SAMPLE_FORMATS
+
+# Chunk sizes (frames_per_buffer) the tuner chooses from
+BUFFER_SIZES = (64, 128, 256, 512, 1024, 2048)
+
+
+def make_chirp(sample_rate=44100, seconds=0.1, low=300.0, high=8000.0, amplitude=16000.0):
+    """Exponential sine sweep with faded ends, as int16-scale float64
+
+    A sweep has a sharp autocorrelation peak, so its echo through a
+    loopback can be located to the sample even under noise.
+    """
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    rate = math.log(high / low) / seconds
+    phase = 2 * np.pi * low * (np.exp(rate * t) - 1) / rate
+    fade = np.ones(n)
+    ramp = max(1, n // 10)
+    fade[:ramp] = np.hanning(2 * ramp)[:ramp]
+    fade[-ramp:] = np.hanning(2 * ramp)[ramp:]
+    return amplitude * np.sin(phase) * fade
+
+
+def find_delay(captured, reference):
+    """Lag of reference inside captured by FFT cross-correlation
+
+    Returns (lag in samples, peak over the median correlation in dB); a
+    low ratio means the reference was not found (no loopback).
+    """
+    n = 1 << int(math.ceil(math.log2(len(captured) + len(reference))))
+    correlation = np.fft.irfft(np.fft.rfft(captured, n) * np.conj(np.fft.rfft(reference, n)), n)
+    correlation = np.abs(correlation[:len(captured)])
+    lag = int(np.argmax(correlation))
+    floor = float(np.median(correlation)) + 1e-12
+    return lag, 20 * math.log10(correlation[lag] / floor)
+
+
+def measure_round_trip(p, input_device, output_device, sample_rate=44100, chunk_size=512, channels=1,
+                       chirp_seconds=0.1, max_latency=0.5, min_snr_db=20.0):
+    """Round-trip latency of a device pair connected by a loopback, in seconds
+
+    Plays a chirp on the output while recording the input (a cable, a
+    virtual cable such as VB-CABLE or a mic next to the speaker), with the
+    same blocking read-then-write loop the audio thread uses, and finds the
+    chirp in the recording. Returns (latency or None if the chirp was not
+    found, correlation peak in dB).
+    """
+    chirp = make_chirp(sample_rate, chirp_seconds)
+    lead = int(0.1 * sample_rate)
+    total = lead + len(chirp) + int(max_latency * sample_rate)
+    chunks = -(-total // chunk_size)
+    played = np.zeros(chunks * chunk_size)
+    played[lead:lead + len(chirp)] = chirp
+    frames = np.repeat(played[:, None], channels, axis=1).astype(np.int16)
+
+    stream_in = p.open(format=pyaudio.paInt16, channels=channels, rate=sample_rate, input=True,
+                       input_device_index=input_device, frames_per_buffer=chunk_size)
+    stream_out = p.open(format=pyaudio.paInt16, channels=channels, rate=sample_rate, output=True,
+                        output_device_index=output_device, frames_per_buffer=chunk_size)
+    captured = np.zeros(chunks * chunk_size)
+    try:
+        for k in range(chunks):
+            data = stream_in.read(chunk_size, exception_on_overflow=False)
+            block = np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+            captured[k * chunk_size:k * chunk_size + len(block)] = block.mean(axis=1)
+            stream_out.write(frames[k * chunk_size:(k + 1) * chunk_size].tobytes(),
+                             exception_on_underflow=False)
+    finally:
+        for stream in (stream_in, stream_out):
+            stream.stop_stream()
+            stream.close()
+
+    lag, snr_db = find_delay(captured, played[:lead + len(chirp)])
+    if snr_db < min_snr_db:
+        return None, snr_db
+    return lag / sample_rate, snr_db
+
+
+class BufferTuner:
+    """Picks the smallest chunk size that runs without glitches
+
+    Every window_seconds the xruns and deadline misses since the previous
+    window are counted. A glitch moves one size up right away; clean_windows
+    clean windows in a row try one size down. A size that glitched is not
+    tried again for hold_seconds, doubled each time it fails again (up to
+    max_hold_seconds), so the tuner settles instead of oscillating. The
+    first window after every change is skipped, as reopening the streams
+    can glitch by itself.
+    """
+    def __init__(self, chunk_size=512, sizes=BUFFER_SIZES, window_seconds=1.0, clean_windows=3,
+                 hold_seconds=10.0, max_hold_seconds=300.0):
+        self.sizes = sorted(sizes)
+        self.window_seconds = window_seconds
+        self.clean_windows = clean_windows
+        self.hold_seconds = hold_seconds
+        self.max_hold_seconds = max_hold_seconds
+        # Per size: (time before which it is not retried, hold of its next failure)
+        self.holds = {}
+        self.changes = 0
+        self.begin(chunk_size)
+
+    def begin(self, chunk_size, now=None):
+        """Start watching a (new) chunk size, with fresh metrics counters"""
+        self.chunk_size = chunk_size
+        self.window_start = time.monotonic() if now is None else now
+        self.last_glitches = 0
+        self.clean = 0
+        self.settling = True
+
+    @staticmethod
+    def glitches(metrics):
+        return metrics.underruns + metrics.overflows + metrics.deadline_misses
+
+    def observe(self, metrics, now=None):
+        """Look at the AudioMetrics counters; returns a new chunk size to switch to, or None"""
+        now = time.monotonic() if now is None else now
+        if now - self.window_start < self.window_seconds:
+            return None
+        total = self.glitches(metrics)
+        glitches = total - self.last_glitches
+        self.last_glitches = total
+        self.window_start = now
+        if self.settling:
+            self.settling = False
+            return None
+
+        index = self.sizes.index(self.chunk_size) if self.chunk_size in self.sizes else None
+        if glitches:
+            self.clean = 0
+            retry_at, hold = self.holds.get(self.chunk_size, (0.0, self.hold_seconds))
+            self.holds[self.chunk_size] = (now + hold, min(2 * hold, self.max_hold_seconds))
+            larger = [size for size in self.sizes if size > self.chunk_size]
+            return self.switch(larger[0], now) if larger else None
+
+        self.clean += 1
+        if self.clean < self.clean_windows:
+            return None
+        self.clean = 0
+        smaller = [size for size in self.sizes if size < self.chunk_size]
+        if index is None or not smaller:
+            return None
+        retry_at, _ = self.holds.get(smaller[-1], (0.0, self.hold_seconds))
+        if now < retry_at:
+            return None
+        return self.switch(smaller[-1], now)
+
+    def switch(self, chunk_size, now):
+        self.changes += 1
+        self.begin(chunk_size, now)
+        return chunk_size
+
+
+class JitterDevice:
+    """Simulated full-duplex sound card with a loopback cable and a jittery host
+
+    Runs on the wall clock: every period (frames_per_buffer frames) the
+    card plays one period from its output queue and records one period,
+    which is what it played hw_latency earlier plus some noise. The output
+    queue starts with buffers periods of silence, the input queue holds at
+    most buffers periods. The thread reading the input is woken late by a
+    small random jitter and, spike_rate times per second on average, by a
+    spike_ms stall, as a loaded OS would; falling more than the buffering
+    behind shows up as the same overflow/underflow errors PyAudio raises.
+    So small buffers glitch and large ones do not, headless.
+
+    The streams carry sample_format (a name in buffers.SAMPLE_FORMATS);
+    the card itself works at int16 scale.
+    """
+    def __init__(self, sample_rate=44100, channels=1, frames_per_buffer=512, buffers=2, hw_latency=0.005,
+                 jitter_ms=0.2, spike_ms=5.0, spike_rate=2.0, noise=30.0, seed=0, sample_format='int16'):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = frames_per_buffer
+        self.buffers = buffers
+        self.hw_latency = hw_latency
+        self.period = frames_per_buffer / sample_rate
+        self.jitter = jitter_ms / 1e3
+        self.spike = spike_ms / 1e3
+        self.spike_probability = min(1.0, spike_rate * self.period)
+        self.noise = noise
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+
+        self.format = SAMPLE_FORMATS[sample_format]
+        samples = frames_per_buffer * channels
+        self.silence = np.zeros(samples, dtype=np.float32)
+        self.output = deque([self.silence] * buffers)
+        self.input = deque()
+        # What the cable carries back to the input, oldest first
+        self.line = np.zeros(int(round(hw_latency * sample_rate)) * channels, dtype=np.float64)
+        self.overflowed = False
+        self.underflowed = False
+        self.ticks = 0
+        self.start = None
+        self.open_streams = 0
+        self.opened = False
+
+    @property
+    def closed(self):
+        """Whether every stream opened on the card was closed again"""
+        return self.opened and not self.open_streams
+
+    def advance(self):
+        """Run the card up to the current time"""
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        due = int((now - self.start) / self.period)
+        while self.ticks < due:
+            self.ticks += 1
+            if self.output:
+                played = self.output.popleft()
+            else:
+                played = self.silence
+                self.underflowed = True
+            line = np.concatenate([self.line, played])
+            recorded = line[:len(played)] + self.rng.normal(0, self.noise, len(played))
+            self.line = line[len(played):]
+            if len(self.input) >= self.buffers:
+                self.input.popleft()
+                self.overflowed = True
+            self.input.append(recorded)
+
+    def wait_tick(self):
+        """Sleep until the next period boundary"""
+        next_tick = self.start + (self.ticks + 1) * self.period
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+        self.advance()
+
+    def read(self, frames, exception_on_overflow=True):
+        self.advance()
+        while not self.input:
+            self.wait_tick()
+        # The host wakes up late: a little always, a lot now and then
+        delay = self.random.uniform(0, self.jitter)
+        if self.random.random() < self.spike_probability:
+            delay += self.spike
+        time.sleep(delay)
+        self.advance()
+        data = self.format.encode(self.input.popleft())
+        if self.overflowed:
+            self.overflowed = False
+            if exception_on_overflow:
+                raise OSError(pyaudio.paInputOverflowed, "Input overflowed")
+        return data
+
+    def write(self, data, exception_on_underflow=False):
+        self.advance()
+        while len(self.output) >= self.buffers:
+            self.wait_tick()
+        self.output.append(self.format.decode(data))
+        if self.underflowed:
+            self.underflowed = False
+            if exception_on_underflow:
+                raise OSError(pyaudio.paOutputUnderflowed, "Output underflowed")
+
+    def open_stream(self, input):
+        self.opened = True
+        self.open_streams += 1
+        return JitterStream(self, input)
+
+
+class JitterStream:
+    """Input or output half of a JitterDevice, with the PyAudio blocking stream methods"""
+    def __init__(self, device, input):
+        self.device = device
+        self.input = input
+        self.active = True
+
+    def read(self, num_frames, exception_on_overflow=True):
+        return self.device.read(num_frames, exception_on_overflow)
+
+    def write(self, frames, num_frames=None, exception_on_underflow=False):
+        self.device.write(frames, exception_on_underflow)
+
+    def get_read_available(self):
+        return len(self.device.input) * self.device.frames
+
+    def get_input_latency(self):
+        return self.device.hw_latency / 2 + self.device.period
+
+    def get_output_latency(self):
+        return self.device.hw_latency / 2 + self.device.buffers * self.device.period
+
+    def is_active(self):
+        return self.active
+
+    def start_stream(self):
+        self.active = True
+
+    def stop_stream(self):
+        self.active = False
+
+    def close(self):
+        if self.active is not None:
+            self.active = None
+            self.device.open_streams -= 1
@@ -0,0 +1,259 @@
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+
+from devices import NullPyAudio
+from processor import PRESETS, AudioProcessor
+from recorder import RotatingWavWriter
+
+# Frames per chunk through the pipeline (as live) and chunks per write to the output file
+BATCH_CHUNK_SIZE = 512
+WRITE_CHUNKS = 64
+
+
+def wav_data_region(mm):
+    """(channels, sample rate, bytes per sample, data offset, data length) of a mapped RIFF/WAVE file
+
+    Walks the chunk list itself instead of using the wave module, which
+    only ever copies the samples out, so the data can be read in place.
+    """
+    if mm[:4] != b'RIFF' or mm[8:12] != b'WAVE':
+        raise ValueError("Não é um arquivo WAV")
+    position = 12
+    fmt = None
+    while position + 8 <= len(mm):
+        chunk_id = mm[position:position + 4]
+        size, = struct.unpack('<I', mm[position + 4:position + 8])
+        body = position + 8
+        if chunk_id == b'fmt ':
+            if size < 16 or body + 16 > len(mm):
+                raise ValueError("WAV com bloco fmt incompleto")
+            tag, channels, rate, _, _, bits = struct.unpack('<HHIIHH', mm[body:body + 16])
+            if channels < 1 or rate < 1:
+                raise ValueError(f"WAV com {channels} canais a {rate} Hz")
+            if tag == 0xFFFE and size >= 40 and body + 26 <= len(mm):
+                # WAVE_FORMAT_EXTENSIBLE: the real format is the subformat's first two bytes
+                tag, = struct.unpack('<H', mm[body + 24:body + 26])
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("WAV sem bloco fmt antes dos dados")
+            tag, channels, rate, bits = fmt
+            if tag != 1 or bits != 16:
+                raise ValueError(f"Só WAV PCM de 16 bits é suportado (formato {tag}, {bits} bits)")
+            # A recorder killed mid-write can leave the size larger than the file
+            length = min(size, len(mm) - body)
+            return channels, rate, bits // 8, body, length - length % (2 * channels)
+        # Chunks are padded to an even size
+        position = body + size + (size & 1)
+    raise ValueError("WAV sem bloco de dados")
+
+
+def make_processor(sample_rate, channels, settings):
+    """AudioProcessor with the live filter settings, for files rather than devices
+
+    The device list is left empty, so no worker initializes PortAudio.
+    """
+    settings = dict(settings)
+    preset = settings.pop('preset', None)
+    if preset is not None:
+        if preset not in PRESETS:
+            raise ValueError(f"Preset desconhecido: {preset} (opções: {', '.join(PRESETS)})")
+        # Settings given explicitly win over the preset's
+        settings = dict(PRESETS[preset], **settings)
+    processor = AudioProcessor(sample_rate=sample_rate, chunk_size=settings.get('chunk_size', BATCH_CHUNK_SIZE),
+                               filter_order=settings.get('filter_order', 3), channels=channels,
+                               multirate=settings.get('multirate', False), limiter=settings.get('limiter', True),
+                               auto_protect=settings.get('auto_protect', False),
+                               auto_notches=settings.get('auto_notches', 0), backend=NullPyAudio)
+    processor.mode = 'filter'
+    processor.lowcut = settings.get('lowcut', processor.lowcut)
+    processor.highcut = settings.get('highcut', processor.highcut)
+    processor.gain_db = settings.get('gain_db', 0.0)
+    processor.notches = [(float(freq), float(q)) for freq, q in settings.get('notches', ())]
+    if not 0 < processor.lowcut < processor.highcut < sample_rate / 2:
+        raise ValueError(f"Banda inválida para {sample_rate} Hz: {processor.lowcut}-{processor.highcut} Hz")
+    processor.update_pipeline()
+    return processor
+
+
+def filter_file(source, destination, settings):
+    """Filter one WAV file into another through the live pipeline, in constant memory
+
+    The input is memory-mapped and fed chunk by chunk to the same
+    stateful pipeline the audio thread runs, so the result is what a
+    listener would have heard, lined up with the input: the pipeline's
+    fixed delay (limiter look-ahead, multirate resampling) is cut from the
+    start and flushed out with silence at the end, so the output has the
+    input's length and its last samples too. The output is written every
+    WRITE_CHUNKS chunks. Returns a dict with the audio length and the
+    wall and CPU time spent.
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        channels, sample_rate, width, offset, length = wav_data_region(mm)
+        processor = make_processor(sample_rate, channels, settings)
+        chunk_bytes = processor.chunk_size * channels * width
+        base = destination[:-4] if destination.lower().endswith('.wav') else destination
+        directory = os.path.dirname(destination)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        writer = RotatingWavWriter(base, sample_rate, channels)
+        try:
+            skip = processor.pipeline.delay * channels * width
+            stream_region(processor.pipeline, mm, offset, length, chunk_bytes, writer, skip)
+        finally:
+            writer.close()
+            processor.close()
+    return {
+        'source': source,
+        'destination': writer.paths[0] if writer.paths else None,
+        'audio_seconds': length / (channels * width * sample_rate),
+        'wall_seconds': time.perf_counter() - wall_start,
+        'cpu_seconds': time.process_time() - cpu_start,
+    }
+
+
+def stream_region(pipeline, mm, offset, length, chunk_bytes, writer, skip=0):
+    """Run length bytes of mm from offset through pipeline in chunks of chunk_bytes, into writer
+
+    The first skip bytes of output are dropped, and chunks of silence
+    follow the input (a short last chunk is padded with it) until length
+    bytes have been written.
+    """
+    pending = []
+    end = offset + length
+    # Views into the map, not copies; all gone when this returns, so the map can close
+    with memoryview(mm) as view:
+        start = offset
+        while length > 0:
+            chunk = view[start:min(start + chunk_bytes, end)] if start < end else b''
+            if len(chunk) < chunk_bytes:
+                chunk = bytes(chunk) + bytes(chunk_bytes - len(chunk))
+            start += chunk_bytes
+            out = pipeline.process(chunk)
+            if skip:
+                dropped = min(skip, len(out))
+                out = out[dropped:]
+                skip -= dropped
+            out = out[:length]
+            length -= len(out)
+            pending.append(out)
+            if len(pending) >= WRITE_CHUNKS:
+                writer.write(b''.join(pending))
+                pending.clear()
+        if pending:
+            writer.write(b''.join(pending))
+            pending.clear()
+        chunk = out = None
+
+
+def run_job(job):
+    """Pool entry point: filter_file, with the error returned instead of raised"""
+    source, destination, settings = job
+    try:
+        return filter_file(source, destination, settings)
+    except (OSError, ValueError, struct.error) as e:
+        return {'source': source, 'error': str(e)}
+
+
+def find_wav_files(paths):
+    """WAV files among paths, looking into directories recursively; (file, path relative to its root)"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith('.wav'):
+                        file = os.path.join(folder, name)
+                        found.append((file, os.path.relpath(file, path)))
+        else:
+            found.append((path, os.path.basename(path)))
+    return found
+
+
+def filter_files(paths, output_dir, settings=None, workers=None, progress=None):
+    """Filter many WAV files into output_dir, spread over a pool of worker processes
+
+    Files in a directory keep their relative path under output_dir.
+    Largest files go first, so a long one does not start last and keep
+    a single core busy at the end. progress, if given, is called with
+    each file's result as it finishes. Returns (results, wall seconds).
+    """
+    settings = settings or {}
+    files = find_wav_files(paths)
+    files.sort(key=lambda item: os.path.getsize(item[0]) if os.path.exists(item[0]) else 0, reverse=True)
+    jobs = [(file, os.path.join(output_dir, relative), settings) for file, relative in files]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    results = []
+    if workers == 1 or len(jobs) <= 1:
+        outcomes = map(run_job, jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(min(workers, len(jobs)))
+        outcomes = pool.imap_unordered(run_job, jobs)
+    try:
+        for result in outcomes:
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return results, time.perf_counter() - start
+
+
+def summarize(results, wall_seconds, workers):
+    """Report lines: audio filtered, and throughput as multiples of real time, overall and per core"""
+    done = [result for result in results if 'error' not in result]
+    audio = sum(result['audio_seconds'] for result in done)
+    cpu = sum(result['cpu_seconds'] for result in done)
+    lines = [f"✓ {len(done)} de {len(results)} arquivo(s), {audio / 60:.1f} min de áudio em {wall_seconds:.1f} s"]
+    if done and wall_seconds > 0 and cpu > 0:
+        lines.append(f"  {audio / wall_seconds:.0f}x tempo real no total com {workers} processo(s), "
+                     f"{audio / cpu:.0f}x tempo real por núcleo")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filtra arquivos WAV com o mesmo filtro do áudio ao vivo")
+    parser.add_argument('inputs', nargs='+', help="arquivos WAV ou pastas (procuradas recursivamente)")
+    parser.add_argument('-o', '--output', default='filtrados', help="pasta de saída")
+    parser.add_argument('--preset', choices=sorted(PRESETS))
+    parser.add_argument('--lowcut', type=float)
+    parser.add_argument('--highcut', type=float)
+    parser.add_argument('--order', type=int, dest='filter_order')
+    parser.add_argument('--gain', type=float, dest='gain_db')
+    parser.add_argument('--auto-notches', type=int)
+    parser.add_argument('--auto-protect', action='store_true', default=None)
+    parser.add_argument('--no-limiter', action='store_false', dest='limiter', default=None)
+    parser.add_argument('--multirate', action='store_true', default=None)
+    parser.add_argument('--chunk-size', type=int)
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="processos em paralelo")
+    args = parser.parse_args(argv)
+
+    settings = {key: value for key, value in vars(args).items()
+                if value is not None and key not in ('inputs', 'output', 'workers')}
+
+    def progress(result):
+        if 'error' in result:
+            print(f"✗ {result['source']}: {result['error']}")
+        else:
+            print(f"✓ {result['source']} → {result['destination']} "
+                  f"({result['audio_seconds'] / max(result['cpu_seconds'], 1e-6):.0f}x tempo real)")
+
+    results, wall_seconds = filter_files(args.inputs, args.output, settings, args.workers, progress)
+    for line in summarize(results, wall_seconds, args.workers):
+        print(line)
+    return 0 if all('error' not in result for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1104 @@
+import argparse
+import gc
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+from scipy import signal
+
+from activity_log import ActivityLog
+from analyzer import OverloadDetector
+from autotune import JitterDevice, JitterStream, measure_round_trip
+from batch import filter_file, filter_files
+from buffers import SAMPLE_FORMATS, ChunkBuffers
+from convolution import PartitionedConvolver
+from daemon import AudioDaemon, DaemonClient
+from devices import DeviceRegistry, FakePyAudio, NullPyAudio, scan_devices
+from dynamics import Limiter
+from filter_cache import FilterDesignCache
+from filters import MAX_FILTER_ORDER, SOSFilter, design_bandpass_sos
+from meters import SpectrumMeter
+from multirate import MultirateBandpass, Resampler
+from notches import AdaptiveNotchBank
+from processor import AudioProcessor
+from recorder import AudioRecorder
+from pipeline import (AnalyzerStage, FilterStage, GainStage, LimiterStage, Pipeline,
+                      ProtectionStage)
+
+SAMPLE_RATE = 44100
+CHUNK_SIZE = 512
+LOWCUT = 700.0
+HIGHCUT = 1300.0
+
+# Real-time sweep: every combination of these, on both the bare filter and the full loop
+SWEEP_CHUNK_SIZES = (128, 256, 512, 1024, 2048, 4096)
+SWEEP_ORDERS = (2, 4, MAX_FILTER_ORDER)
+SWEEP_SAMPLE_RATES = (44100, 48000, 96000)
+SWEEP_CHANNELS = (1, 2)
+SWEEP_CHUNKS = 200
+# Each case runs this many times: the fastest mean is kept (interference only
+# ever slows a run down), and the median p99 and max
+SWEEP_REPEATS = 5
+# A sweep fails against its baseline when a per-chunk time, as a fraction of
+# the deadline, grows by more than this relative amount...
+REGRESSION_THRESHOLDS = {'mean': 0.25, 'p99': 0.5, 'max': 2.0}
+# ...and by more than this much of the deadline (below it is timer noise)
+REGRESSION_FLOOR = 0.01
+
+
+class LFilterEngine:
+    """Legacy transfer-function (b, a) path, kept only for comparison"""
+    def __init__(self, lowcut, highcut, sample_rate, order):
+        nyquist = 0.5 * sample_rate
+        self.b, self.a = signal.butter(order, [lowcut / nyquist, highcut / nyquist], btype='band')
+        self.zi = signal.lfilter_zi(self.b, self.a) * 0
+
+    def process(self, samples):
+        filtered, self.zi = signal.lfilter(self.b, self.a, samples, zi=self.zi)
+        return filtered
+
+
+class SosfiltEngine:
+    """scipy's sosfilt on the same sections, as a reference for the block kernel"""
+    def __init__(self, lowcut, highcut, sample_rate, order):
+        self.sos = design_bandpass_sos(lowcut, highcut, sample_rate, order).copy()
+        self.zi = np.zeros((self.sos.shape[0], 2), dtype=np.float32)
+
+    def process(self, samples):
+        filtered, self.zi = signal.sosfilt(self.sos, samples, zi=self.zi)
+        return filtered
+
+
+def make_tone(freq, seconds=2.0, sample_rate=SAMPLE_RATE, amplitude=10000.0):
+    """Generate a float32 sine tone at int16 scale"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def run_chunked(engine, samples, chunk_size=CHUNK_SIZE):
+    """Feed samples through an engine chunk by chunk, timing every chunk"""
+    outputs = []
+    timings = []
+    for start in range(0, len(samples) - chunk_size + 1, chunk_size):
+        chunk = samples[start:start + chunk_size]
+        t0 = time.perf_counter()
+        outputs.append(engine.process(chunk))
+        timings.append(time.perf_counter() - t0)
+    return np.concatenate(outputs), np.array(timings)
+
+
+def rejection_db(engine, freq, sample_rate=SAMPLE_RATE):
+    """Steady-state gain in dB of a tone after filtering (nan if unstable)"""
+    tone = make_tone(freq, sample_rate=sample_rate)
+    filtered, _ = run_chunked(engine, tone)
+    # Skip the first half second so the transient has settled
+    settled = filtered[sample_rate // 2:].astype(np.float64)
+    if not np.all(np.isfinite(settled)):
+        return float('nan')
+    rms_in = np.sqrt(np.mean(tone.astype(np.float64) ** 2))
+    rms_out = np.sqrt(np.mean(settled ** 2))
+    return 20 * np.log10(max(rms_out, 1e-12) / rms_in)
+
+
+def bench_filter_engines(probe_freqs=(200.0, 1000.0, 4000.0)):
+    """Compare per-chunk cost and stopband rejection of lfilter, sosfilt and the block kernel"""
+    deadline = CHUNK_SIZE / SAMPLE_RATE
+    noise = np.random.default_rng(0).normal(0, 3000, SAMPLE_RATE * 5).astype(np.float32)
+
+    print(f"\n{'='*78}")
+    print(f"Filter engines: {LOWCUT:.0f}-{HIGHCUT:.0f} Hz @ {SAMPLE_RATE} Hz, chunk {CHUNK_SIZE}")
+    print(f"Deadline per chunk: {deadline * 1e3:.2f} ms")
+    print(f"{'='*78}")
+    header = f"{'order':>5} {'engine':>8} {'mean us':>9} {'p99 us':>9} {'% budget':>9}"
+    header += "".join(f" {f'{freq:.0f} Hz dB':>11}" for freq in probe_freqs)
+    print(header)
+
+    engines = [
+        ('lfilter', LFilterEngine),
+        ('sosfilt', SosfiltEngine),
+        ('block', SOSFilter.bandpass),
+    ]
+    for order in range(2, MAX_FILTER_ORDER + 1):
+        for name, factory in engines:
+            _, timings = run_chunked(factory(LOWCUT, HIGHCUT, SAMPLE_RATE, order), noise)
+            gains = [rejection_db(factory(LOWCUT, HIGHCUT, SAMPLE_RATE, order), freq)
+                     for freq in probe_freqs]
+            row = f"{order:>5} {name:>8} {timings.mean() * 1e6:>9.1f} "
+            row += f"{np.percentile(timings, 99) * 1e6:>9.1f} {100 * timings.mean() / deadline:>8.2f}%"
+            row += "".join(f" {gain:>11.1f}" for gain in gains)
+            print(row)
+
+
+class AllocatingPath:
+    """apply_filter as it was before the work buffers: a fresh array per step"""
+    def __init__(self, chunk_size, order=3):
+        self.filter = SosfiltEngine(LOWCUT, HIGHCUT, SAMPLE_RATE, order)
+
+    def apply_filter(self, audio_data):
+        audio_array = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32)
+        filtered = self.filter.process(audio_array)
+        filtered = np.clip(filtered, -32768, 32767)
+        filtered = np.int16(filtered)
+        return filtered.tobytes()
+
+
+class BufferedPath:
+    """apply_filter with preallocated work buffers and the in-place kernel"""
+    def __init__(self, chunk_size, order=3, channels=1):
+        self.filter = SOSFilter.bandpass(LOWCUT, HIGHCUT, SAMPLE_RATE, order, channels)
+        self.buffers = ChunkBuffers(chunk_size, channels)
+
+    def apply_filter(self, audio_data):
+        self.buffers.load(audio_data)
+        self.filter.process_inplace(self.buffers.work_block)
+        return self.buffers.store()
+
+
+class PerChannelPath(BufferedPath):
+    """One mono filter per channel, looping in Python (what vectorizing avoids)"""
+    def __init__(self, chunk_size, order=3, channels=1):
+        super().__init__(chunk_size, order, channels)
+        self.filters = [SOSFilter.bandpass(LOWCUT, HIGHCUT, SAMPLE_RATE, order)
+                        for _ in range(channels)]
+
+    def apply_filter(self, audio_data):
+        block = self.buffers.load(audio_data)
+        for channel, channel_filter in enumerate(self.filters):
+            channel_filter.process_inplace(block[channel:channel + 1])
+        return self.buffers.store()
+
+
+class MultiratePath(BufferedPath):
+    """apply_filter with the bandpass run at a decimated internal rate"""
+    def __init__(self, chunk_size, order=3, channels=1):
+        super().__init__(chunk_size, order, channels)
+        self.filter = MultirateBandpass(LOWCUT, HIGHCUT, SAMPLE_RATE, order, channels,
+                                        chunk_size=chunk_size)
+
+
+def make_int16_chunks(count, chunk_size=CHUNK_SIZE, seed=0, channels=1):
+    """Random interleaved int16 chunks as PyAudio would deliver them"""
+    rng = np.random.default_rng(seed)
+    return [rng.integers(-20000, 20000, chunk_size * channels, dtype=np.int16).tobytes()
+            for _ in range(count)]
+
+
+def time_chunks(apply_filter, chunks):
+    """Per-chunk wall time of apply_filter over a list of chunks"""
+    timings = np.empty(len(chunks))
+    for i, chunk in enumerate(chunks):
+        t0 = time.perf_counter()
+        apply_filter(chunk)
+        timings[i] = time.perf_counter() - t0
+    return timings
+
+
+def transient_bytes_per_chunk(apply_filter, chunks):
+    """Peak memory allocated (and freed again) while processing one chunk"""
+    apply_filter(chunks[0])
+    peaks = []
+    tracemalloc.start()
+    for chunk in chunks[:50]:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = apply_filter(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+        del result
+    tracemalloc.stop()
+    return int(np.median(peaks))
+
+
+def bench_hot_path(chunk_count=5000):
+    """Compare allocations and chunk time of the old and buffered apply_filter"""
+    deadline = CHUNK_SIZE / SAMPLE_RATE
+    chunks = make_int16_chunks(chunk_count)
+
+    print(f"\n{'='*60}")
+    print(f"apply_filter hot path: chunk {CHUNK_SIZE}, {chunk_count} chunks")
+    print(f"{'='*60}")
+    print(f"{'path':>10} {'bytes/chunk':>12} {'mean us':>9} {'p99 us':>9} {'max us':>9} {'% budget':>9}")
+    for name, factory in [('allocating', AllocatingPath), ('buffered', BufferedPath)]:
+        path = factory(CHUNK_SIZE)
+        transient = transient_bytes_per_chunk(path.apply_filter, chunks)
+        timings = time_chunks(path.apply_filter, chunks)
+        print(f"{name:>10} {transient:>12} {timings.mean() * 1e6:>9.1f} "
+              f"{np.percentile(timings, 99) * 1e6:>9.1f} {timings.max() * 1e6:>9.1f} "
+              f"{100 * np.percentile(timings, 99) / deadline:>8.2f}%")
+
+
+def bench_channels(channel_counts=(1, 2, 8), chunk_count=2000, order=3):
+    """Multi-channel apply_filter cost against the per-chunk deadline"""
+    deadline = CHUNK_SIZE / SAMPLE_RATE
+
+    print(f"\n{'='*60}")
+    print(f"Multi-channel apply_filter: chunk {CHUNK_SIZE}, order {order}")
+    print(f"{'='*60}")
+    print(f"{'channels':>8} {'path':>12} {'mean us':>9} {'p99 us':>9} {'% budget':>9}")
+    for channels in channel_counts:
+        chunks = make_int16_chunks(chunk_count, channels=channels)
+        for name, factory in [('vectorized', BufferedPath), ('per-channel', PerChannelPath)]:
+            path = factory(CHUNK_SIZE, order, channels)
+            timings = time_chunks(path.apply_filter, chunks)
+            print(f"{channels:>8} {name:>12} {timings.mean() * 1e6:>9.1f} "
+                  f"{np.percentile(timings, 99) * 1e6:>9.1f} "
+                  f"{100 * np.percentile(timings, 99) / deadline:>8.2f}%")
+
+
+def bench_multirate(channel_counts=(1, 2, 8), chunk_count=2000, order=3,
+                    probe_freqs=(300.0, 2000.0, 4000.0, 10000.0)):
+    """Full-rate against multirate filtering: cost per chunk and stopband rejection"""
+    deadline = CHUNK_SIZE / SAMPLE_RATE
+    multirate = MultirateBandpass(LOWCUT, HIGHCUT, SAMPLE_RATE, order, chunk_size=CHUNK_SIZE)
+
+    print(f"\n{'='*60}")
+    print(f"Multirate: {LOWCUT:.0f}-{HIGHCUT:.0f} Hz, order {order}, decimation {multirate.factor} "
+          f"({multirate.internal_rate:.0f} Hz internal), +{multirate.latency} samples latency")
+    print(f"{'='*60}")
+    print(f"{'channels':>8} {'path':>10} {'mean us':>9} {'p99 us':>9} {'% budget':>9}")
+    for channels in channel_counts:
+        chunks = make_int16_chunks(chunk_count, channels=channels)
+        for name, factory in [('full rate', BufferedPath), ('multirate', MultiratePath)]:
+            path = factory(CHUNK_SIZE, order, channels)
+            timings = time_chunks(path.apply_filter, chunks)
+            print(f"{channels:>8} {name:>10} {timings.mean() * 1e6:>9.1f} "
+                  f"{np.percentile(timings, 99) * 1e6:>9.1f} "
+                  f"{100 * np.percentile(timings, 99) / deadline:>8.2f}%")
+
+    print(f"\n{'path':>10}" + "".join(f" {f'{freq:.0f} Hz dB':>11}" for freq in probe_freqs))
+    factories = [
+        ('full rate', lambda: SOSFilter.bandpass(LOWCUT, HIGHCUT, SAMPLE_RATE, order)),
+        ('multirate', lambda: MultirateBandpass(LOWCUT, HIGHCUT, SAMPLE_RATE, order,
+                                                chunk_size=CHUNK_SIZE)),
+    ]
+    for name, factory in factories:
+        gains = [rejection_db(factory(), freq) for freq in probe_freqs]
+        print(f"{name:>10}" + "".join(f" {gain:>11.1f}" for gain in gains))
+
+
+def bench_convolution(tap_counts=(256, 1024, 4096, 16384), channel_counts=(1, 8), chunk_count=1000):
+    """Partitioned convolution cost per chunk as the FIR grows"""
+    deadline = CHUNK_SIZE / SAMPLE_RATE
+    rng = np.random.default_rng(0)
+
+    print(f"\n{'='*60}")
+    print(f"Partitioned convolution: chunk {CHUNK_SIZE}, latency {CHUNK_SIZE} samples")
+    print(f"{'='*60}")
+    print(f"{'taps':>6} {'channels':>8} {'partitions':>10} {'mean us':>9} {'p99 us':>9} {'% budget':>9}")
+    for taps in tap_counts:
+        impulse_response = rng.standard_normal(taps).astype(np.float32) / taps
+        for channels in channel_counts:
+            convolver = PartitionedConvolver(impulse_response, channels, CHUNK_SIZE)
+            source = rng.standard_normal((channels, CHUNK_SIZE)).astype(np.float32)
+            block = np.empty_like(source)
+            timings = np.empty(chunk_count)
+            for i in range(chunk_count):
+                # Fresh input every chunk, so the output never decays into denormals
+                np.copyto(block, source)
+                t0 = time.perf_counter()
+                convolver.process_inplace(block)
+                timings[i] = time.perf_counter() - t0
+            print(f"{taps:>6} {channels:>8} {convolver.partitions:>10} {timings.mean() * 1e6:>9.1f} "
+                  f"{np.percentile(timings, 99) * 1e6:>9.1f} "
+                  f"{100 * np.percentile(timings, 99) / deadline:>8.2f}%")
+
+
+def bench_limiter(channel_counts=(1, 2, 8), chunk_count=2000):
+    """Look-ahead limiter cost per chunk, and what it does to an overloaded tone"""
+    deadline = CHUNK_SIZE / SAMPLE_RATE
+    rng = np.random.default_rng(0)
+
+    print(f"\n{'='*60}")
+    print(f"Look-ahead limiter: chunk {CHUNK_SIZE}")
+    print(f"{'='*60}")
+    print(f"{'channels':>8} {'mean us':>9} {'p99 us':>9} {'% budget':>9}")
+    for channels in channel_counts:
+        limiter = Limiter(SAMPLE_RATE, channels)
+        # Loud enough that the limiter works on every chunk
+        source = (rng.standard_normal((channels, CHUNK_SIZE)) * 40000).astype(np.float32)
+        block = np.empty_like(source)
+        timings = np.empty(chunk_count)
+        for i in range(chunk_count):
+            np.copyto(block, source)
+            t0 = time.perf_counter()
+            limiter.process_inplace(block)
+            timings[i] = time.perf_counter() - t0
+        print(f"{channels:>8} {timings.mean() * 1e6:>9.1f} {np.percentile(timings, 99) * 1e6:>9.1f} "
+              f"{100 * np.percentile(timings, 99) / deadline:>8.2f}%")
+
+    # A 1 kHz tone 6 dB over full scale: energy the output puts outside 1 kHz
+    tone = make_tone(1000.0, amplitude=65000.0)[None, :]
+    clipped = np.clip(tone, -32768, 32767)
+    limiter = Limiter(SAMPLE_RATE)
+    limited = np.concatenate([limiter.process_inplace(tone[:, start:start + CHUNK_SIZE].copy())
+                              for start in range(0, tone.shape[1] - CHUNK_SIZE + 1, CHUNK_SIZE)], axis=1)
+    print(f"\n{'output':>8} {'peak':>8} {'distortion dB':>14}")
+    for name, output in [('clip', clipped), ('limiter', limited)]:
+        settled = output[0, SAMPLE_RATE // 2:SAMPLE_RATE // 2 + SAMPLE_RATE // 2].astype(np.float64)
+        spectrum = np.abs(np.fft.rfft(settled * np.hanning(len(settled)))) ** 2
+        freqs = np.fft.rfftfreq(len(settled), 1.0 / SAMPLE_RATE)
+        fundamental = spectrum[np.abs(freqs - 1000.0) <= 20].sum()
+        distortion = 10 * np.log10((spectrum.sum() - fundamental) / fundamental)
+        print(f"{name:>8} {np.abs(settled).max():>8.0f} {distortion:>14.1f}")
+
+
+def bench_pipeline(chunk_count=2000, channels=2, order=3):
+    """Per-stage cost of a full pipeline, with and without stage fusion"""
+    def stages():
+        return [
+            GainStage(-3.0),
+            FilterStage(SOSFilter.bandpass(LOWCUT, HIGHCUT, SAMPLE_RATE, order, channels), 'bandpass'),
+            FilterStage(SOSFilter.notch(1000.0, SAMPLE_RATE, 30.0, channels), 'notch'),
+            FilterStage(SOSFilter.notch(1200.0, SAMPLE_RATE, 30.0, channels), 'notch'),
+            LimiterStage(Limiter(SAMPLE_RATE, channels)),
+        ]
+
+    chunks = make_int16_chunks(chunk_count, channels=channels)
+    print(f"\n{'='*60}")
+    print(f"Pipeline: gain, bandpass, 2 notches, limiter; {channels} channels, chunk {CHUNK_SIZE}")
+    print(f"{'='*60}")
+    for fuse in (False, True):
+        pipeline = Pipeline(stages(), ChunkBuffers(CHUNK_SIZE, channels), fuse=fuse)
+        timings = time_chunks(pipeline.process, chunks)
+        print(f"\n{'fused' if fuse else 'unfused'}: mean {timings.mean() * 1e6:.1f} us, "
+              f"p99 {np.percentile(timings, 99) * 1e6:.1f} us per chunk")
+        for stage in pipeline.stage_snapshot():
+            print(f"  {stage['name']:>28} {stage['mean_ms'] * 1e3:>8.1f} us")
+
+
+def bench_sample_formats(chunk_count=2000, channels=2, order=3):
+    """Cost of the bandpass and limiter pipeline per stream sample format, and each format's resolution"""
+    print(f"\n{'='*60}")
+    print(f"Sample formats: bandpass and limiter, {channels} channels, chunk {CHUNK_SIZE}")
+    print(f"{'='*60}")
+    print(f"{'format':>8} {'mean us':>8} {'p99 us':>8} {'-60 dBFS tone SNR':>18}")
+    tone = make_tone(1000.0, CHUNK_SIZE * chunk_count / SAMPLE_RATE, amplitude=32768 * 10 ** (-60 / 20))
+    planar = np.repeat(tone[None, :], channels, axis=0).astype(np.float32)
+    for name, sample_format in SAMPLE_FORMATS.items():
+        stream = sample_format.encode(planar.T.copy())
+        chunk_bytes = len(stream) // chunk_count
+        chunks = [stream[i * chunk_bytes:(i + 1) * chunk_bytes] for i in range(chunk_count)]
+        stages = [FilterStage(SOSFilter.bandpass(LOWCUT, HIGHCUT, SAMPLE_RATE, order, channels), 'bandpass'),
+                  LimiterStage(Limiter(SAMPLE_RATE, channels))]
+        pipeline = Pipeline(stages, ChunkBuffers(CHUNK_SIZE, channels, name))
+        timings = time_chunks(pipeline.process, chunks)
+        # What the format keeps of a quiet tone on the way in
+        error = sample_format.decode(stream) - planar.T.reshape(-1)
+        snr = f"{10 * np.log10(np.mean(tone ** 2) / np.mean(error ** 2)):.1f} dB" if error.any() else "exact"
+        print(f"{name:>8} {timings.mean() * 1e6:>8.1f} {np.percentile(timings, 99) * 1e6:>8.1f} {snr:>18}")
+
+
+def make_overload_scene(channels=1, seconds=8.0, spike_at=2.0, tone_at=4.0, seed=0):
+    """Quiet noise with a short loud burst at spike_at and a 4 kHz tone from tone_at"""
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * SAMPLE_RATE)
+    audio = rng.standard_normal((frames, channels)) * 300
+    spike = slice(int(spike_at * SAMPLE_RATE), int((spike_at + 0.1) * SAMPLE_RATE))
+    audio[spike] *= 11.0
+    tone = make_tone(4000.0, seconds - tone_at, amplitude=3000.0)
+    audio[frames - len(tone):] += tone[:, None]
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def bench_overload_detector(channel_counts=(1, 2, 8), spike_at=2.0, tone_at=4.0):
+    """Cost of the overload analyzer and protection, and how fast they react"""
+    budget = CHUNK_SIZE / SAMPLE_RATE
+    print(f"\n{'='*60}")
+    print(f"Overload detector: spike at {spike_at:g} s, 4 kHz tone from {tone_at:g} s, "
+          f"budget {budget * 1e3:.1f} ms per chunk")
+    print(f"{'='*60}")
+    print(f"{'channels':>8} {'analyzer us':>12} {'protection us':>14} {'p99 us':>8} {'budget':>7}")
+    for channels in channel_counts:
+        scene = make_overload_scene(channels, spike_at=spike_at, tone_at=tone_at)
+        chunks = [scene[start:start + CHUNK_SIZE].tobytes()
+                  for start in range(0, len(scene) - CHUNK_SIZE + 1, CHUNK_SIZE)]
+        detector = OverloadDetector(SAMPLE_RATE)
+        bandpass = SOSFilter.bandpass(LOWCUT, HIGHCUT, SAMPLE_RATE, 3, channels)
+        pipeline = Pipeline([AnalyzerStage(detector), ProtectionStage(detector, bandpass)],
+                            ChunkBuffers(CHUNK_SIZE, channels))
+
+        # First chunk after each event onset that is flagged, that engages
+        # the protection past 90% and, for the tone, that names it a tone
+        events = {at: {} for at in (spike_at, tone_at)}
+        timings = np.empty(len(chunks))
+        for i, chunk in enumerate(chunks):
+            t0 = time.perf_counter()
+            pipeline.process(chunk)
+            timings[i] = time.perf_counter() - t0
+            at = tone_at if (i + 1) * CHUNK_SIZE / SAMPLE_RATE > tone_at else spike_at
+            if (i + 1) * CHUNK_SIZE / SAMPLE_RATE <= spike_at:
+                continue
+            seen = events[at]
+            if detector.reason:
+                seen.setdefault('flagged', i)
+            if detector.protection > 0.9:
+                seen.setdefault('engaged', i)
+            if detector.reason == 'tone':
+                seen.setdefault('tone', i)
+
+        # The protection filter only runs while engaged, so average it over those chunks
+        stages = pipeline.stage_snapshot()
+        print(f"{channels:>8} {stages[0]['mean_ms'] * 1e3:>12.1f} "
+              f"{stages[1]['mean_ms'] * 1e3:>14.1f} {np.percentile(timings, 99) * 1e6:>8.1f} "
+              f"{np.percentile(timings, 99) / budget:>7.1%}")
+
+    # Reaction times, measured from the end of the chunk where each event starts
+    def delay(seen, key, at):
+        if key not in seen:
+            return "never"
+        return f"{((seen[key] + 1) * CHUNK_SIZE / SAMPLE_RATE - at) * 1e3:.0f} ms"
+    print()
+    for at, label in ((spike_at, "spike"), (tone_at, "tone")):
+        seen = events[at]
+        print(f"{label}: flagged after {delay(seen, 'flagged', at)}, "
+              f"protection > 90% after {delay(seen, 'engaged', at)}")
+    print(f"tone identified as {detector.tone_hz:.0f} Hz after {delay(events[tone_at], 'tone', tone_at)} "
+          "(its onset counts as a spike until the baseline catches up)")
+
+
+def bench_notch_bank(notch_counts=(1, 2, 4, 8), channel_counts=(1, 2), seconds=4.0):
+    """Cost of the adaptive notch bank by number of tracked tones, and how deep it cuts them"""
+    rng = np.random.default_rng(0)
+    frames = int(seconds * SAMPLE_RATE)
+    t = np.arange(frames) / SAMPLE_RATE
+    print(f"\n{'='*60}")
+    print(f"Adaptive notch bank: noise plus N steady tones (one drifting), chunk {CHUNK_SIZE}")
+    print(f"{'='*60}")
+    print(f"{'tones':>5} {'channels':>8} {'mean us':>8} {'p99 us':>8} {'tracked':>8} {'cut dB':>7}")
+    for count in notch_counts:
+        # Tones spread over the band, the first one gliding up 2% over the run
+        freqs = np.geomspace(150.0, 9000.0, count)
+        audio = rng.standard_normal(frames) * 300
+        for index, freq in enumerate(freqs):
+            glide = 1 + 0.02 * t / seconds if index == 0 else np.ones(frames)
+            audio += 2000 * np.sin(2 * np.pi * np.cumsum(freq * glide) / SAMPLE_RATE)
+        for channels in channel_counts:
+            bank = AdaptiveNotchBank(SAMPLE_RATE, channels, max_notches=count)
+            block = np.zeros((channels, CHUNK_SIZE), dtype=np.float32)
+            output = np.zeros(frames, dtype=np.float32)
+            timings = []
+            for start in range(0, frames - CHUNK_SIZE + 1, CHUNK_SIZE):
+                block[:] = audio[start:start + CHUNK_SIZE]
+                t0 = time.perf_counter()
+                bank.process_inplace(block)
+                timings.append(time.perf_counter() - t0)
+                output[start:start + CHUNK_SIZE] = block[0]
+
+            # Tone level over the second half, in and out, at the tracked frequencies
+            half = slice(frames // 2, frames)
+            window = np.hanning(frames - frames // 2)
+            spectrum_in = np.abs(np.fft.rfft(audio[half] * window))
+            spectrum_out = np.abs(np.fft.rfft(output[half] * window))
+            bins = np.fft.rfftfreq(frames - frames // 2, 1.0 / SAMPLE_RATE)
+            cuts = []
+            for freq in freqs * np.array([1.015] + [1.0] * (count - 1)):
+                near = np.abs(bins - freq) < 0.015 * freq
+                cuts.append(20 * np.log10(spectrum_in[near].max() / spectrum_out[near].max()))
+            timings = np.array(timings)
+            print(f"{count:>5} {channels:>8} {timings.mean() * 1e6:>8.1f} "
+                  f"{np.percentile(timings, 99) * 1e6:>8.1f} {bank.order:>8} {min(cuts):>7.1f}")
+
+
+def bench_mode_switching(toggles=5000, channels=2):
+    """Time an in-band passthrough/filter switch and check repeated toggles hold no memory"""
+    processor = AudioProcessor(channels=channels, auto_notches=2)
+    processor.mode = 'passthrough'
+    processor.update_pipeline()
+    # Chunks are fed by hand, as the audio thread of an open session would
+    processor.running = True
+    chunks = make_int16_chunks(64, channels=channels)
+    period = CHUNK_SIZE / SAMPLE_RATE
+
+    def toggle(count):
+        switch_times = np.empty(count)
+        swap_times = np.empty(count)
+        for i in range(count):
+            t0 = time.perf_counter()
+            processor.set_mode('filter' if processor.mode == 'passthrough' else 'passthrough')
+            switch_times[i] = time.perf_counter() - t0
+            # The next chunk crossfades to the new pipeline
+            t0 = time.perf_counter()
+            processor.process_chunk(chunks[i % len(chunks)])
+            swap_times[i] = time.perf_counter() - t0
+            assert processor.pipeline is processor.next_pipeline
+        return switch_times, swap_times
+
+    toggle(100)
+    tracemalloc.start()
+    toggle(toggles // 2)
+    # Replaced pipelines are only freed by a collection; anything left after one is held
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    switch_times, swap_times = toggle(toggles // 2)
+    gc.collect()
+    growth = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    processor.running = False
+    processor.close()
+
+    print(f"\n{'='*60}")
+    print(f"Mode switching: {toggles} in-band toggles, {channels} channels, chunk period {period * 1e3:.1f} ms")
+    print(f"{'='*60}")
+    print(f"set_mode (build + publish): mean {switch_times.mean() * 1e3:.2f} ms, "
+          f"p99 {np.percentile(switch_times, 99) * 1e3:.2f} ms")
+    print(f"crossfade chunk:            mean {swap_times.mean() * 1e3:.2f} ms, "
+          f"p99 {np.percentile(swap_times, 99) * 1e3:.2f} ms")
+    print(f"applied at the next chunk boundary, at most {period * 1e3:.1f} ms after set_mode; "
+          f"streams untouched")
+    print(f"memory held after the second {toggles // 2} toggles: {growth / 1024:.1f} KiB")
+
+
+def bench_activity_log(lines=100000, threads=4, flush_interval=0.1):
+    """Cost of posting log lines from many threads and of the GUI-side drains"""
+    log = ActivityLog()
+    post_times = []
+
+    def flood(worker):
+        # Status lines repeat, as they do from a glitching audio thread
+        times = np.empty(lines // threads)
+        for i in range(len(times)):
+            t0 = time.perf_counter()
+            log.post(f"underrun no worker {worker}" if i % 4 else f"linha {worker}-{i}")
+            times[i] = time.perf_counter() - t0
+        post_times.append(times)
+
+    workers = [threading.Thread(target=flood, args=(w,)) for w in range(threads)]
+    drain_times = []
+    shown = 0
+    for worker in workers:
+        worker.start()
+    while any(worker.is_alive() for worker in workers) or log.pending:
+        t0 = time.perf_counter()
+        updated, added = log.drain()
+        drain_times.append(time.perf_counter() - t0)
+        shown += len(added)
+        time.sleep(flush_interval)
+    for worker in workers:
+        worker.join()
+
+    post_times = np.concatenate(post_times)
+    drain_times = np.array(drain_times)
+    print(f"\n{'='*60}")
+    print(f"Activity log: {lines} lines from {threads} threads, drained every {flush_interval * 1e3:.0f} ms")
+    print(f"{'='*60}")
+    print(f"post:  mean {post_times.mean() * 1e6:.2f} us, p99 {np.percentile(post_times, 99) * 1e6:.2f} us")
+    print(f"drain: mean {drain_times.mean() * 1e3:.2f} ms, max {drain_times.max() * 1e3:.2f} ms "
+          f"over {len(drain_times)} drains")
+    print(f"lines shown: {shown}, retained: {len(log.lines)} (cap {log.lines.maxlen})")
+
+
+def bench_spectrum_meter(channel_counts=(1, 2, 8), chunk_count=3000):
+    """Audio-thread cost of the decimated spectrum snapshots and GUI-side cost of reading them"""
+    budget = CHUNK_SIZE / SAMPLE_RATE
+    print(f"\n{'='*60}")
+    print(f"Spectrum meter: {CHUNK_SIZE}-sample chunks, budget {budget * 1e3:.2f} ms")
+    print(f"{'='*60}")
+    for channels in channel_counts:
+        meter = SpectrumMeter(SAMPLE_RATE)
+        chunks = make_int16_chunks(chunk_count, channels=channels)
+        times = np.empty(chunk_count)
+        for i, chunk in enumerate(chunks):
+            t0 = time.perf_counter()
+            meter.update(chunk, chunk, channels)
+            times[i] = time.perf_counter() - t0
+        due = times[times > np.median(times) * 4] if meter.interval > 1 else times
+        print(f"{channels} ch: every {meter.interval} chunks {due.mean() * 1e6:6.1f} us, "
+              f"amortized {times.mean() * 1e6:5.1f} us/chunk ({times.mean() / budget:.2%} of budget)")
+
+    reads = np.empty(10000)
+    for i in range(len(reads)):
+        t0 = time.perf_counter()
+        meter.snapshot()
+        reads[i] = time.perf_counter() - t0
+    print(f"snapshot: mean {reads.mean() * 1e6:.2f} us, p99 {np.percentile(reads, 99) * 1e6:.2f} us")
+
+
+def make_fake_host_apis(devices_per_api=8):
+    """Host APIs of a typical Windows machine, slowest first as PortAudio lists them"""
+    host_apis = []
+    for name, latency in (("MME", 0.09), ("Windows DirectSound", 0.12), ("Windows WASAPI", 0.003),
+                          ("Windows WDM-KS", 0.01)):
+        devices = []
+        for i in range(devices_per_api):
+            devices.append({'name': f"Mic {i}", 'maxInputChannels': 2, 'defaultLowInputLatency': latency})
+            devices.append({'name': f"Speakers {i}", 'maxOutputChannels': 2,
+                            'defaultLowOutputLatency': latency * (1 + 0.1 * i)})
+        host_apis.append((name, devices))
+    return host_apis
+
+
+def bench_device_registry(scan_delay=0.2, lookups=10000):
+    """GUI-thread cost of listing devices from the cache versus re-enumerating synchronously"""
+    host_apis = make_fake_host_apis()
+    backend = FakePyAudio.factory(host_apis, scan_delay)
+    registry = DeviceRegistry(backend)
+
+    t0 = time.perf_counter()
+    p = backend()
+    scan_devices(p)
+    p.terminate()
+    synchronous = time.perf_counter() - t0
+
+    times = np.empty(lookups)
+    for i in range(lookups):
+        t0 = time.perf_counter()
+        registry.inputs, registry.outputs
+        registry.recommend()
+        times[i] = time.perf_counter() - t0
+
+    # Plug a device in and let a background refresh pick it up
+    host_apis[2][1].append({'name': "USB Headset", 'maxInputChannels': 1, 'maxOutputChannels': 2,
+                            'defaultLowInputLatency': 0.002, 'defaultLowOutputLatency': 0.002})
+    version = registry.version
+    t0 = time.perf_counter()
+    thread = registry.refresh_async()
+    returned = time.perf_counter() - t0
+    thread.join()
+    best_input, best_output = registry.recommend()
+    registry.close()
+
+    print(f"\n{'='*60}")
+    print(f"Device registry: {len(registry.devices)} devices on {len(host_apis)} host APIs, "
+          f"{scan_delay * 1e3:.0f} ms driver scan")
+    print(f"{'='*60}")
+    print(f"synchronous re-enumeration on the GUI thread: {synchronous * 1e3:.1f} ms")
+    print(f"cached lists + recommendation: mean {times.mean() * 1e6:.1f} us, "
+          f"p99 {np.percentile(times, 99) * 1e6:.1f} us")
+    print(f"refresh_async returns in {returned * 1e6:.0f} us, scan done in background in "
+          f"{registry.scan_seconds * 1e3:.1f} ms (list changed: {registry.version != version})")
+    print(f"recommended: {best_input.label} -> {best_output.label} "
+          f"({(best_input.input_latency + best_output.output_latency) * 1e3:.1f} ms)")
+
+
+def bench_recorder(minutes=10.0, channels=2, part_seconds=120.0):
+    """Audio-thread cost of the WAV tap, writer throughput and memory, recording both sides"""
+    chunk_count = int(minutes * 60 * SAMPLE_RATE / CHUNK_SIZE)
+    chunks = make_int16_chunks(64, channels=channels)
+    directory = tempfile.mkdtemp()
+    try:
+        tracemalloc.start()
+        recorder = AudioRecorder(os.path.join(directory, "bench"), SAMPLE_RATE, channels,
+                                 ('input', 'output'), max_seconds=part_seconds)
+        times = np.empty(chunk_count)
+        start = time.perf_counter()
+        for i in range(chunk_count):
+            # Faster than real time, so pace the producer to what the writer
+            # keeps up with instead of measuring drops
+            while len(recorder.pending) >= recorder.max_pending - 1:
+                time.sleep(0.001)
+            chunk = chunks[i % len(chunks)]
+            t0 = time.perf_counter()
+            recorder.tap(chunk, chunk)
+            times[i] = time.perf_counter() - t0
+        recorder.close()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        written = sum(os.path.getsize(path) for path in recorder.paths)
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"\n{'='*60}")
+    print(f"Recorder: {minutes:.0f} min of {channels}-ch audio, input and output, "
+          f"{part_seconds:.0f} s parts")
+    print(f"{'='*60}")
+    print(f"tap: mean {times.mean() * 1e6:.2f} us, p99 {np.percentile(times, 99) * 1e6:.2f} us, "
+          f"max {times.max() * 1e6:.1f} us")
+    print(f"written {written / 2**20:.0f} MiB in {len(recorder.paths)} files in {elapsed:.1f} s "
+          f"({minutes * 60 / elapsed:.0f}x real time), dropped {recorder.dropped}")
+    print(f"peak traced memory {peak / 2**20:.1f} MiB "
+          f"(vs {2 * chunk_count * len(chunks[0]) / 2**20:.0f} MiB holding every chunk)")
+
+
+def bench_batch(files=4, seconds=60.0, channels=2, settings=None):
+    """Offline filtering of WAV files: memory of one file, throughput with one and all cores"""
+    settings = settings or {'preset': 'suave'}
+    directory = tempfile.mkdtemp(prefix="batch_")
+    try:
+        rng = np.random.default_rng(0)
+        sources = os.path.join(directory, "in")
+        os.makedirs(sources)
+        for i in range(files):
+            samples = rng.normal(0, 4000, int(seconds * SAMPLE_RATE) * channels).astype(np.int16)
+            with wave.open(os.path.join(sources, f"aula_{i}.wav"), 'wb') as wav:
+                wav.setnchannels(channels)
+                wav.setsampwidth(2)
+                wav.setframerate(SAMPLE_RATE)
+                wav.writeframes(samples.tobytes())
+        size = os.path.getsize(os.path.join(sources, "aula_0.wav"))
+
+        tracemalloc.start()
+        filter_file(os.path.join(sources, "aula_0.wav"), os.path.join(directory, "one.wav"), settings)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"\n{'='*60}")
+        print(f"Batch filtering: {files} files of {seconds:.0f} s, {channels}-ch, {settings}")
+        print(f"{'='*60}")
+        print(f"one file of {size / 2**20:.1f} MiB: peak traced memory {peak / 2**20:.2f} MiB")
+        for workers in sorted({1, os.cpu_count() or 1}):
+            results, wall = filter_files([sources], os.path.join(directory, f"out_{workers}"), settings, workers)
+            audio = sum(result['audio_seconds'] for result in results)
+            cpu = sum(result['cpu_seconds'] for result in results)
+            print(f"{workers:2d} process(es): {audio / wall:6.0f}x real time overall, "
+                  f"{audio / cpu:6.0f}x real time per core")
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_buffer_autotune(chunk_sizes=(128, 256, 512, 1024), seconds=24.0, spike_ms=4.0, spike_rate=3.0):
+    """Chirp latency on a simulated loopback, then the auto-tuner on a jittery simulated card"""
+    host_apis = make_fake_host_apis(1)
+    print(f"\n{'='*60}")
+    print(f"Buffer auto-tune: simulated card, 5 ms loopback, {spike_ms:.0f} ms stalls {spike_rate:.0f}/s")
+    print(f"{'='*60}")
+    for chunk_size in chunk_sizes:
+        card = FakePyAudio(host_apis, device=lambda rate, channels, frames: JitterDevice(
+            rate, channels, frames, spike_rate=0.0))
+        latency, snr_db = measure_round_trip(card, 0, 1, SAMPLE_RATE, chunk_size)
+        # Output queue of 2 buffers plus the cable is what a sample goes through
+        expected = 2 * chunk_size / SAMPLE_RATE + 0.005
+        print(f"{chunk_size:5d} frames: measured {latency * 1e3:5.1f} ms (model {expected * 1e3:5.1f} ms, "
+              f"peak {snr_db:.0f} dB)")
+
+    device = lambda rate, channels, frames: JitterDevice(rate, channels, frames, spike_ms=spike_ms,
+                                                         spike_rate=spike_rate, seed=frames)
+    processor = AudioProcessor(chunk_size=1024, auto_tune=True,
+                               backend=FakePyAudio.factory(host_apis, device=device))
+    start = time.perf_counter()
+    events = []
+    processor.start(0, 1, 'filter', lambda message: events.append((time.perf_counter() - start, message)))
+    sizes = []
+    while time.perf_counter() - start < seconds:
+        time.sleep(0.25)
+        sizes.append(processor.chunk_size)
+    changes = processor.tuner.changes
+    processor.close()
+    for at, message in events:
+        print(f"  {at:5.1f} s  {message}")
+    settled = sizes[len(sizes) // 2:]
+    print(f"{changes} changes; chunk size over the second half: "
+          f"{min(settled)}-{max(settled)} frames (started at 1024)")
+
+
+def bench_daemon_api(calls=2000, seconds=2.0):
+    """Round trip of control commands to a headless daemon over its Unix socket, audio running"""
+    host_apis = make_fake_host_apis(1)
+    device = lambda rate, channels, frames: JitterDevice(rate, channels, frames, spike_rate=0.0)
+    processor = AudioProcessor(backend=FakePyAudio.factory(host_apis, device=device))
+    directory = tempfile.mkdtemp(prefix="daemon_")
+    daemon = AudioDaemon(processor, os.path.join(directory, "daemon.sock"))
+    daemon.log = lambda message: None
+    daemon.listen()
+    thread = threading.Thread(target=daemon.serve, daemon=True)
+    thread.start()
+    client = DaemonClient(daemon.address)
+    try:
+        client.call('start', input=0, output=1)
+        time.sleep(seconds)
+        print(f"\n{'='*60}")
+        print(f"Daemon control API: {calls} calls per command, filter running")
+        print(f"{'='*60}")
+        for command in ('ping', 'status', 'metrics', 'meter', 'spectrum'):
+            times = np.empty(calls)
+            for i in range(calls):
+                t0 = time.perf_counter()
+                client.call(command)
+                times[i] = time.perf_counter() - t0
+            print(f"{command:10s} mean {times.mean() * 1e6:6.1f} us, "
+                  f"p99 {np.percentile(times, 99) * 1e6:6.1f} us")
+        metrics = client.call('metrics')
+        print(f"audio meanwhile: {metrics['chunks']} chunks, {metrics['deadline_misses']} deadline misses")
+    finally:
+        client.call('shutdown')
+        client.close()
+        thread.join()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_resampler(rate_pairs=((48000, 44100), (44100, 48000), (48000, 16000)), channel_counts=(1, 2),
+                    chunk_count=2000):
+    """Cost and quality of the output resampler, fed chunk by chunk like the audio loop"""
+    print(f"\n{'='*60}")
+    print(f"Output resampler: {CHUNK_SIZE}-frame chunks, 1 kHz tone")
+    print(f"{'='*60}")
+    print(f"{'in Hz':>6} {'out Hz':>6} {'ch':>3} {'taps':>5} {'mean us':>8} {'p99 us':>8} "
+          f"{'latency ms':>10} {'SNR dB':>7}")
+    for input_rate, output_rate in rate_pairs:
+        t = np.arange(chunk_count * CHUNK_SIZE) / input_rate
+        tone = 16000 * np.sin(2 * np.pi * 1000.0 * t)
+        for channels in channel_counts:
+            resampler = Resampler(input_rate, output_rate, channels)
+            block = np.repeat(tone[None, :], channels, axis=0).astype(np.float32)
+            timings = np.empty(chunk_count)
+            pieces = []
+            for i in range(chunk_count):
+                t0 = time.perf_counter()
+                pieces.append(resampler.process(block[:, i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE]))
+                timings[i] = time.perf_counter() - t0
+            output = np.concatenate(pieces, axis=1)[0]
+
+            # Error against the ideal tone, delayed by the resampler latency, past the warm-up
+            expected = 16000 * np.sin(2 * np.pi * 1000.0 * (np.arange(len(output)) / output_rate
+                                                           - resampler.latency))
+            steady = slice(len(output) // 10, len(output))
+            error = output[steady] - expected[steady]
+            snr = 10 * np.log10(np.mean(expected[steady] ** 2) / np.mean(error ** 2))
+            print(f"{input_rate:>6} {output_rate:>6} {channels:>3} {resampler.taps_per_phase:>5} "
+                  f"{timings.mean() * 1e6:>8.1f} {np.percentile(timings, 99) * 1e6:>8.1f} "
+                  f"{resampler.latency * 1e3:>10.2f} {snr:>7.1f}")
+
+
+def bench_design_cache(orders=(2, 3, 4, 8)):
+    """Time filter creation with no cache, from the .npz store and from memory"""
+    directory = tempfile.mkdtemp(prefix="filter_cache_")
+    try:
+        print(f"\n{'='*60}")
+        print("Filter design cache: time to create a filter")
+        print(f"{'='*60}")
+        print(f"{'order':>5} {'designed ms':>12} {'disk ms':>9} {'memory ms':>10}")
+        for order in orders:
+            # A fresh cache designs and saves, a second one loads from disk
+            # the first time and from memory the second time
+            fresh = FilterDesignCache(directory)
+            reloaded = FilterDesignCache(directory)
+            timings = []
+            for cache in (fresh, reloaded, reloaded):
+                t0 = time.perf_counter()
+                SOSFilter(design_bandpass_sos(LOWCUT, HIGHCUT, SAMPLE_RATE, order, cache=cache))
+                timings.append(time.perf_counter() - t0)
+            print(f"{order:>5} {timings[0] * 1e3:>12.2f} {timings[1] * 1e3:>9.2f} {timings[2] * 1e3:>10.2f}")
+
+        # Cold start in a fresh interpreter: the first run designs (and has
+        # to import scipy.signal), the second finds everything on disk
+        script = (
+            "import sys, time; t0 = time.perf_counter(); "
+            "from filters import SOSFilter; "
+            f"SOSFilter.bandpass({LOWCUT}, {HIGHCUT}, {SAMPLE_RATE}, 3); "
+            "print(time.perf_counter() - t0, 'scipy.signal' in sys.modules)"
+        )
+        env = dict(os.environ, TEAUDIO_FILTER_CACHE=os.path.join(directory, "cold"))
+        here = os.path.dirname(os.path.abspath(__file__))
+        print(f"\n{'run':>12} {'startup ms':>11} {'scipy.signal imported':>22}")
+        for label in ("empty cache", "cached"):
+            result = subprocess.run([sys.executable, "-c", script], cwd=here, env=env,
+                                    capture_output=True, text=True, check=True)
+            elapsed, imported = result.stdout.split()
+            print(f"{label:>12} {float(elapsed) * 1e3:>11.1f} {imported:>22}")
+    finally:
+        shutil.rmtree(directory)
+
+
+class ReplayDevice:
+    """Simulated card handing out prepared chunks as fast as they are read
+
+    With no clock behind it the audio loop runs flat out, so the time
+    between two reads is what one iteration of the loop costs (read,
+    process, bookkeeping, write). The first timed iterations are kept,
+    then done is set; the chunks keep cycling until the streams close.
+    Opened through FakePyAudio like JitterDevice, with the same streams.
+    """
+    def __init__(self, chunks, frames_per_buffer, sample_rate, timed=SWEEP_CHUNKS, warmup=20):
+        self.chunks = chunks
+        self.frames = frames_per_buffer
+        self.buffers = 1
+        self.hw_latency = 0.0
+        self.period = frames_per_buffer / sample_rate
+        self.input = ()
+        self.warmup = warmup
+        self.read_times = np.empty(warmup + timed + 1)
+        self.reads = 0
+        self.done = threading.Event()
+        self.open_streams = 0
+        self.opened = False
+
+    @property
+    def closed(self):
+        return self.opened and not self.open_streams
+
+    @property
+    def timings(self):
+        """Seconds per loop iteration, warm-up excluded"""
+        return np.diff(self.read_times[self.warmup:])
+
+    def read(self, frames, exception_on_overflow=True):
+        if self.reads < len(self.read_times):
+            self.read_times[self.reads] = time.perf_counter()
+            self.reads += 1
+            if self.reads == len(self.read_times):
+                self.done.set()
+        return self.chunks[self.reads % len(self.chunks)]
+
+    def write(self, data, exception_on_underflow=False):
+        pass
+
+    def open_stream(self, input):
+        self.opened = True
+        self.open_streams += 1
+        return JitterStream(self, input)
+
+
+def deadline_fractions(timings, deadline):
+    """Mean, p99 and max of per-chunk times as fractions of the chunk deadline"""
+    return {'mean': float(timings.mean() / deadline),
+            'p99': float(np.percentile(timings, 99) / deadline),
+            'max': float(timings.max() / deadline)}
+
+
+def sweep_filter(chunk_size, order, sample_rate, channels, count=SWEEP_CHUNKS):
+    """AudioProcessor's filter-mode pipeline (band filter and limiter) timed chunk by chunk"""
+    processor = AudioProcessor(sample_rate, chunk_size, order, channels=channels, native_rate=False,
+                               backend=NullPyAudio)
+    processor.set_mode('filter')
+    process = processor.pipeline.process
+    chunks = make_int16_chunks(16, chunk_size, channels=channels)
+    for chunk in chunks:
+        process(chunk)
+    timings = time_chunks(process, [chunks[i % len(chunks)] for i in range(count)])
+    processor.close()
+    return deadline_fractions(timings, chunk_size / sample_rate)
+
+
+def sweep_loop(chunk_size, order, sample_rate, channels, count=SWEEP_CHUNKS):
+    """AudioProcessor's whole blocking loop in filter mode, fed by a ReplayDevice"""
+    chunks = make_int16_chunks(16, chunk_size, channels=channels)
+    cards = []
+
+    def device(rate, device_channels, frames):
+        cards.append(ReplayDevice(chunks, frames, rate, count))
+        return cards[-1]
+
+    processor = AudioProcessor(sample_rate, chunk_size, order, channels=channels, native_rate=False,
+                               auto_format=False, backend=FakePyAudio.factory(make_fake_host_apis(1), device=device))
+    errors = []
+    processor.start(0, 1, 'filter', lambda message: errors.append(message) if message.startswith("✗") else None)
+    while not cards and not errors:
+        time.sleep(0.001)
+    if cards:
+        cards[0].done.wait(30)
+    processor.close()
+    if errors:
+        raise RuntimeError(errors[0])
+    return deadline_fractions(cards[0].timings, chunk_size / sample_rate)
+
+
+def run_sweep(chunk_sizes=SWEEP_CHUNK_SIZES, orders=SWEEP_ORDERS, sample_rates=SWEEP_SAMPLE_RATES,
+              channel_counts=SWEEP_CHANNELS, count=SWEEP_CHUNKS, repeats=SWEEP_REPEATS):
+    """Per-chunk cost of the bare filter and the full loop over every combination
+
+    Returns {case: {'mean', 'p99', 'max'}}, times as fractions of the
+    chunk's deadline (1.0 = the whole chunk duration), printed as a table.
+    The mean is the lowest of repeats runs and p99 and max their
+    medians, so one preempted run does not make a case look slower.
+    """
+    print(f"\n{'='*78}")
+    print(f"Real-time sweep: {count} chunks per case, {repeats} runs each, "
+          f"per-chunk time as % of the deadline")
+    print(f"{'='*78}")
+    print(f"{'path':>6} {'chunk':>6} {'order':>5} {'rate':>6} {'ch':>3} {'mean %':>8} {'p99 %':>8} {'max %':>8}")
+    results = {}
+    for path, run in (('filter', sweep_filter), ('loop', sweep_loop)):
+        for chunk_size, order, sample_rate, channels in itertools.product(chunk_sizes, orders, sample_rates,
+                                                                           channel_counts):
+            runs = [run(chunk_size, order, sample_rate, channels, count) for _ in range(repeats)]
+            fractions = {'mean': min(fractions['mean'] for fractions in runs),
+                         'p99': float(np.median([fractions['p99'] for fractions in runs])),
+                         'max': float(np.median([fractions['max'] for fractions in runs]))}
+            results[f"{path}/{chunk_size}/{order}/{sample_rate}/{channels}"] = fractions
+            print(f"{path:>6} {chunk_size:>6} {order:>5} {sample_rate:>6} {channels:>3} "
+                  f"{fractions['mean'] * 100:>8.2f} {fractions['p99'] * 100:>8.2f} {fractions['max'] * 100:>8.2f}")
+    return results
+
+
+def find_regressions(results, baseline, thresholds=REGRESSION_THRESHOLDS, floor=REGRESSION_FLOOR):
+    """Cases of results slower than baseline beyond the thresholds, as report lines"""
+    regressions = []
+    for case, fractions in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            continue
+        for key, threshold in thresholds.items():
+            if (fractions[key] > reference[key] * (1 + threshold)
+                    and fractions[key] - reference[key] > floor):
+                regressions.append(f"{case} {key}: {reference[key] * 100:.2f}% -> {fractions[key] * 100:.2f}% "
+                                   f"of the deadline (limit +{threshold:.0%})")
+    return regressions
+
+
+def bench_all():
+    """Every benchmark, in order"""
+    bench_filter_engines()
+    bench_hot_path()
+    bench_channels()
+    bench_multirate()
+    bench_convolution()
+    bench_limiter()
+    bench_pipeline()
+    bench_sample_formats()
+    bench_overload_detector()
+    bench_notch_bank()
+    bench_mode_switching()
+    bench_activity_log()
+    bench_spectrum_meter()
+    bench_device_registry()
+    bench_recorder()
+    bench_batch()
+    bench_buffer_autotune()
+    bench_daemon_api()
+    bench_resampler()
+    bench_design_cache()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Performance benchmarks of the audio path")
+    parser.add_argument('--sweep', action='store_true',
+                        help="only the real-time sweep (chunk sizes, orders, rates, channels)")
+    parser.add_argument('--quick', action='store_true', help="sweep a smaller grid")
+    parser.add_argument('--save', metavar='FILE', help="write the sweep results as a JSON baseline")
+    parser.add_argument('--check', metavar='FILE', help="compare the sweep to a baseline; exit 1 on regression")
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help="multiply the regression thresholds, e.g. 2 on a noisy shared machine")
+    args = parser.parse_args(argv)
+
+    if not (args.sweep or args.quick or args.save or args.check):
+        bench_all()
+        return 0
+
+    grid = {}
+    if args.quick:
+        grid = {'chunk_sizes': (128, 512, 4096), 'orders': (2, MAX_FILTER_ORDER), 'sample_rates': (48000,)}
+    results = run_sweep(**grid)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print(f"\nBaseline saved to {args.save}")
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+        thresholds = {key: threshold * args.tolerance for key, threshold in REGRESSION_THRESHOLDS.items()}
+        regressions = find_regressions(results, baseline, thresholds)
+        compared = len(set(results) & set(baseline))
+        if not compared:
+            # A baseline from another grid (or an empty file) must not pass silently
+            print(f"\nFAIL: no case of this sweep is in {args.check}; save a baseline with the same grid")
+            return 1
+        if regressions:
+            print(f"\nFAIL: {len(regressions)} regression(s) in {compared} cases")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nOK: no regression in {compared} cases")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import numpy as np
+import pyaudio
+
+
+class SampleFormat:
+    """Sample format of a stream, and its conversion to the work buffers
+
+    The work buffers are float32 at int16 scale (full scale 32768)
+    whatever the stream carries, so every stage sees the same levels;
+    float32 and 24-bit streams are converted with a single multiply,
+    never through int16. 24-bit samples are packed in three bytes and
+    unpacked to the top of an int32.
+    """
+    def __init__(self, name, pa_format, dtype, width, full_scale):
+        self.name = name
+        self.pa_format = pa_format
+        self.dtype = np.dtype(dtype)
+        # Bytes per sample in the stream
+        self.width = width
+        # Value of a full-scale sample as returned by samples()
+        self.full_scale = full_scale
+        # From stream samples to the int16 scale of the work buffers
+        self.scale = 32768.0 / full_scale
+        # Largest work buffer value the format can hold
+        self.clip_max = 32768.0 if self.dtype.kind == 'f' else 32768.0 - 2.0 ** (16 - 8 * width)
+
+    def samples(self, data):
+        """Interleaved stream bytes as an array of samples"""
+        if self.width != 3:
+            return np.frombuffer(data, dtype=self.dtype)
+        packed = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        samples = np.zeros(len(packed), dtype=np.int32)
+        samples.view(np.uint8).reshape(-1, 4)[:, 1:] = packed
+        return samples
+
+    def empty(self, count):
+        """Zeroed array of count stream samples, as filled by store()"""
+        return np.zeros(count, dtype=self.dtype)
+
+    def load(self, samples, block):
+        """Convert stream samples into a float32 block of the same shape at int16 scale"""
+        if self.scale == 1.0:
+            np.copyto(block, samples)
+        else:
+            np.multiply(samples, self.scale, out=block)
+
+    def store(self, block, out):
+        """Clip a block at int16 scale in place and convert it into out, an array from empty()"""
+        np.clip(block, -32768, self.clip_max, out=block)
+        if self.scale == 1.0:
+            np.copyto(out, block, casting='unsafe')
+        else:
+            np.multiply(block, 1.0 / self.scale, out=out, casting='unsafe')
+
+    def tobytes(self, out):
+        """Stream bytes of an array filled by store()"""
+        if self.width != 3:
+            return out.tobytes()
+        return out.view(np.uint8).reshape(-1, 4)[:, 1:].tobytes()
+
+    def encode(self, block):
+        """Stream bytes of an interleaved float32 block at int16 scale (clipped in place)"""
+        out = self.empty(block.size)
+        self.store(block.reshape(-1), out)
+        return self.tobytes(out)
+
+    def decode(self, data):
+        """Interleaved float32 samples at int16 scale from stream bytes"""
+        samples = self.samples(data)
+        block = np.empty(len(samples), dtype=np.float32)
+        self.load(samples, block)
+        return block
+
+
+# Stream formats by preference: float32 needs no integer conversion at all,
+# 24-bit keeps more resolution than 16; int16 always works
+SAMPLE_FORMATS = {
+    'float32': SampleFormat('float32', pyaudio.paFloat32, np.float32, 4, 1.0),
+    'int24': SampleFormat('int24', pyaudio.paInt24, np.int32, 3, 2.0 ** 31),
+    'int16': SampleFormat('int16', pyaudio.paInt16, np.int16, 2, 32768.0),
+}
+INT16 = SAMPLE_FORMATS['int16']
+
+
+class ChunkBuffers:
+    """Preallocated work buffers for one audio stream
+
+    Every chunk is converted into the same float32 work buffer, filtered in
+    place, then clipped and converted into the same output buffer of the
+    stream's sample format (a name in SAMPLE_FORMATS). The only per-chunk
+    allocation left is the bytes object PyAudio needs.
+
+    The work buffer is planar, one row per channel, while PyAudio frames
+    are interleaved; the (de)interleaving happens in the same copies that
+    convert the sample format.
+    """
+    def __init__(self, chunk_size, channels=1, sample_format='int16'):
+        self.channels = channels
+        self.format = SAMPLE_FORMATS[sample_format]
+        self.resize(chunk_size)
+
+    def resize(self, chunk_size):
+        """(Re)allocate the buffers for a new chunk size (in frames)"""
+        self.chunk_size = chunk_size
+        self.work_block = np.zeros((self.channels, chunk_size), dtype=np.float32)
+        self.out = self.format.empty(chunk_size * self.channels)
+        # Interleaved output seen as (channels, frames), matching work_block
+        self.out_planar = self.out.reshape(chunk_size, self.channels).T
+        # Second block and raised-cosine ramp for crossfading filter swaps
+        self.scratch_block = np.zeros((self.channels, chunk_size), dtype=np.float32)
+        self.fade_in = (0.5 - 0.5 * np.cos(np.linspace(0, np.pi, chunk_size))).astype(np.float32)
+
+    def load(self, audio_data):
+        """Convert interleaved stream bytes into the planar float32 work buffer"""
+        samples = self.format.samples(audio_data)
+        frames = len(samples) // self.channels
+        if frames != self.chunk_size:
+            self.resize(frames)
+        self.format.load(samples.reshape(frames, self.channels).T, self.work_block)
+        return self.work_block
+
+    def store(self):
+        """Clip the work buffer in place and convert it to interleaved stream bytes"""
+        self.format.store(self.work_block, self.out_planar)
+        return self.format.tobytes(self.out)
+
+
+class RingBuffer:
+    """Single-producer/single-consumer ring of samples
+
+    The producer only advances write_count and the consumer only advances
+    read_count, so the two sides never need a lock to share the buffer.
+    """
+    def __init__(self, capacity, dtype=np.int16):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self.write_count = 0
+        self.read_count = 0
+
+    @property
+    def available(self):
+        """Samples ready to be read"""
+        return self.write_count - self.read_count
+
+    @property
+    def free(self):
+        """Samples that can be written without overwriting unread data"""
+        return self.capacity - self.available
+
+    def write(self, samples):
+        """Copy as many samples as fit, returning how many were written"""
+        count = min(len(samples), self.free)
+        start = self.write_count % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        self.buffer[:count - first] = samples[first:count]
+        self.write_count += count
+        return count
+
+    def read_into(self, out):
+        """Copy up to len(out) samples into out, returning how many were read"""
+        count = min(len(out), self.available)
+        start = self.read_count % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        out[first:count] = self.buffer[:count - first]
+        self.read_count += count
+        return count
+
+    def clear(self):
+        """Drop all buffered samples (only while neither side is running)"""
+        self.read_count = self.write_count
+
+
+class BlockFifo:
+    """Feeds a filter that only takes whole blocks of size samples with chunks of any length
+
+    Input short of a whole block waits for the next chunk, and the output
+    runs size - 1 samples late so every chunk still gets its own length
+    back: a chunk of n samples returns the n oldest filtered samples.
+    """
+    def __init__(self, channels, size):
+        self.size = size
+        self.pending = np.zeros((channels, 0), dtype=np.float32)
+        self.ready = np.zeros((channels, size - 1), dtype=np.float32)
+
+    @property
+    def delay(self):
+        """Samples of delay the FIFO adds"""
+        return self.size - 1
+
+    def process_inplace(self, block, process_blocks):
+        """Run process_blocks on the whole blocks available, writing the output over block
+
+        process_blocks takes a C-contiguous (channels, k * size) block and
+        returns its filtered samples.
+        """
+        frames = block.shape[1]
+        data = np.concatenate([self.pending, block], axis=1)
+        whole = data.shape[1] - data.shape[1] % self.size
+        self.pending = data[:, whole:].copy()
+        ready = self.ready
+        if whole:
+            filtered = process_blocks(np.ascontiguousarray(data[:, :whole]))
+            ready = np.concatenate([ready, filtered], axis=1)
+        block[...] = ready[:, :frames]
+        self.ready = ready[:, frames:].copy()
+        return block
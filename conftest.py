@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+import pytest
+
+# Keep the tests' filter designs out of the user's cache, set before filter_cache is imported
+os.environ.setdefault("TEAUDIO_FILTER_CACHE", tempfile.mkdtemp(prefix="teaudio_test_cache_"))
+
+
+@pytest.fixture
+def host_apis():
+    """One host API with a stereo microphone (device 0) and stereo speakers (device 1)"""
+    return [("Windows WASAPI", [{'name': "Mic", 'maxInputChannels': 2},
+                                {'name': "Speakers", 'maxOutputChannels': 2}])]
+
+
+@pytest.fixture
+def fake_backend(host_apis):
+    """PyAudio stand-in whose streams run on a glitch-free simulated card"""
+    from autotune import JitterDevice
+    from devices import FakePyAudio
+
+    def device(rate, channels, frames):
+        return JitterDevice(rate, channels, frames, spike_rate=0.0)
+
+    return FakePyAudio.factory(host_apis, device=device)
@@ -0,0 +1,143 @@
+import math
+
+import numpy as np
+
+from buffers import BlockFifo
+
+# Default length of FIRs designed from a response curve (46 ms at 44.1 kHz)
+DEFAULT_FIR_TAPS = 2048
+
+# Floor for designed magnitudes, so deep cuts stay finite in the log domain
+MIN_GAIN_DB = -120.0
+
+
+def design_fir_from_response(freqs, gains_db, sample_rate, numtaps=DEFAULT_FIR_TAPS,
+                             minimum_phase=True):
+    """FIR whose magnitude follows a curve given as (frequency, gain in dB) points
+
+    The curve is interpolated linearly in dB between the points and held
+    flat beyond the first and last one. A minimum phase design (the
+    default) adds almost no delay; a linear phase one delays everything by
+    numtaps / 2 samples but keeps the waveform shape.
+    """
+    freqs = np.asarray(freqs, dtype=np.float64)
+    gains_db = np.asarray(gains_db, dtype=np.float64)
+    if freqs.ndim != 1 or freqs.shape != gains_db.shape or len(freqs) == 0:
+        raise ValueError("freqs and gains_db must be 1-D sequences of the same length")
+    if np.any(np.diff(freqs) <= 0):
+        raise ValueError("freqs must be strictly increasing")
+
+    # Sample the curve on a grid much finer than the filter can resolve
+    n_fft = 1 << int(math.ceil(math.log2(8 * numtaps)))
+    grid = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    log_gain = np.maximum(np.interp(grid, freqs, gains_db), MIN_GAIN_DB) * (math.log(10) / 20)
+
+    if minimum_phase:
+        # Homomorphic method: fold the real cepstrum of log|H| onto positive
+        # quefrencies, which gives the minimum phase spectrum with that magnitude
+        cepstrum = np.fft.irfft(log_gain, n_fft)
+        fold = np.zeros(n_fft)
+        fold[0] = 1.0
+        fold[1:n_fft // 2] = 2.0
+        fold[n_fft // 2] = 1.0
+        impulse = np.fft.irfft(np.exp(np.fft.rfft(cepstrum * fold)), n_fft)[:numtaps]
+        # Taper the tail only: the energy of a minimum phase FIR sits at its start
+        impulse *= np.hanning(2 * numtaps)[numtaps:]
+    else:
+        # Zero phase response centred in the window
+        impulse = np.roll(np.fft.irfft(np.exp(log_gain), n_fft), numtaps // 2)[:numtaps]
+        impulse *= np.hanning(numtaps)
+
+    return impulse.astype(np.float32)
+
+
+class PartitionedConvolver:
+    """Stateful FIR filter using uniformly partitioned overlap-save convolution
+
+    The impulse response is split into partitions of block_size samples,
+    each kept as a spectrum. Every block is transformed once, pushed into a
+    frequency-domain delay line and multiplied against all partitions, so
+    the cost per block grows only with the number of partitions (one
+    complex multiply-add per bin each) rather than with the tap count, and
+    the output of a block is ready as soon as the block is: the latency is
+    one block.
+    """
+    def __init__(self, impulse_response, channels=1, block_size=512):
+        impulse_response = np.asarray(impulse_response, dtype=np.float32)
+        if impulse_response.ndim != 1 or len(impulse_response) == 0:
+            raise ValueError("Impulse response must be a non-empty 1-D array")
+
+        self.impulse_response = impulse_response
+        self.channels = channels
+        self.block_size = block_size
+        self.partitions = int(math.ceil(len(impulse_response) / block_size))
+
+        # Spectra of the zero-padded partitions, one row each
+        padded = np.zeros((self.partitions, 2 * block_size), dtype=np.float32)
+        padded[:, :block_size].flat[:len(impulse_response)] = impulse_response
+        self.spectra = np.fft.rfft(padded, axis=-1).astype(np.complex64)
+
+        # Input of the last two blocks, the overlap-save transform window
+        self.window = np.zeros((channels, 2 * block_size), dtype=np.float32)
+        # Delay line of block spectra stored twice, so the newest partitions
+        # are always one contiguous slice [position:position + partitions]
+        bins = block_size + 1
+        self.delay_line = np.zeros((channels, 2 * self.partitions, bins), dtype=np.complex64)
+        self.position = 0
+        self.products = np.zeros((channels, self.partitions, bins), dtype=np.complex64)
+        self.accumulator = np.zeros((channels, bins), dtype=np.complex64)
+        # Only set up once a chunk length is not a multiple of block_size
+        self.fifo = None
+
+    @property
+    def order(self):
+        return len(self.impulse_response)
+
+    def reset(self):
+        """Clear the filter state"""
+        self.window.fill(0)
+        self.delay_line.fill(0)
+        self.fifo = None
+
+    def process(self, samples):
+        """Filter one 1-D chunk or (channels, n) block, carrying state to the next"""
+        block = np.array(samples, dtype=np.float32, ndmin=2)
+        self.process_inplace(block)
+        return block[0] if np.ndim(samples) == 1 else block
+
+    def process_inplace(self, block):
+        """Filter a (channels, n) float32 block in place
+
+        Lengths that are multiples of block_size are filtered directly. From
+        the first chunk of another length on, chunks go through a BlockFifo,
+        which costs block_size - 1 samples of delay.
+        """
+        if self.fifo is None and block.shape[1] % self.block_size == 0:
+            return self.process_blocks(block)
+        if self.fifo is None:
+            self.fifo = BlockFifo(self.channels, self.block_size)
+        return self.fifo.process_inplace(block, self.process_blocks)
+
+    def process_blocks(self, block):
+        """Filter a block whose length is a multiple of block_size, in place"""
+        size = self.block_size
+        partitions = self.partitions
+        for start in range(0, block.shape[1], size):
+            x = block[:, start:start + size]
+
+            # Slide the transform window by one block
+            self.window[:, :size] = self.window[:, size:]
+            self.window[:, size:] = x
+            spectrum = np.fft.rfft(self.window, axis=-1)
+
+            # Newest spectrum goes first in the delay line window
+            self.position = (self.position - 1) % partitions
+            self.delay_line[:, self.position] = spectrum
+            self.delay_line[:, self.position + partitions] = spectrum
+            recent = self.delay_line[:, self.position:self.position + partitions]
+            np.multiply(recent, self.spectra, out=self.products)
+            np.add.reduce(self.products, axis=1, out=self.accumulator)
+
+            # The second half of the circular result is the valid linear convolution
+            x[...] = np.fft.irfft(self.accumulator, axis=-1)[:, size:]
+        return block
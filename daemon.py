@@ -0,0 +1,693 @@
+import argparse
+import hmac
+import itertools
+import json
+import os
+import secrets
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from devices import AudioDevice
+from filters import MAX_FILTER_ORDER
+from processor import MAX_CHUNK_SIZE, PRESETS, AudioProcessor
+
+# Where the daemon listens: a Unix socket in runtime_dir(), or localhost TCP
+# where there are none (Windows), with a token file in runtime_dir()
+SOCKET_NAME = "protetor-audio.sock"
+DEFAULT_PORT = 47800
+# Log lines kept for clients to pull
+LOG_LINES = 500
+# Values the configure command accepts, per setting
+CONFIG_CHOICES = {
+    'stream_mode': ('blocking', 'callback'),
+    'channels': (1, 2, 4, 6, 8),
+    'isolation': ('thread', 'process'),
+    'multirate': (False, True),
+}
+# Most tones the automatic notch bank may follow at once
+MAX_AUTO_NOTCHES = 16
+
+
+def runtime_dir():
+    """Directory only this user can reach, for the socket and the TCP token
+
+    $XDG_RUNTIME_DIR where it is set (per user, 0700 by definition), else a
+    directory of our own in the temp dir, created 0700 and refused if
+    someone else owns it or can get in.
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base and os.path.isdir(base):
+        return base
+    if not hasattr(os, 'getuid'):
+        # Windows: the temp dir is already per user
+        return tempfile.gettempdir()
+    path = os.path.join(tempfile.gettempdir(), f"protetor-audio-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise DaemonError(f"Diretório {path} não é exclusivo deste usuário; remova-o ou defina XDG_RUNTIME_DIR")
+    return path
+
+
+def is_count(value, low, high):
+    """Whether value is a whole number (not a bool) between low and high"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    if isinstance(value, float) and not value.is_integer():
+        return False
+    return low <= value <= high
+
+
+def default_address():
+    if hasattr(socket, 'AF_UNIX'):
+        return os.path.join(runtime_dir(), SOCKET_NAME)
+    return ('127.0.0.1', DEFAULT_PORT)
+
+
+def token_path(port):
+    """File holding the token TCP clients of the daemon on port must send"""
+    return os.path.join(runtime_dir(), f"protetor-audio-{port}.token")
+
+
+def parse_address(text):
+    """'host:port' or a port number for TCP, anything else is a Unix socket path"""
+    if text is None:
+        return default_address()
+    if text.isdigit():
+        return ('127.0.0.1', int(text))
+    host, _, port = text.rpartition(':')
+    if port.isdigit() and host and os.sep not in host:
+        return (host, int(port))
+    return text
+
+
+def to_json(value):
+    """json.dumps fallback for numpy values"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class DaemonError(RuntimeError):
+    """A command the daemon refused or failed to run"""
+
+
+def write_private(path, text):
+    """Write a file only this user can read, replacing any earlier one"""
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """One client connection: a JSON request per line in, a JSON reply per line out
+
+    Anything that is not a JSON object (a browser's HTTP request line, say)
+    ends the connection without a reply. Over TCP every request must carry
+    the daemon's token.
+    """
+    def handle(self):
+        token = self.server.token
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                return
+            if not isinstance(request, dict):
+                return
+            if token is not None and not hmac.compare_digest(str(request.pop('token', '')), token):
+                self.reply({'ok': False, 'error': "Token inválido"})
+                return
+            try:
+                result = self.server.daemon.handle(request.pop('cmd'), **request)
+                reply = {'ok': True, 'result': result}
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e) or type(e).__name__}
+            self.reply(reply)
+
+    def reply(self, reply):
+        self.wfile.write(json.dumps(reply, default=to_json).encode() + b"\n")
+        self.wfile.flush()
+
+
+class UnixControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Only this user can connect to the socket at all
+    token = None
+
+
+class TCPControlServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class AudioDaemon:
+    """Headless host of an AudioProcessor, controlled over a local socket
+
+    The audio runs exactly as under the GUI (thread or child process),
+    but nothing else does: no window, no meter polling, no device watch.
+    Clients send one JSON object per line, {"cmd": name, ...arguments},
+    and get {"ok": true, "result": ...} or {"ok": false, "error": ...}
+    back; a command name maps to the do_<name> method. Commands run one
+    at a time. The socket is local only: a Unix socket only this user can
+    open, or TCP on localhost where Unix sockets are missing, answering
+    only requests with the token from a file only this user can read.
+    """
+    def __init__(self, processor, address=None):
+        self.processor = processor
+        self.address = default_address() if address is None else address
+        self.lock = threading.Lock()
+        self.preset = None
+        # (number, time, message), newest last, for do_log
+        self.log_lines = deque(maxlen=LOG_LINES)
+        self.log_numbers = itertools.count(1)
+        self.server = None
+        self.token_file = None
+        self.stopped = threading.Event()
+
+    def log(self, message):
+        """Keep a log line for clients and print it; safe from any thread"""
+        now = time.time()
+        self.log_lines.append((next(self.log_numbers), now, message))
+        print(f"[{datetime.fromtimestamp(now).strftime('%H:%M:%S')}] {message}", flush=True)
+
+    def listen(self):
+        """Bind the control socket"""
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                # A daemon still answering there keeps it; a stale socket file is removed
+                try:
+                    DaemonClient(self.address).call('ping')
+                    raise DaemonError(f"Já existe um serviço em {self.address}")
+                except OSError:
+                    try:
+                        os.unlink(self.address)
+                    except OSError as e:
+                        raise DaemonError(f"Não foi possível remover o socket antigo {self.address}: {e}") from e
+            # Created 0600 from the start, not chmod-ed after others could connect
+            umask = os.umask(0o177)
+            try:
+                self.server = UnixControlServer(self.address, ControlHandler)
+            finally:
+                os.umask(umask)
+        else:
+            self.server = TCPControlServer(self.address, ControlHandler)
+            # Port 0 picks a free port; clients need the real one
+            self.address = self.server.server_address
+            self.server.token = secrets.token_hex(16)
+            self.token_file = token_path(self.address[1])
+            write_private(self.token_file, self.server.token)
+        self.server.daemon = self
+
+    def serve(self):
+        """Answer clients until shutdown (from a client or a signal)"""
+        if self.server is None:
+            self.listen()
+        self.log(f"✓ Serviço ouvindo em {self.address}")
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            self.stopped.wait()
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+            for path in (self.address, self.token_file):
+                if isinstance(path, str) and os.path.exists(path):
+                    os.unlink(path)
+            self.processor.close()
+            self.log("✓ Serviço encerrado")
+
+    def shutdown(self):
+        self.stopped.set()
+
+    def handle(self, command, **arguments):
+        """Run one command; returns its JSON-able result"""
+        method = getattr(self, f"do_{command}", None)
+        if method is None:
+            raise DaemonError(f"Comando desconhecido: {command}")
+        with self.lock:
+            return method(**arguments)
+
+    def do_ping(self):
+        return 'pong'
+
+    def do_status(self):
+        p = self.processor
+        registry = p.registry
+        return {
+            'running': p.running,
+            'mode': p.mode,
+            'devices': p.devices,
+            'lowcut': p.lowcut,
+            'highcut': p.highcut,
+            'filter_order': p.filter_order,
+            'preset': self.preset,
+            'gain_db': p.gain_db,
+            'notches': p.notches,
+            'auto_notches': p.auto_notches,
+            'auto_protect': p.auto_protect,
+            'limiter': p.limiter_enabled,
+            'auto_tune': p.auto_tune,
+            'sample_rate': p.sample_rate,
+            'output_rate': p.output_rate,
+            'sample_format': p.sample_format,
+            'chunk_size': p.chunk_size,
+            'channels': p.channels,
+            'stream_mode': p.stream_mode,
+            'isolation': p.isolation,
+            'multirate': p.multirate,
+            'recording': p.recorder is not None,
+            'devices_version': registry.version,
+            'scan_seconds': registry.scan_seconds,
+        }
+
+    def do_devices(self):
+        registry = self.processor.registry
+        recommended = [device.as_dict() if device is not None else None for device in registry.recommend()]
+        return {
+            'inputs': [device.as_dict() for device in registry.inputs],
+            'outputs': [device.as_dict() for device in registry.outputs],
+            'recommended': recommended,
+        }
+
+    def do_refresh_devices(self):
+        """Re-enumerate now; returns whether the list changed"""
+        return self.processor.registry.refresh()
+
+    def do_start(self, input=None, output=None, mode='filter'):
+        """Start (or switch mode on the same devices); None means the system default device"""
+        if mode not in ('filter', 'passthrough'):
+            raise DaemonError(f"Modo desconhecido: {mode}")
+        return self.processor.start(input, output, mode, self.log)
+
+    def do_stop(self):
+        self.processor.stop()
+        return True
+
+    def do_set_mode(self, mode):
+        if mode not in ('filter', 'passthrough'):
+            raise DaemonError(f"Modo desconhecido: {mode}")
+        self.processor.set_mode(mode)
+        return mode
+
+    def do_set_band(self, lowcut, highcut, order=None):
+        lowcut, highcut = float(lowcut), float(highcut)
+        if not 0 < lowcut < highcut < self.processor.sample_rate / 2:
+            raise DaemonError(f"Banda inválida: {lowcut}-{highcut} Hz")
+        if order is not None:
+            if not is_count(order, 1, MAX_FILTER_ORDER):
+                raise DaemonError(f"Ordem inválida: {order} (de 1 a {MAX_FILTER_ORDER})")
+            order = int(order)
+        self.processor.retune(lowcut, highcut, order)
+        self.preset = None
+        return [lowcut, highcut]
+
+    def do_presets(self):
+        return PRESETS
+
+    def do_set_preset(self, name):
+        self.processor.apply_preset(name)
+        self.preset = name
+        self.log(f"✓ Preset {name} aplicado")
+        return PRESETS[name]
+
+    def do_set_response(self, freqs, gains_db):
+        self.processor.set_response(freqs, gains_db)
+        self.preset = None
+        return True
+
+    def do_set_gain(self, gain_db):
+        self.processor.set_gain(float(gain_db))
+        return True
+
+    def do_set_notches(self, notches):
+        self.processor.set_notches(notches)
+        return self.processor.notches
+
+    def do_set_auto_notches(self, count):
+        if not is_count(count, 0, MAX_AUTO_NOTCHES):
+            raise DaemonError(f"Número de notches inválido: {count} (de 0 a {MAX_AUTO_NOTCHES})")
+        self.processor.set_auto_notches(int(count))
+        return True
+
+    def do_set_auto_protect(self, enabled):
+        self.processor.set_auto_protect(bool(enabled))
+        return True
+
+    def do_set_limiter(self, enabled):
+        self.processor.set_limiter(bool(enabled))
+        return True
+
+    def do_set_auto_tune(self, enabled):
+        self.processor.set_auto_tune(bool(enabled))
+        return True
+
+    def do_set_chunk_size(self, chunk_size):
+        if not is_count(chunk_size, 1, MAX_CHUNK_SIZE):
+            raise DaemonError(f"Tamanho de buffer inválido: {chunk_size} (de 1 a {MAX_CHUNK_SIZE} amostras)")
+        self.processor.set_chunk_size(int(chunk_size))
+        return True
+
+    def do_configure(self, **settings):
+        """Stream settings that only apply from the next start: stream_mode, channels, isolation, multirate"""
+        if self.processor.running:
+            raise DaemonError("Pare o áudio antes de mudar essas configurações")
+        # Check everything first so a bad request changes nothing
+        for key, value in settings.items():
+            if key not in CONFIG_CHOICES:
+                raise DaemonError(f"Configuração desconhecida: {key}")
+            if isinstance(value, bool) != (key == 'multirate') or value not in CONFIG_CHOICES[key]:
+                raise DaemonError(f"Valor inválido para {key}: {value!r}")
+        for key, value in settings.items():
+            setattr(self.processor, key, value)
+        return settings
+
+    def do_metrics(self):
+        return self.processor.get_metrics()
+
+    def do_meter(self):
+        return self.processor.get_meter()
+
+    def do_spectrum(self):
+        return self.processor.get_spectrum()
+
+    def do_log(self, after=0):
+        """Log lines numbered above after, oldest first"""
+        return [line for line in self.log_lines if line[0] > after]
+
+    def do_start_recording(self, sources=('output',), max_seconds=None, max_bytes=None):
+        return self.processor.start_recording(sources=sources, max_seconds=max_seconds, max_bytes=max_bytes)
+
+    def do_stop_recording(self):
+        recorder = self.processor.stop_recording()
+        if recorder is None:
+            return None
+        self.log(recorder.summary())
+        return recorder.paths
+
+    def do_measure_latency(self, input=None, output=None):
+        return self.processor.measure_latency(input, output)
+
+    def do_shutdown(self):
+        self.shutdown()
+        return True
+
+
+class DaemonClient:
+    """Connection to an AudioDaemon; call() sends one command and waits for its reply
+
+    Over TCP the token is read from the daemon's token file unless given.
+    """
+    def __init__(self, address=None, timeout=10.0, token=None):
+        address = default_address() if address is None else address
+        if token is None and not isinstance(address, str):
+            with open(token_path(address[1])) as f:
+                token = f.read().strip()
+        self.token = token
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        self.reader = self.sock.makefile('rb')
+        # Several threads (GUI, log poller) share the connection
+        self.lock = threading.Lock()
+
+    def call(self, command, **arguments):
+        """Run a command on the daemon; raises DaemonError if it failed there"""
+        request = dict(arguments, cmd=command)
+        if self.token is not None:
+            request['token'] = self.token
+        message = json.dumps(request, default=to_json).encode() + b"\n"
+        with self.lock:
+            self.sock.sendall(message)
+            line = self.reader.readline()
+        if not line:
+            raise ConnectionError("O serviço fechou a conexão")
+        reply = json.loads(line)
+        if not reply['ok']:
+            raise DaemonError(reply['error'])
+        return reply['result']
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+class RemoteRegistry:
+    """The parts of DeviceRegistry the GUI reads, mirrored from the daemon's status"""
+    def __init__(self):
+        self.version = 0
+        self.holds = 0
+        self.scan_seconds = 0.0
+
+    def watch(self, interval=None):
+        """The daemon owns the devices; its list is refreshed on request"""
+
+
+class RemoteProcessor:
+    """Stand-in for AudioProcessor that drives an AudioDaemon
+
+    Lets the GUI run as an optional client: the audio loop stays in the
+    daemon when the window is closed. Log lines of the daemon are pulled
+    in the background and handed to the log callback given to start().
+    """
+    def __init__(self, client, poll_seconds=0.25):
+        self.client = client
+        self.registry = RemoteRegistry()
+        self.log_callback = None
+        self.log_after = 0
+        self.status = {}
+        self.update_status()
+        # Only lines from now on; the daemon's history is not replayed
+        lines = client.call('log')
+        self.log_after = lines[-1][0] if lines else 0
+        self.polling = True
+        self.poll_seconds = poll_seconds
+        threading.Thread(target=self.poll_log, daemon=True).start()
+
+    def update_status(self):
+        self.status = self.client.call('status')
+        self.registry.version = self.status['devices_version']
+        self.registry.holds = 1 if self.status['running'] else 0
+        self.registry.scan_seconds = self.status['scan_seconds']
+        return self.status
+
+    def poll_log(self):
+        while self.polling:
+            time.sleep(self.poll_seconds)
+            try:
+                lines = self.client.call('log', after=self.log_after)
+            except (OSError, DaemonError):
+                continue
+            for number, _, message in lines:
+                self.log_after = number
+                if self.log_callback is not None:
+                    self.log_callback(message)
+
+    def __getattr__(self, name):
+        # Plain settings (mode, lowcut, chunk_size, ...) come from the last status
+        status = self.__dict__.get('status', {})
+        if name in status:
+            return status[name]
+        raise AttributeError(name)
+
+    @property
+    def running(self):
+        return self.update_status()['running']
+
+    def configure(self, **settings):
+        self.client.call('configure', **settings)
+        self.update_status()
+
+    stream_mode = property(lambda self: self.status['stream_mode'],
+                           lambda self, value: self.configure(stream_mode=value))
+    channels = property(lambda self: self.status['channels'],
+                        lambda self, value: self.configure(channels=value))
+    isolation = property(lambda self: self.status['isolation'],
+                         lambda self, value: self.configure(isolation=value))
+    multirate = property(lambda self: self.status['multirate'],
+                         lambda self, value: self.configure(multirate=value))
+
+    def start(self, input_device, output_device, mode, log_callback):
+        self.log_callback = log_callback
+        started = self.client.call('start', input=input_device, output=output_device, mode=mode)
+        self.update_status()
+        return started
+
+    def stop(self):
+        self.client.call('stop')
+        self.update_status()
+
+    def close(self):
+        """Disconnect, leaving the daemon (and its audio) running"""
+        self.polling = False
+        self.client.close()
+
+    def set_mode(self, mode):
+        self.client.call('set_mode', mode=mode)
+
+    def retune(self, lowcut, highcut, filter_order=None):
+        self.client.call('set_band', lowcut=lowcut, highcut=highcut, order=filter_order)
+        self.update_status()
+
+    def apply_preset(self, name):
+        self.client.call('set_preset', name=name)
+        self.update_status()
+
+    def set_response(self, freqs, gains_db):
+        self.client.call('set_response', freqs=list(freqs), gains_db=list(gains_db))
+
+    def set_gain(self, gain_db):
+        self.client.call('set_gain', gain_db=gain_db)
+
+    def set_notches(self, notches):
+        self.client.call('set_notches', notches=[list(notch) for notch in notches])
+
+    def set_auto_notches(self, count):
+        self.client.call('set_auto_notches', count=count)
+
+    def set_auto_protect(self, enabled):
+        self.client.call('set_auto_protect', enabled=enabled)
+
+    def set_limiter(self, enabled):
+        self.client.call('set_limiter', enabled=enabled)
+
+    def set_auto_tune(self, enabled):
+        self.client.call('set_auto_tune', enabled=enabled)
+
+    def set_chunk_size(self, chunk_size):
+        self.client.call('set_chunk_size', chunk_size=chunk_size)
+
+    def get_meter(self):
+        return self.client.call('meter')
+
+    def get_spectrum(self):
+        sequence, input_db, output_db = self.client.call('spectrum')
+        return sequence, np.array(input_db), np.array(output_db)
+
+    def get_metrics(self):
+        metrics = self.client.call('metrics')
+        self.status['chunk_size'] = metrics.get('chunk_size', self.status['chunk_size'])
+        return metrics
+
+    def get_devices(self):
+        devices = self.client.call('devices')
+        self.update_status()
+        return ([(info['index'], AudioDevice(info, info['hostApiName']).label) for info in devices['inputs']],
+                [(info['index'], AudioDevice(info, info['hostApiName']).label) for info in devices['outputs']])
+
+    def recommend_devices(self):
+        recommended = self.client.call('devices')['recommended']
+        return tuple(AudioDevice(info, info['hostApiName']) if info is not None else None
+                     for info in recommended)
+
+    def refresh_devices(self):
+        """Rescan on the daemon in the background; returns the thread, like AudioProcessor"""
+        def refresh():
+            self.client.call('refresh_devices')
+            self.update_status()
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+        return thread
+
+    def measure_latency(self, input_device, output_device):
+        return tuple(self.client.call('measure_latency', input=input_device, output=output_device))
+
+    def start_recording(self, base=None, sources=('output',), max_seconds=None, max_bytes=None):
+        return self.client.call('start_recording', sources=list(sources), max_seconds=max_seconds,
+                                max_bytes=max_bytes)
+
+    def stop_recording(self):
+        """The daemon logs the summary of the recording"""
+        self.client.call('stop_recording')
+        return None
+
+
+def parse_value(text):
+    """Command-line argument value: JSON if it parses (numbers, true, lists), else a string"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Protetor de áudio sem interface, controlado por socket local")
+    parser.add_argument('--socket', help="caminho do socket Unix, ou porta/host:porta TCP local")
+    commands = parser.add_subparsers(dest='command')
+
+    serve = commands.add_parser('serve', help="roda o serviço (padrão)")
+    serve.add_argument('--input', type=int, help="índice do dispositivo de entrada (padrão do sistema se omitido)")
+    serve.add_argument('--output', type=int, help="índice do dispositivo de saída (padrão do sistema se omitido)")
+    serve.add_argument('--mode', choices=('filter', 'passthrough'), default='filter')
+    serve.add_argument('--preset', choices=sorted(PRESETS))
+    serve.add_argument('--autostart', action='store_true', help="começa a filtrar sem esperar um cliente")
+    serve.add_argument('--sample-rate', type=int, default=44100)
+    serve.add_argument('--chunk-size', type=int, default=512)
+    serve.add_argument('--channels', type=int, default=1)
+    serve.add_argument('--stream-mode', choices=('blocking', 'callback'), default='blocking')
+    serve.add_argument('--isolation', choices=('thread', 'process'), default='thread')
+    serve.add_argument('--auto-tune', action='store_true', help="ajusta o buffer sozinho")
+
+    call = commands.add_parser('call', help="envia um comando a um serviço rodando")
+    call.add_argument('name', help="comando, ex.: status, start, set_band, set_preset, metrics, stop")
+    call.add_argument('arguments', nargs='*', help="argumentos chave=valor, ex.: lowcut=500 highcut=2000")
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parser.parse_args(argv)
+    address = parse_address(args.socket)
+
+    if args.command == 'call':
+        arguments = dict(item.split('=', 1) for item in args.arguments)
+        client = DaemonClient(address)
+        try:
+            result = client.call(args.name, **{key: parse_value(value) for key, value in arguments.items()})
+        except DaemonError as e:
+            print(f"✗ {e}", file=sys.stderr)
+            return 1
+        finally:
+            client.close()
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return 0
+
+    if args.command is None:
+        args = parser.parse_args(argv + ['serve'])
+    processor = AudioProcessor(sample_rate=args.sample_rate, chunk_size=args.chunk_size,
+                               channels=args.channels, stream_mode=args.stream_mode,
+                               isolation=args.isolation, auto_tune=args.auto_tune)
+    daemon = AudioDaemon(processor, address)
+    if args.preset:
+        daemon.handle('set_preset', name=args.preset)
+    if args.autostart:
+        daemon.handle('start', input=args.input, output=args.output, mode=args.mode)
+
+    # Stop cleanly on Ctrl+C and on the service manager's SIGTERM
+    signal.signal(signal.SIGINT, lambda *_: daemon.shutdown())
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, lambda *_: daemon.shutdown())
+    daemon.serve()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
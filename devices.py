@@ -0,0 +1,445 @@
+import threading
+import time
+
+import pyaudio
+
+from buffers import SAMPLE_FORMATS
+
+# Seconds between background rescans looking for plugged/unplugged devices; each
+# one reinitializes PortAudio, so they are rare and refresh() covers the rest
+DEVICE_POLL_SECONDS = 60.0
+# Rates tried after the devices' own, most common first
+COMMON_SAMPLE_RATES = (48000, 44100, 96000, 88200, 32000, 22050, 16000)
+
+
+class AudioDevice:
+    """One PortAudio device, as reported when the registry last scanned"""
+    def __init__(self, info, host_api_name):
+        self.info = info
+        self.index = info['index']
+        self.name = info['name']
+        self.host_api = info['hostApi']
+        self.host_api_name = host_api_name
+        self.max_input_channels = info['maxInputChannels']
+        self.max_output_channels = info['maxOutputChannels']
+        self.default_sample_rate = info['defaultSampleRate']
+        # Lowest latency the host API advertises for interactive use, in seconds
+        self.input_latency = info['defaultLowInputLatency']
+        self.output_latency = info['defaultLowOutputLatency']
+
+    @property
+    def is_input(self):
+        return self.max_input_channels > 0
+
+    @property
+    def is_output(self):
+        return self.max_output_channels > 0
+
+    @property
+    def key(self):
+        """Identity that survives re-enumeration (indices can shift when devices come and go)"""
+        return (self.name, self.host_api_name)
+
+    @property
+    def label(self):
+        return f"{self.name} ({self.host_api_name})"
+
+    def as_dict(self):
+        """PortAudio-style info dict plus the host API name, e.g. to send as JSON"""
+        return dict(self.info, hostApiName=self.host_api_name)
+
+    def __repr__(self):
+        return f"AudioDevice({self.index}, {self.label!r})"
+
+
+def scan_devices(p):
+    """Every device of every host API of a PyAudio instance, by global index
+
+    Also returns the default input and output device indices (None when
+    there is none).
+    """
+    devices = []
+    for api in range(p.get_host_api_count()):
+        api_info = p.get_host_api_info_by_index(api)
+        for i in range(api_info['deviceCount']):
+            info = p.get_device_info_by_host_api_device_index(api, i)
+            devices.append(AudioDevice(info, api_info['name']))
+    devices.sort(key=lambda device: device.index)
+
+    defaults = []
+    for get_default in (p.get_default_input_device_info, p.get_default_output_device_info):
+        try:
+            defaults.append(get_default()['index'])
+        except OSError:
+            defaults.append(None)
+    return devices, defaults[0], defaults[1]
+
+
+def recommend_pair(devices):
+    """Input and output device with the lowest advertised round-trip latency
+
+    Pairs on the same host API are preferred, as each API has its own
+    clocking and buffering; across APIs only if no API has both. Returns
+    (input, output), either None when no device qualifies.
+    """
+    inputs = [device for device in devices if device.is_input]
+    outputs = [device for device in devices if device.is_output]
+    best = None
+    for host_api in {device.host_api for device in devices}:
+        api_inputs = [device for device in inputs if device.host_api == host_api]
+        api_outputs = [device for device in outputs if device.host_api == host_api]
+        if api_inputs and api_outputs:
+            pair = (min(api_inputs, key=lambda device: device.input_latency),
+                    min(api_outputs, key=lambda device: device.output_latency))
+            if best is None or pair_latency(pair) < pair_latency(best):
+                best = pair
+    if best is None:
+        best = (min(inputs, key=lambda device: device.input_latency, default=None),
+                min(outputs, key=lambda device: device.output_latency, default=None))
+    return best
+
+
+def pair_latency(pair):
+    """Advertised input plus output latency of a device pair, in seconds"""
+    return pair[0].input_latency + pair[1].output_latency
+
+
+def device_info(p, device, input):
+    """PortAudio info of a device index, or of the default input/output device for None"""
+    if device is None:
+        return p.get_default_input_device_info() if input else p.get_default_output_device_info()
+    return p.get_device_info_by_index(device)
+
+
+def supports_rate(p, device, rate, channels=1, input=True, format=pyaudio.paInt16):
+    """Whether PortAudio can open device (None for the default) at rate with channels"""
+    try:
+        index = device_info(p, device, input)['index']
+        if input:
+            return bool(p.is_format_supported(rate, input_device=index, input_channels=channels,
+                                              input_format=format))
+        return bool(p.is_format_supported(rate, output_device=index, output_channels=channels,
+                                          output_format=format))
+    except (OSError, ValueError):
+        return False
+
+
+def negotiate_rates(p, input_device, output_device, channels=1, preferred=44100, min_rate=0.0):
+    """(input rate, output rate) to open a device pair at
+
+    The devices' own (default) rates come first, then preferred, then
+    COMMON_SAMPLE_RATES: at a rate a device runs natively, the OS mixer
+    has nothing to resample. One rate both devices support wins, so the
+    stream needs no resampling at all; only when there is none does each
+    side get its own best rate. Rates not above min_rate (twice the
+    highest frequency that must survive) are skipped. If PortAudio
+    confirms nothing, (preferred, preferred) is returned and opening the
+    streams reports the error.
+    """
+    candidates = []
+    for device, is_input in ((input_device, True), (output_device, False)):
+        try:
+            candidates.append(int(device_info(p, device, is_input)['defaultSampleRate']))
+        except OSError:
+            pass
+    candidates += [int(preferred), *COMMON_SAMPLE_RATES]
+    candidates = [rate for rate in dict.fromkeys(candidates) if rate > min_rate]
+
+    input_rates = [rate for rate in candidates if supports_rate(p, input_device, rate, channels, True)]
+    output_rates = [rate for rate in candidates if supports_rate(p, output_device, rate, channels, False)]
+    for rate in input_rates:
+        if rate in output_rates:
+            return rate, rate
+    if input_rates and output_rates:
+        return input_rates[0], output_rates[0]
+    return int(preferred), int(preferred)
+
+
+def negotiate_format(p, input_device, output_device, channels=1, input_rate=44100, output_rate=None):
+    """Name of the first of buffers.SAMPLE_FORMATS both devices open at their rates
+
+    Both sides get the same format, so a chunk is converted once on the
+    way in and once on the way out. 'int16' is the fallback when nothing
+    better is confirmed.
+    """
+    if output_rate is None:
+        output_rate = input_rate
+    for name, sample_format in SAMPLE_FORMATS.items():
+        if (supports_rate(p, input_device, input_rate, channels, True, sample_format.pa_format)
+                and supports_rate(p, output_device, output_rate, channels, False, sample_format.pa_format)):
+            return name
+    return 'int16'
+
+
+class DeviceRegistry:
+    """Cached device list across all host APIs, refreshed off the GUI thread
+
+    PortAudio enumerates devices only when it is initialized, and only the
+    first of several live PyAudio instances initializes it, so picking up a
+    hot-plugged device means terminating the instance and creating a new
+    one. The registry owns that instance: streams must be opened on it,
+    since device indices only hold for the enumeration that produced them.
+    While a session holds it, a refresh keeps the current list instead of
+    re-initializing under the open streams.
+
+    The scan result is published as one tuple and read by reference, so
+    readers in any thread never see a half-updated list; version counts
+    changes, for pollers like the GUI.
+    """
+    def __init__(self, backend=pyaudio.PyAudio):
+        # Factory of PyAudio instances; a FakePyAudio for tests and benchmarks,
+        # NullPyAudio for offline processing
+        self.backend = backend
+        # Held while the instance is swapped or kept for an open session
+        self.lock = threading.Lock()
+        self.holds = 0
+        self.p = backend()
+        self.version = 0
+        self.scan_seconds = 0.0
+        self.snapshot = ([], None, None)
+        self.publish(*scan_devices(self.p))
+        self.refresh_thread = None
+        self.watching = threading.Event()
+
+    @property
+    def devices(self):
+        return self.snapshot[0]
+
+    @property
+    def inputs(self):
+        return [device for device in self.snapshot[0] if device.is_input]
+
+    @property
+    def outputs(self):
+        return [device for device in self.snapshot[0] if device.is_output]
+
+    @property
+    def default_input(self):
+        return self.find(self.snapshot[1])
+
+    @property
+    def default_output(self):
+        return self.find(self.snapshot[2])
+
+    def find(self, index):
+        """Device with a given global index in the cached list, or None"""
+        for device in self.snapshot[0]:
+            if device.index == index:
+                return device
+        return None
+
+    def find_key(self, key):
+        """Device with a given (name, host API) in the cached list, or None"""
+        for device in self.snapshot[0]:
+            if device.key == key:
+                return device
+        return None
+
+    def recommend(self):
+        """Lowest-latency (input, output) pair of the cached list"""
+        return recommend_pair(self.snapshot[0])
+
+    def publish(self, devices, default_input, default_output):
+        """Replace the cached list, bumping version if anything changed"""
+        snapshot = (devices, default_input, default_output)
+        signature = lambda snap: ([(d.index, d.key, d.max_input_channels, d.max_output_channels)
+                                   for d in snap[0]], snap[1], snap[2])
+        if signature(snapshot) != signature(self.snapshot) or not self.version:
+            self.snapshot = snapshot
+            self.version += 1
+
+    def hold(self):
+        """Keep the current PortAudio instance for an open session"""
+        with self.lock:
+            self.holds += 1
+        return self.p
+
+    def release(self):
+        """End a hold() taken for a session"""
+        with self.lock:
+            self.holds = max(0, self.holds - 1)
+
+    def refresh(self):
+        """Re-enumerate now (in the calling thread); True if the list changed"""
+        version = self.version
+        with self.lock:
+            start = time.perf_counter()
+            if not self.holds:
+                self.p.terminate()
+                self.p = self.backend()
+                self.publish(*scan_devices(self.p))
+            self.scan_seconds = time.perf_counter() - start
+        return self.version != version
+
+    def refresh_async(self):
+        """Re-enumerate in a background thread, unless one is already running"""
+        thread = self.refresh_thread
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=self.refresh, daemon=True)
+            self.refresh_thread = thread
+            thread.start()
+        return thread
+
+    def watch(self, interval=DEVICE_POLL_SECONDS):
+        """Rescan every interval seconds in the background, to notice hot-plugged devices"""
+        if self.watching.is_set():
+            return
+        self.watching.set()
+
+        def poll():
+            while self.watching.is_set():
+                time.sleep(interval)
+                if self.watching.is_set() and not self.holds:
+                    self.refresh()
+
+        threading.Thread(target=poll, daemon=True).start()
+
+    def close(self):
+        """Stop watching and release PortAudio"""
+        self.watching.clear()
+        thread = self.refresh_thread
+        if thread is not None:
+            thread.join()
+        with self.lock:
+            self.p.terminate()
+
+
+class NullPyAudio:
+    """Backend with no audio devices, for processors that never open a stream
+
+    Offline processing (batch.py) runs the same pipeline as the live path
+    without touching PortAudio: the device list is empty and opening a
+    stream raises OSError.
+    """
+    def open(self, *args, **kwargs):
+        raise OSError("Sem dispositivos de áudio: processamento offline")
+
+    def is_format_supported(self, rate, **kwargs):
+        raise ValueError("Sem dispositivos de áudio: processamento offline")
+
+    def get_host_api_count(self):
+        return 0
+
+    def get_device_count(self):
+        return 0
+
+    def get_device_info_by_index(self, index):
+        raise OSError("Invalid device index")
+
+    def get_default_input_device_info(self):
+        raise OSError("No Default Device Available")
+
+    def get_default_output_device_info(self):
+        raise OSError("No Default Device Available")
+
+    def terminate(self):
+        pass
+
+
+class FakePyAudio:
+    """Stand-in for pyaudio.PyAudio for tests and benchmarks
+
+    host_apis is a list of (name, devices), each device a dict with at
+    least name and the channel counts; the rest is filled with typical
+    values; a device may list the only rates it opens at as supportedRates
+    (any rate by default) and the PyAudio sample formats as
+    supportedFormats (only paInt16 by default, what autotune.JitterDevice
+    carries unless told otherwise). Every instance enumerates the list as it is when created, like
+    PortAudio does, so editing the list and creating a new instance
+    simulates hot-plugging. scan_delay slows creation down like a real
+    driver scan.
+
+    Streams need a device: a factory called with (rate, channels,
+    frames_per_buffer) returning a simulated card such as
+    autotune.JitterDevice. The input and output streams opened on it
+    share that card (whatever device indices are asked for) until both
+    are closed. Only blocking streams are simulated.
+    """
+    def __init__(self, host_apis, scan_delay=0.0, device=None):
+        time.sleep(scan_delay)
+        self.device = device
+        self.card = None
+        self.host_apis = []
+        self.devices = []
+        for api, (api_name, devices) in enumerate(host_apis):
+            indices = []
+            for device in devices:
+                info = {
+                    'index': len(self.devices),
+                    'hostApi': api,
+                    'maxInputChannels': 0,
+                    'maxOutputChannels': 0,
+                    'defaultSampleRate': 44100.0,
+                    'defaultLowInputLatency': 0.01,
+                    'defaultLowOutputLatency': 0.01,
+                    'defaultHighInputLatency': 0.1,
+                    'defaultHighOutputLatency': 0.1,
+                }
+                info.update(device)
+                indices.append(info['index'])
+                self.devices.append(info)
+            self.host_apis.append({'index': api, 'name': api_name, 'deviceCount': len(indices),
+                                   'devices': indices})
+        self.terminated = False
+
+    @classmethod
+    def factory(cls, host_apis, scan_delay=0.0, device=None):
+        """Backend for DeviceRegistry enumerating host_apis (edited in place to hot-plug)"""
+        return lambda: cls(host_apis, scan_delay, device)
+
+    def open(self, rate, channels, format, input=False, output=False, input_device_index=None,
+             output_device_index=None, frames_per_buffer=1024, stream_callback=None, **kwargs):
+        if self.device is None:
+            raise OSError("FakePyAudio has no simulated device")
+        if stream_callback is not None:
+            raise OSError("FakePyAudio only simulates blocking streams")
+        if self.card is None or self.card.closed:
+            self.card = self.device(rate, channels, frames_per_buffer)
+        return self.card.open_stream(input)
+
+    def is_format_supported(self, rate, input_device=None, input_channels=None, input_format=None,
+                            output_device=None, output_channels=None, output_format=None):
+        for device, channels, sample_format, channels_key in (
+                (input_device, input_channels, input_format, 'maxInputChannels'),
+                (output_device, output_channels, output_format, 'maxOutputChannels')):
+            if device is None:
+                continue
+            info = self.devices[device]
+            if channels > info[channels_key]:
+                raise ValueError("Invalid number of channels", pyaudio.paInvalidChannelCount)
+            rates = info.get('supportedRates')
+            if rates is not None and rate not in rates:
+                raise ValueError("Invalid sample rate", pyaudio.paInvalidSampleRate)
+            if sample_format not in info.get('supportedFormats', (pyaudio.paInt16,)):
+                raise ValueError("Sample format not supported", pyaudio.paSampleFormatNotSupported)
+        return True
+
+    def get_host_api_count(self):
+        return len(self.host_apis)
+
+    def get_host_api_info_by_index(self, index):
+        return dict(self.host_apis[index])
+
+    def get_device_count(self):
+        return len(self.devices)
+
+    def get_device_info_by_index(self, index):
+        return dict(self.devices[index])
+
+    def get_device_info_by_host_api_device_index(self, host_api_index, host_api_device_index):
+        return dict(self.devices[self.host_apis[host_api_index]['devices'][host_api_device_index]])
+
+    def default_device(self, channels_key):
+        for device in self.devices:
+            if device[channels_key] > 0:
+                return dict(device)
+        raise OSError("No Default Device Available")
+
+    def get_default_input_device_info(self):
+        return self.default_device('maxInputChannels')
+
+    def get_default_output_device_info(self):
+        return self.default_device('maxOutputChannels')
+
+    def terminate(self):
+        self.terminated = True
@@ -0,0 +1,140 @@
+import math
+
+import numpy as np
+
+# Largest int16 sample, the 0 dBFS reference of the work buffers
+FULL_SCALE = 32767.0
+
+
+class Limiter:
+    """Look-ahead peak limiter/compressor working on whole chunks
+
+    The gain reduction needed by each sample (linked across channels) goes
+    through three vectorized steps instead of a per-sample loop:
+
+    - release: an exponential decay, which is a running maximum of the
+      reduction scaled by a^-k, so np.maximum.accumulate computes it;
+    - hold: the maximum over the next lookahead samples (van Herk/Gil-Werman:
+      prefix and suffix running maxima over window-sized blocks), so the
+      reduction for a peak is in place before the peak is played;
+    - attack: a moving average over lookahead samples (a cumsum), which
+      turns the held steps into ramps without ever undershooting a peak.
+
+    The audio is delayed by the look-ahead, so peaks over the ceiling are
+    turned down smoothly instead of being clipped. With ratio=inf it is a
+    limiter; a finite ratio makes it a compressor above the threshold.
+    """
+    def __init__(self, sample_rate=44100, channels=1, threshold_db=-1.0, ratio=math.inf,
+                 lookahead_ms=2.0, release_ms=80.0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.threshold_db = threshold_db
+        self.ratio = ratio
+        self.lookahead = max(1, int(round(lookahead_ms * 1e-3 * sample_rate)))
+        # Per-sample decay of the gain reduction during release
+        self.release_coeff = math.exp(-1.0 / (release_ms * 1e-3 * sample_rate))
+        self.resize(0)
+
+    @property
+    def slope(self):
+        """dB of reduction per dB over the threshold"""
+        return 1.0 - 1.0 / self.ratio
+
+    def resize(self, frames):
+        """(Re)allocate the work buffers for chunks of a given length"""
+        lookahead = self.lookahead
+        self.frames = frames
+        # Audio and reduction histories followed by the current chunk
+        self.audio = np.zeros((self.channels, lookahead + frames), dtype=np.float32)
+        # The envelope is padded with -inf to whole hold windows
+        window = lookahead + 1
+        padded = window * int(math.ceil((lookahead + frames) / window))
+        self.padded_envelope = np.full(padded, -np.inf)
+        self.envelope = self.padded_envelope[:lookahead + frames]
+        self.envelope.fill(0)
+        self.prefix_max = np.zeros(padded)
+        self.suffix_max = np.zeros(padded)
+        self.held = np.zeros(lookahead + frames)
+        self.held_sum = np.zeros(lookahead + frames + 1)
+        self.reduction = np.zeros(frames)
+        self.gain = np.zeros(frames, dtype=np.float32)
+        # Release decay a^k and its inverse over one chunk
+        steps = np.arange(frames)
+        self.decay = self.release_coeff ** steps
+        self.growth = self.release_coeff ** -steps
+        self.last_envelope = 0.0
+
+    def reset(self):
+        """Clear the delay line and the envelope"""
+        self.audio.fill(0)
+        self.envelope.fill(0)
+        self.held.fill(0)
+        self.last_envelope = 0.0
+
+    @property
+    def gain_reduction_db(self):
+        """Reduction applied at the end of the latest chunk, in dB"""
+        if not self.frames:
+            return 0.0
+        return max(0.0, float(-20 * np.log10(max(self.gain[-1], 1e-6))))
+
+    def process_inplace(self, block):
+        """Limit a (channels, n) float32 block at int16 scale in place, delayed by the look-ahead"""
+        frames = block.shape[1]
+        lookahead = self.lookahead
+        if frames != self.frames:
+            # Keep the delay line and the envelope across the new buffers
+            audio = self.audio[:, :lookahead].copy()
+            envelope = self.envelope[:lookahead].copy()
+            held = self.held[:lookahead].copy()
+            last_envelope = self.last_envelope
+            self.resize(frames)
+            self.audio[:, :lookahead] = audio
+            self.envelope[:lookahead] = envelope
+            self.held[:lookahead] = held
+            self.last_envelope = last_envelope
+        self.audio[:, lookahead:] = block
+
+        # Reduction each sample needs, in dB, from the loudest channel
+        reduction = self.reduction
+        np.max(np.abs(block), axis=0, out=reduction)
+        np.maximum(reduction, 1e-3, out=reduction)
+        np.log10(reduction, out=reduction)
+        reduction *= 20
+        reduction -= 20 * math.log10(FULL_SCALE) + self.threshold_db
+        np.maximum(reduction, 0, out=reduction)
+        reduction *= self.slope
+
+        # Release: env[k] = max(last * a^(k+1), max_j<=k r[j] * a^(k-j))
+        envelope = self.envelope[lookahead:]
+        np.multiply(reduction, self.growth, out=envelope)
+        np.maximum.accumulate(envelope, out=envelope)
+        envelope *= self.decay
+        np.maximum(envelope, self.last_envelope * self.release_coeff * self.decay, out=envelope)
+        self.last_envelope = envelope[-1]
+
+        # Hold: the reduction of the delayed sample is the max over the look-ahead,
+        # max(suffix max of its block, prefix max of the block the window ends in)
+        window = lookahead + 1
+        blocks = self.padded_envelope.reshape(-1, window)
+        np.maximum.accumulate(blocks, axis=1, out=self.prefix_max.reshape(-1, window))
+        np.maximum.accumulate(blocks[:, ::-1], axis=1, out=self.suffix_max.reshape(-1, window)[:, ::-1])
+        held = self.held[lookahead:]
+        np.maximum(self.suffix_max[:frames], self.prefix_max[lookahead:lookahead + frames], out=held)
+
+        # Attack: moving average of the held reduction over the look-ahead
+        np.cumsum(self.held, out=self.held_sum[1:])
+        smoothed = self.reduction
+        np.subtract(self.held_sum[lookahead + 1:], self.held_sum[:frames], out=smoothed)
+        smoothed *= -1.0 / (20 * (lookahead + 1))
+        np.power(10.0, smoothed, out=smoothed)
+        self.gain[:] = smoothed
+
+        # Output the delayed audio with the gain applied
+        np.multiply(self.audio[:, :frames], self.gain, out=block)
+
+        # Keep the tails as history for the next chunk
+        self.audio[:, :lookahead] = self.audio[:, frames:]
+        self.envelope[:lookahead] = self.envelope[frames:]
+        self.held[:lookahead] = self.held[frames:]
+        return block
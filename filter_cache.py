@@ -0,0 +1,99 @@
+import os
+import tempfile
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+# Where designs are stored between runs (TEAUDIO_FILTER_CACHE overrides it)
+DEFAULT_CACHE_DIR = os.environ.get(
+    "TEAUDIO_FILTER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".teaudio", "filter_cache")
+)
+
+
+class FilterDesignCache:
+    """Filter coefficients keyed by (lowcut, highcut, order, sample_rate, topology)
+
+    Recently used designs stay in an in-memory LRU; every design is also
+    saved as a small .npz file so later runs load it instead of designing.
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_entries=64):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def make_key(lowcut, highcut, order, sample_rate, topology):
+        """Normalized cache key (cutoffs rounded to 1 mHz)"""
+        return (round(float(lowcut), 3), round(float(highcut), 3), int(order),
+                round(float(sample_rate), 3), str(topology))
+
+    def path_for(self, key):
+        """File that stores the design for a key"""
+        lowcut, highcut, order, sample_rate, topology = key
+        name = f"{topology}_{sample_rate:g}_{order}_{lowcut:.3f}_{highcut:.3f}.npz"
+        return os.path.join(self.directory, name)
+
+    def get(self, key):
+        """Cached coefficients for a key, or None"""
+        coefficients = self.entries.get(key)
+        if coefficients is not None:
+            self.entries.move_to_end(key)
+            return coefficients
+
+        path = self.path_for(key) if self.directory else None
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as stored:
+                coefficients = stored['coefficients']
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            # Corrupt or partial file, design again
+            return None
+
+        self.remember(key, coefficients)
+        return coefficients
+
+    def put(self, key, coefficients):
+        """Store coefficients in memory and on disk"""
+        self.remember(key, coefficients)
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path_for(key)
+            # Write to a temporary file of our own first, so readers never see a
+            # partial one and other processes saving the same design don't clash
+            temp = tempfile.NamedTemporaryFile(dir=self.directory, prefix=".tmp_", suffix=".npz",
+                                               delete=False)
+            try:
+                with temp:
+                    np.savez(temp, coefficients=coefficients)
+                os.replace(temp.name, path)
+            except OSError:
+                os.remove(temp.name)
+                raise
+        except OSError:
+            # Read-only home or full disk: keep working from memory
+            pass
+
+    def remember(self, key, coefficients):
+        """Insert into the in-memory LRU, evicting the oldest entry when full"""
+        coefficients.setflags(write=False)
+        self.entries[key] = coefficients
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self, disk=False):
+        """Forget cached designs (and optionally delete the files)"""
+        self.entries.clear()
+        if disk and self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+# Shared by every filter design in the process
+DESIGN_CACHE = FilterDesignCache()
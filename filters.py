@@ -0,0 +1,222 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from filter_cache import DESIGN_CACHE
+
+# Highest Butterworth order we allow (a bandpass of order N has N sections)
+MAX_FILTER_ORDER = 8
+
+# Samples per step of the block kernel; chunks are filtered in steps of this size
+KERNEL_BLOCK = 256
+
+
+def check_band(lowcut, highcut, sample_rate, order):
+    """Raise ValueError unless a bandpass of this order can be designed for the band"""
+    if order != int(order) or not 1 <= order <= MAX_FILTER_ORDER:
+        raise ValueError(f"Filter order must be between 1 and {MAX_FILTER_ORDER}")
+    if not 0 < lowcut < highcut < 0.5 * sample_rate:
+        raise ValueError(f"Band {lowcut:g}-{highcut:g} Hz must lie between 0 and {0.5 * sample_rate:g} Hz")
+
+
+def design_bandpass_sos(lowcut, highcut, sample_rate, order=4, cache=DESIGN_CACHE):
+    """Design a Butterworth bandpass as float32 second-order sections
+
+    Designs are looked up in the cache first, so scipy.signal is only
+    imported when a configuration has never been designed before.
+    """
+    check_band(lowcut, highcut, sample_rate, order)
+
+    key = None
+    if cache is not None:
+        key = cache.make_key(lowcut, highcut, order, sample_rate, 'bandpass')
+        sos = cache.get(key)
+        if sos is not None:
+            return sos
+
+    from scipy import signal
+
+    nyquist = 0.5 * sample_rate
+    low = lowcut / nyquist
+    high = highcut / nyquist
+    sos = signal.butter(order, [low, high], btype='band', output='sos').astype(np.float32)
+
+    if cache is not None:
+        cache.put(key, sos)
+    return sos
+
+
+def design_notch_sos(freq, sample_rate, q=30.0):
+    """Second-order notch at freq as a single float32 section
+
+    Closed form (the RBJ cookbook notch), so no design library is needed;
+    q is the centre frequency over the -3 dB bandwidth.
+    """
+    if not 0 < freq < 0.5 * sample_rate:
+        raise ValueError("Notch frequency must be between 0 and the Nyquist frequency")
+
+    w0 = 2 * np.pi * freq / sample_rate
+    alpha = np.sin(w0) / (2 * q)
+    a0 = 1 + alpha
+    section = [1 / a0, -2 * np.cos(w0) / a0, 1 / a0, 1.0, -2 * np.cos(w0) / a0, (1 - alpha) / a0]
+    return np.array([section], dtype=np.float32)
+
+
+def sos_state_space(sos):
+    """State-space matrices (A, B, C, D) of a cascade of second-order sections
+
+    The state vector is the transposed direct form II state of every section,
+    in the same order as sosfilt's zi (section 0 z0, section 0 z1, ...).
+    """
+    sos = np.asarray(sos, dtype=np.float64)
+    n_state = 2 * len(sos)
+    A = np.zeros((n_state, n_state))
+    B = np.zeros(n_state)
+
+    # Input of the current section written as c_in . z + d_in * x
+    c_in = np.zeros(n_state)
+    d_in = 1.0
+    for k, section in enumerate(sos):
+        b0, b1, b2, _, a1, a2 = section / section[3]
+        c_out = b0 * c_in
+        c_out[2 * k] += 1.0
+        d_out = b0 * d_in
+
+        A[2 * k] = b1 * c_in - a1 * c_out
+        A[2 * k, 2 * k + 1] += 1.0
+        B[2 * k] = b1 * d_in - a1 * d_out
+        A[2 * k + 1] = b2 * c_in - a2 * c_out
+        B[2 * k + 1] = b2 * d_in - a2 * d_out
+
+        c_in, d_in = c_out, d_out
+
+    return A, B, c_in, d_in
+
+
+class SOSFilter:
+    """Stateful cascade of second-order sections
+
+    Filtering uses an exact block form of the cascade: for a step of n
+    samples, output = T x + O z and next state = G x + P z, where T is the
+    lower-triangular Toeplitz matrix of the impulse response. Each step is a
+    few float32 matrix products, so there is no per-sample Python and no
+    need for scipy.signal once the sections are known.
+
+    Blocks have one row per channel and every channel has its own state, so
+    all channels are filtered by the same matrix products at once.
+    """
+    def __init__(self, sos, channels=1, block_size=KERNEL_BLOCK):
+        self.sos = np.ascontiguousarray(sos, dtype=np.float32)
+        self.channels = channels
+        self.zi = np.zeros((channels, self.sos.shape[0], 2), dtype=np.float32)
+        # The same state with one row vector per channel, the layout the kernel works on
+        self._state = self.zi.reshape(channels, -1)
+        self.block_size = block_size
+        self._build_kernel()
+
+    def _build_kernel(self):
+        """Precompute the block matrices for steps of up to block_size samples"""
+        A, B, C, D = sos_state_space(self.sos)
+        n_state = len(B)
+        size = self.block_size
+
+        # powers[n] = A^n, by doubling: the next stretch of powers is the
+        # ones so far times the highest one plus A
+        powers = np.empty((size + 1, n_state, n_state))
+        powers[0] = np.eye(n_state)
+        known = 1
+        while known < size + 1:
+            stretch = min(known, size + 1 - known)
+            np.matmul(powers[:stretch], powers[known - 1] @ A, out=powers[known:known + stretch])
+            known += stretch
+        # observe[n] = C A^n
+        observe = C @ powers[:size]
+
+        # Impulse response h[0] = D, h[n] = C A^(n-1) B
+        impulse = np.empty(size)
+        impulse[0] = D
+        impulse[1:] = observe[:-1] @ B
+
+        # Lower-triangular Toeplitz matrix, toeplitz[i, j] = h[i - j]
+        padded = np.concatenate([np.zeros(size - 1), impulse])
+        toeplitz = sliding_window_view(padded, size)[:, ::-1]
+
+        # Kernel matrices, transposed for row-vector products (x @ M)
+        self._toeplitz_t = np.ascontiguousarray(toeplitz.T, dtype=np.float32)
+        self._observe_t = np.ascontiguousarray(observe.T, dtype=np.float32)
+        # Row k drives the state with A^(size-1-k) B; a shorter step of r
+        # samples uses the last r rows
+        self._drive = np.ascontiguousarray(powers[size - 1::-1] @ B, dtype=np.float32)
+        self._powers_t = np.ascontiguousarray(powers.transpose(0, 2, 1), dtype=np.float32)
+
+        # Scratch for one step
+        self._out = np.zeros((self.channels, size), dtype=np.float32)
+        self._tmp = np.zeros((self.channels, size), dtype=np.float32)
+        self._next_state = np.zeros((self.channels, n_state), dtype=np.float32)
+        self._tmp_state = np.zeros((self.channels, n_state), dtype=np.float32)
+
+    @classmethod
+    def bandpass(cls, lowcut, highcut, sample_rate, order=4, channels=1):
+        """Create a Butterworth bandpass filter"""
+        return cls(design_bandpass_sos(lowcut, highcut, sample_rate, order), channels)
+
+    @classmethod
+    def notch(cls, freq, sample_rate, q=30.0, channels=1):
+        """Create a second-order notch filter"""
+        return cls(design_notch_sos(freq, sample_rate, q), channels)
+
+    @property
+    def order(self):
+        return self.sos.shape[0]
+
+    def reset(self):
+        """Clear the filter state"""
+        self.zi.fill(0)
+
+    def process(self, samples):
+        """Filter one chunk of float32 samples, carrying state to the next
+
+        Takes a 1-D chunk for a mono filter or a (channels, n) block.
+        """
+        block = np.array(samples, dtype=np.float32, ndmin=2)
+        self.process_inplace(block)
+        return block[0] if np.ndim(samples) == 1 else block
+
+    def process_inplace(self, block):
+        """Filter a C-contiguous float32 block of shape (channels, n) in place"""
+        size = self.block_size
+        state = self._state
+        for start in range(0, block.shape[1], size):
+            x = block[:, start:start + size]
+            r = x.shape[1]
+            out = self._out[:, :r]
+            tmp = self._tmp[:, :r]
+
+            # Output: T x + O z
+            np.matmul(x, self._toeplitz_t[:r, :r], out=out)
+            np.matmul(state, self._observe_t[:, :r], out=tmp)
+            out += tmp
+
+            # Next state: G x + A^r z
+            np.matmul(x, self._drive[size - r:], out=self._next_state)
+            np.matmul(state, self._powers_t[r], out=self._tmp_state)
+            np.add(self._next_state, self._tmp_state, out=state)
+
+            x[...] = out
+        return block
+
+
+def crossfade_filters(old_filter, new_filter, block, scratch, fade_in):
+    """Filter a block with both filters, fading from the old to the new output
+
+    Used to swap coefficients mid-stream: the new filter starts from silence
+    while the old one keeps its state, and the fade hides both the switch
+    and the new filter's start-up transient. Works in place on block.
+    """
+    np.copyto(scratch, block)
+    old_filter.process_inplace(block)
+    new_filter.process_inplace(scratch)
+    # block += (scratch - block) * fade_in, without temporaries
+    np.subtract(scratch, block, out=scratch)
+    np.multiply(scratch, fade_in, out=scratch)
+    np.add(block, scratch, out=block)
+    return block
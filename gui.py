@@ -1,141 +1,33 @@
 import customtkinter as ctk
-import pyaudio
-import numpy as np
-from scipy import signal
+import math
+import sys
 import threading
-from datetime import datetime
-
-class AudioProcessor:
-    """Handles both passthrough and filtering audio processing"""
-    def __init__(self, sample_rate=44100, chunk_size=512):
-        self.sample_rate = sample_rate
-        self.chunk_size = chunk_size
-        self.running = False
-        self.mode = None  # 'passthrough' or 'filter'
-        
-        # Filter design
-        self.lowcut = 700.0
-        self.highcut = 1300.0
-        self.nyquist = 0.5 * self.sample_rate
-        
-        self.update_filter()
-        
-        self.p = pyaudio.PyAudio()
-        self.stream_in = None
-        self.stream_out = None
-        self.processing_thread = None
-    
-    def update_filter(self):
-        """Update filter coefficients based on current cutoff frequencies"""
-        low = self.lowcut / self.nyquist
-        high = self.highcut / self.nyquist
-        self.b, self.a = signal.butter(3, [low, high], btype='band')
-        self.zi = signal.lfilter_zi(self.b, self.a) * 0
-        
-    def get_devices(self):
-        """Get list of available audio devices"""
-        info = self.p.get_host_api_info_by_index(0)
-        numdevices = info.get('deviceCount')
-        
-        input_devices = []
-        output_devices = []
-        
-        for i in range(0, numdevices):
-            device_info = self.p.get_device_info_by_host_api_device_index(0, i)
-            if device_info.get('maxInputChannels') > 0:
-                input_devices.append((i, device_info.get('name')))
-            if device_info.get('maxOutputChannels') > 0:
-                output_devices.append((i, device_info.get('name')))
-        
-        return input_devices, output_devices
-    
-    def apply_filter(self, audio_data):
-        """Apply bandpass filter to audio data"""
-        audio_array = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32)
-        filtered, self.zi = signal.lfilter(self.b, self.a, audio_array, zi=self.zi)
-        filtered = np.clip(filtered, -32768, 32767)
-        filtered = np.int16(filtered)
-        return filtered.tobytes()
-    
-    def process_audio(self, input_device, output_device, mode, log_callback):
-        """Main audio processing loop"""
-        self.mode = mode
-        self.running = True
-        
-        # Reset filter state
-        self.update_filter()
-        
-        try:
-            # Open streams
-            self.stream_in = self.p.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=self.sample_rate,
-                input=True,
-                input_device_index=input_device,
-                frames_per_buffer=self.chunk_size
-            )
-            
-            self.stream_out = self.p.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=self.sample_rate,
-                output=True,
-                output_device_index=output_device,
-                frames_per_buffer=self.chunk_size
-            )
-            
-            log_callback(f"✓ {mode.upper()} iniciado com sucesso")
-            
-            while self.running:
-                data = self.stream_in.read(self.chunk_size, exception_on_overflow=False)
-                
-                if mode == 'filter':
-                    processed_data = self.apply_filter(data)
-                else:  # passthrough
-                    processed_data = data
-                
-                self.stream_out.write(processed_data)
-                
-        except Exception as e:
-            log_callback(f"✗ Erro: {str(e)}")
-        finally:
-            #self.close()
-            log_callback(f"✓ {mode.upper()} parado")
-    
-    def start(self, input_device, output_device, mode, log_callback):
-        """Start audio processing in a separate thread"""
-        if self.running:
-            return False
-        
-        self.processing_thread = threading.Thread(
-            target=self.process_audio,
-            args=(input_device, output_device, mode, log_callback),
-            daemon=True
-        )
-        self.processing_thread.start()
-        return True
-    
-    def stop(self):
-        """Stop audio processing"""
-
-        self.running = False
+import numpy as np
 
-        if self.stream_in or self.stream_out:
-            print("I remember")
-            self.stream_in.stop_stream()
-            self.stream_in.close()
-            self.stream_in = None
-        
+from activity_log import ActivityLog
+from filters import MAX_FILTER_ORDER
+from meters import SPECTRUM_BANDS
+from notches import DEFAULT_NOTCH_COUNT
+from processor import AudioProcessor
 
-    
-    def close(self):
-        self.stop()
+# Lines kept in the activity log, and how often queued lines are shown
+LOG_MAX_LINES = 500
+LOG_FLUSH_MS = 100
+# How often the cached device list is checked for a finished rescan
+DEVICE_CHECK_MS = 500
+# Recordings are split into files of at most this long
+RECORD_PART_SECONDS = 1800
 
+# Level bars and spectrum: redraw cap, size and the dB range shown
+SPECTRUM_FPS = 30
+SPECTRUM_WIDTH = 380
+SPECTRUM_HEIGHT = 120
+METER_FLOOR_DB = -60.0
+SPECTRUM_FLOOR_DB = -90.0
 
 
 class AudioFilterGUI:
-    def __init__(self):
+    def __init__(self, processor=None):
         # Set appearance and theme (high contrast for accessibility)
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
@@ -145,8 +37,12 @@ class AudioFilterGUI:
         self.root.title("Protetor de Áudio - Filtro de Frequências")
         self.root.geometry("1400x750")
         
-        # Audio processor
-        self.processor = AudioProcessor()
+        # Audio processor, or a daemon.RemoteProcessor when the audio runs in the service
+        self.processor = AudioProcessor() if processor is None else processor
+        
+        # Log lines may come from the audio thread; only flush_log touches the widget
+        self.log = ActivityLog(max_lines=LOG_MAX_LINES)
+        self.log_widget_lines = 0
         
         # Colors for accessibility (high contrast, colorblind-friendly)
         self.color_bg = "#1a1a1a"
@@ -158,9 +54,17 @@ class AudioFilterGUI:
         self.color_text = "#ffffff"
         
         self.status = "inactive"  # inactive, passthrough, filter
+        self.latency_thread = None
+        self.recording = False
+        self.stream_mode_labels = {"Bloqueante": 'blocking', "Callback": 'callback'}
         
         self.setup_ui()
+        self.devices_version = None
+        self.refresh_pending = None
         self.load_devices()
+        # Rescan in the background from now on, so hot-plugged devices show up
+        self.processor.registry.watch()
+        self.check_devices()
         
     def setup_ui(self):
         """Create the user interface"""
@@ -219,6 +123,29 @@ class AudioFilterGUI:
         )
         self.output_dropdown.pack(pady=(0, 15))
         
+        # Channel count (stereo keeps the spatial cues of the source)
+        channels_row = ctk.CTkFrame(left_panel, fg_color="transparent")
+        channels_row.pack(pady=(0, 10))
+        ctk.CTkLabel(
+            channels_row, 
+            text="Canais:", 
+            font=("Arial", 14),
+            text_color=self.color_text
+        ).pack(side="left", padx=(0, 10))
+        
+        self.channels_var = ctk.StringVar(value=str(self.processor.channels))
+        self.channels_dropdown = ctk.CTkComboBox(
+            channels_row,
+            variable=self.channels_var,
+            values=["1", "2", "4", "6", "8"],
+            font=("Arial", 14),
+            height=32,
+            width=90,
+            state="readonly",
+            command=self.set_channels
+        )
+        self.channels_dropdown.pack(side="left")
+        
         # Refresh button
         ctk.CTkButton(
             left_panel,
@@ -226,10 +153,23 @@ class AudioFilterGUI:
             font=("Arial Bold", 15),
             height=40,
             width=280,
-            command=self.load_devices,
+            command=self.refresh_devices,
             fg_color=self.color_warning,
             hover_color="#e17055"
-        ).pack(pady=15)
+        ).pack(pady=(15, 5))
+        
+        # Round trip through a loopback (e.g. VB-CABLE) from the output back to the input
+        self.latency_btn = ctk.CTkButton(
+            left_panel,
+            text="📏 Medir Latência",
+            font=("Arial Bold", 14),
+            height=34,
+            width=280,
+            command=self.measure_latency,
+            fg_color=self.color_inactive,
+            hover_color="#95a5a6"
+        )
+        self.latency_btn.pack(pady=(0, 15))
         
         # Filter configuration
         ctk.CTkLabel(
@@ -275,6 +215,27 @@ class AudioFilterGUI:
         self.highcut_entry.insert(0, str(int(self.processor.highcut)))
         self.highcut_entry.pack(pady=(0, 8))
         
+        # Filter order selection
+        ctk.CTkLabel(
+            left_panel, 
+            text="Ordem do Filtro:", 
+            font=("Arial", 14),
+            text_color=self.color_text
+        ).pack(pady=(5, 3))
+        
+        self.order_var = ctk.StringVar(value=str(self.processor.filter_order))
+        self.order_dropdown = ctk.CTkComboBox(
+            left_panel,
+            variable=self.order_var,
+            values=[str(order) for order in range(1, MAX_FILTER_ORDER + 1)],
+            font=("Arial", 16),
+            height=38,
+            width=200,
+            justify="center",
+            state="readonly"
+        )
+        self.order_dropdown.pack(pady=(0, 8))
+        
         # Apply filter button
         ctk.CTkButton(
             left_panel,
@@ -287,6 +248,35 @@ class AudioFilterGUI:
             hover_color="#55efc4"
         ).pack(pady=(8, 10))
         
+        # Arbitrary EQ curve, replacing the bandpass
+        ctk.CTkLabel(
+            left_panel, 
+            text="Curva EQ (Hz:dB, ...):", 
+            font=("Arial", 14),
+            text_color=self.color_text
+        ).pack(pady=(5, 3))
+        
+        self.curve_entry = ctk.CTkEntry(
+            left_panel,
+            font=("Arial", 13),
+            height=34,
+            width=260,
+            justify="center",
+            placeholder_text="200:-6, 1000:-40, 4000:-20"
+        )
+        self.curve_entry.pack(pady=(0, 8))
+        
+        ctk.CTkButton(
+            left_panel,
+            text="✓ Aplicar Curva",
+            font=("Arial Bold", 14),
+            height=38,
+            width=200,
+            command=self.apply_curve,
+            fg_color=self.color_active,
+            hover_color="#55efc4"
+        ).pack(pady=(0, 10))
+        
         # ===== CENTER PANEL: Controls =====
         center_panel = ctk.CTkFrame(self.root, corner_radius=15)
         center_panel.grid(row=0, column=1, padx=15, pady=15, sticky="nsew")
@@ -309,6 +299,147 @@ class AudioFilterGUI:
         )
         self.status_label.pack(pady=40)
         
+        # Streaming engine selection
+        self.stream_mode_btn = ctk.CTkSegmentedButton(
+            center_panel,
+            values=list(self.stream_mode_labels),
+            font=("Arial Bold", 14),
+            command=self.set_stream_mode
+        )
+        self.stream_mode_btn.set("Bloqueante")
+        self.stream_mode_btn.pack(pady=(0, 10))
+        
+        # Run the audio loop in a separate process, isolated from the GUI
+        self.isolation_switch = ctk.CTkSwitch(
+            center_panel,
+            text="Áudio em processo separado",
+            font=("Arial", 14),
+            command=self.set_isolation
+        )
+        self.isolation_switch.pack(pady=(0, 10))
+        
+        # Filter narrow bands at a decimated internal rate
+        self.multirate_switch = ctk.CTkSwitch(
+            center_panel,
+            text="Multirate (economia de CPU)",
+            font=("Arial", 14),
+            command=self.set_multirate
+        )
+        self.multirate_switch.pack(pady=(0, 10))
+        
+        # Look-ahead limiter instead of hard clipping, on by default
+        self.limiter_switch = ctk.CTkSwitch(
+            center_panel,
+            text="Limitador (evita distorção)",
+            font=("Arial", 14),
+            command=self.set_limiter
+        )
+        self.limiter_switch.select()
+        self.limiter_switch.pack(pady=(0, 10))
+        
+        # Engage the band filter automatically on sudden spikes or piercing tones
+        self.protect_switch = ctk.CTkSwitch(
+            center_panel,
+            text="Proteção automática",
+            font=("Arial", 14),
+            command=self.set_auto_protect
+        )
+        self.protect_switch.pack(pady=(0, 10))
+        
+        # Find and notch out steady tones (whine, hum, beeps) instead of a whole band
+        self.auto_notch_switch = ctk.CTkSwitch(
+            center_panel,
+            text="Notch automático (tons)",
+            font=("Arial", 14),
+            command=self.set_auto_notches
+        )
+        self.auto_notch_switch.pack(pady=(0, 10))
+        
+        # Smallest buffer that runs without glitches, adjusted while running
+        self.auto_tune_switch = ctk.CTkSwitch(
+            center_panel,
+            text="Buffer automático (menor latência)",
+            font=("Arial", 14),
+            command=self.set_auto_tune
+        )
+        self.auto_tune_switch.pack(pady=(0, 10))
+        
+        # Record what is played (and optionally the unprocessed input) to WAV files
+        record_frame = ctk.CTkFrame(center_panel, fg_color="transparent")
+        record_frame.pack(pady=(0, 10))
+        self.record_btn = ctk.CTkButton(
+            record_frame,
+            text="⏺ Gravar",
+            font=("Arial Bold", 14),
+            height=34,
+            width=120,
+            command=self.toggle_recording,
+            fg_color=self.color_inactive,
+            hover_color="#95a5a6"
+        )
+        self.record_btn.pack(side="left", padx=(0, 10))
+        self.record_input_switch = ctk.CTkSwitch(
+            record_frame,
+            text="Gravar entrada também",
+            font=("Arial", 14)
+        )
+        self.record_input_switch.pack(side="left")
+        
+        # Input/output levels
+        self.levels_label = ctk.CTkLabel(
+            center_panel,
+            text="Entrada: -- dB | Saída: -- dB",
+            font=("Consolas", 14),
+            text_color=self.color_inactive
+        )
+        self.levels_label.pack(pady=(0, 10))
+        
+        # Input/output peak level bars
+        bars_frame = ctk.CTkFrame(center_panel, fg_color="transparent")
+        bars_frame.pack(pady=(0, 6))
+        self.level_bars = []
+        for row, (label, color) in enumerate((("Entrada", "#b2bec3"), ("Saída", self.color_active))):
+            ctk.CTkLabel(
+                bars_frame,
+                text=label,
+                font=("Arial", 12),
+                text_color=self.color_text
+            ).grid(row=row, column=0, padx=(0, 8), sticky="w")
+            bar = ctk.CTkProgressBar(bars_frame, width=SPECTRUM_WIDTH - 70, progress_color=color)
+            bar.set(0)
+            bar.grid(row=row, column=1, pady=2)
+            self.level_bars.append(bar)
+        
+        # Spectrum: input bands in gray, what is left after processing in green
+        self.spectrum_canvas = ctk.CTkCanvas(
+            center_panel,
+            width=SPECTRUM_WIDTH,
+            height=SPECTRUM_HEIGHT,
+            bg=self.color_bg,
+            highlightthickness=0
+        )
+        self.spectrum_canvas.pack(pady=(0, 10))
+        band_width = SPECTRUM_WIDTH / SPECTRUM_BANDS
+        # One rectangle pair per band, created once and only moved on redraw
+        self.spectrum_bars = [
+            (self.spectrum_canvas.create_rectangle(i * band_width, SPECTRUM_HEIGHT, (i + 1) * band_width - 1,
+                                                   SPECTRUM_HEIGHT, fill="#636e72", width=0),
+             self.spectrum_canvas.create_rectangle(i * band_width + 1, SPECTRUM_HEIGHT, (i + 1) * band_width - 2,
+                                                   SPECTRUM_HEIGHT, fill=self.color_active, width=0))
+            for i in range(SPECTRUM_BANDS)
+        ]
+        self.spectrum_sequence = None
+        
+        # Real-time performance metrics
+        self.metrics_label = ctk.CTkLabel(
+            center_panel,
+            text="",
+            font=("Consolas", 13),
+            text_color=self.color_inactive,
+            justify="left"
+        )
+        self.metrics_label.pack(pady=(0, 10))
+        
         # Passthrough toggle button
         self.passthrough_btn = ctk.CTkButton(
             center_panel,
@@ -368,10 +499,37 @@ class AudioFilterGUI:
         ).pack(pady=(0, 20))
         
         self.add_log("Sistema iniciado. Selecione os dispositivos de áudio.")
+        self.flush_log()
+        self.update_meters()
+        self.update_spectrum()
+    
+    def refresh_devices(self):
+        """Rescan the devices in the background; check_devices shows the result"""
+        self.refresh_pending = self.processor.refresh_devices()
+        self.add_log("🔄 Procurando dispositivos...")
+    
+    def check_devices(self):
+        """Reload the dropdowns once a background rescan changed the device list"""
+        registry = self.processor.registry
+        if registry.version != self.devices_version:
+            self.load_devices()
+        elif self.refresh_pending is not None and not self.refresh_pending.is_alive():
+            if registry.holds:
+                self.add_log("⚠ Pare o áudio para procurar novos dispositivos")
+            else:
+                self.add_log(f"✓ Nenhuma mudança nos dispositivos ({registry.scan_seconds * 1e3:.0f} ms)")
+        if self.refresh_pending is not None and not self.refresh_pending.is_alive():
+            self.refresh_pending = None
+        if self.latency_thread is not None and not self.latency_thread.is_alive():
+            self.latency_thread = None
+            self.latency_btn.configure(state="normal")
+        self.root.after(DEVICE_CHECK_MS, self.check_devices)
     
     def load_devices(self):
-        """Load available audio devices"""
+        """Fill the dropdowns from the cached device list, keeping the current choices"""
         try:
+            registry = self.processor.registry
+            self.devices_version = registry.version
             input_devices, output_devices = self.processor.get_devices()
             
             # Update dropdowns
@@ -381,36 +539,73 @@ class AudioFilterGUI:
             self.input_dropdown.configure(values=input_names)
             self.output_dropdown.configure(values=output_names)
             
-            # Auto-select CABLE Output for input if available
-            cable_found = False
-            for device_str in input_names:
-                if "CABLE Output" in device_str:
-                    self.input_dropdown.set(device_str)
-                    cable_found = True
-                    self.add_log(f"✓ CABLE Output detectado automaticamente")
-                    break
+            # Indices can shift when devices come and go, so choices are kept by name
+            input_choice = self.match_device(self.input_device_var.get(), input_names)
+            output_choice = self.match_device(self.output_device_var.get(), output_names)
+            recommended_input, recommended_output = self.processor.recommend_devices()
             
-            if not cable_found and input_names:
-                self.input_dropdown.set(input_names[0])
-            
-            # Auto-select default output (first available)
-            if output_names:
-                self.output_dropdown.set(output_names[0])
+            if input_choice is None:
+                # Auto-select CABLE Output for input if available
+                for device_str in input_names:
+                    if "CABLE Output" in device_str:
+                        input_choice = device_str
+                        self.add_log(f"✓ CABLE Output detectado automaticamente")
+                        break
+            if input_choice is None and recommended_input is not None:
+                input_choice = f"{recommended_input.index}: {recommended_input.label}"
+            if output_choice is None and recommended_output is not None:
+                output_choice = f"{recommended_output.index}: {recommended_output.label}"
+            if input_choice is not None:
+                self.input_dropdown.set(input_choice)
+            if output_choice is not None:
+                self.output_dropdown.set(output_choice)
             
             self.add_log(f"✓ {len(input_devices)} entradas e {len(output_devices)} saídas encontradas")
+            if recommended_input is not None and recommended_output is not None:
+                latency = recommended_input.input_latency + recommended_output.output_latency
+                self.add_log(f"💡 Menor latência: {recommended_input.label} → "
+                             f"{recommended_output.label} (~{latency * 1e3:.0f} ms)")
         except Exception as e:
             self.add_log(f"✗ Erro ao carregar dispositivos: {str(e)}")
     
+    @staticmethod
+    def match_device(current, names):
+        """Entry of names for the same device as the current choice, or None"""
+        if ": " not in current:
+            return None
+        label = current.split(": ", 1)[1]
+        for name in names:
+            if name.split(": ", 1)[1] == label:
+                return name
+        return None
+    
     def add_log(self, message):
-        """Add message to log with timestamp"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
-        self.log_text.insert("end", log_entry)
-        self.log_text.see("end")
+        """Queue a message for the log; safe to call from any thread"""
+        self.log.post(message)
+    
+    def flush_log(self):
+        """Show the queued log lines in one batch, keeping the widget bounded"""
+        updated, added = self.log.drain()
+        if updated is not None and self.log_widget_lines:
+            # Repeats of the last line only bump its counter
+            self.log_text.delete("end-2l", "end-1l")
+            self.log_text.insert("end", updated + "\n")
+        if added:
+            self.log_text.insert("end", "".join(line + "\n" for line in added))
+            self.log_widget_lines += len(added)
+            excess = self.log_widget_lines - LOG_MAX_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+                self.log_widget_lines = LOG_MAX_LINES
+        if updated is not None or added:
+            self.log_text.see("end")
+        self.root.after(LOG_FLUSH_MS, self.flush_log)
     
     def clear_log(self):
         """Clear the log"""
+        self.log.clear()
         self.log_text.delete("1.0", "end")
+        self.log_widget_lines = 0
         self.add_log("Log limpo")
     
     def apply_frequencies(self):
@@ -418,6 +613,7 @@ class AudioFilterGUI:
         try:
             lowcut = float(self.lowcut_entry.get())
             highcut = float(self.highcut_entry.get())
+            order = int(self.order_var.get())
             
             # Validation
             if lowcut <= 0 or highcut <= 0:
@@ -432,18 +628,230 @@ class AudioFilterGUI:
                 self.add_log(f"✗ Erro: Frequência alta não pode exceder {self.processor.sample_rate/2:.0f} Hz")
                 return
             
-            # Update processor
-            self.processor.lowcut = lowcut
-            self.processor.highcut = highcut
+            # Update processor (applied live, without restarting the streams)
+            self.processor.retune(lowcut, highcut, order)
             
-            if not self.processor.running:
-                self.processor.update_filter()
-            
-            self.add_log(f"✓ Filtro configurado: {lowcut:.0f} Hz - {highcut:.0f} Hz")
+            self.add_log(f"✓ Filtro configurado: {lowcut:.0f} Hz - {highcut:.0f} Hz (ordem {order})")
             
         except ValueError:
             self.add_log("✗ Erro: Digite valores numéricos válidos")
     
+    def apply_curve(self):
+        """Filter with the EQ curve typed as 'Hz:dB' points instead of the bandpass"""
+        try:
+            points = [point.split(":") for point in self.curve_entry.get().split(",") if point.strip()]
+            freqs = [float(freq) for freq, _ in points]
+            gains_db = [float(gain) for _, gain in points]
+        except ValueError:
+            self.add_log("✗ Erro: Use pontos no formato Hz:dB separados por vírgula")
+            return
+        
+        if not points:
+            self.add_log("✗ Erro: Digite ao menos um ponto Hz:dB")
+            return
+        
+        if any(high <= low for low, high in zip(freqs, freqs[1:])):
+            self.add_log("✗ Erro: As frequências devem estar em ordem crescente")
+            return
+        
+        self.processor.set_response(freqs, gains_db)
+        
+        curve = ", ".join(f"{freq:.0f} Hz {gain:+.0f} dB" for freq, gain in zip(freqs, gains_db))
+        self.add_log(f"✓ Curva EQ aplicada: {curve}")
+    
+    def set_stream_mode(self, label):
+        """Select the blocking or callback streaming engine"""
+        if self.processor.running:
+            current = next(k for k, v in self.stream_mode_labels.items() if v == self.processor.stream_mode)
+            self.stream_mode_btn.set(current)
+            self.add_log("⚠ Pare o áudio antes de trocar o modo de streaming")
+            return
+        
+        self.processor.stream_mode = self.stream_mode_labels[label]
+        self.add_log(f"✓ Modo de streaming: {label}")
+    
+    def set_channels(self, value):
+        """Select how many channels are captured, filtered and played"""
+        if self.processor.running:
+            self.channels_var.set(str(self.processor.channels))
+            self.add_log("⚠ Pare o áudio antes de trocar o número de canais")
+            return
+        
+        self.processor.channels = int(value)
+        self.add_log(f"✓ Canais: {value}")
+    
+    def set_isolation(self):
+        """Choose whether the audio loop runs in a thread or a child process"""
+        if self.processor.running:
+            if self.processor.isolation == 'process':
+                self.isolation_switch.select()
+            else:
+                self.isolation_switch.deselect()
+            self.add_log("⚠ Pare o áudio antes de trocar o isolamento")
+            return
+        
+        self.processor.isolation = 'process' if self.isolation_switch.get() else 'thread'
+        self.add_log(f"✓ Áudio em {'processo separado' if self.processor.isolation == 'process' else 'thread'}")
+    
+    def set_multirate(self):
+        """Choose whether narrow bands are filtered at a decimated internal rate"""
+        if self.processor.running:
+            if self.processor.multirate:
+                self.multirate_switch.select()
+            else:
+                self.multirate_switch.deselect()
+            self.add_log("⚠ Pare o áudio antes de trocar o modo multirate")
+            return
+        
+        self.processor.multirate = bool(self.multirate_switch.get())
+        self.add_log(f"✓ Multirate {'ativado' if self.processor.multirate else 'desativado'}")
+    
+    def set_limiter(self):
+        """Turn the look-ahead limiter on or off (applied live)"""
+        enabled = bool(self.limiter_switch.get())
+        self.processor.set_limiter(enabled)
+        self.add_log(f"✓ Limitador {'ativado' if enabled else 'desativado'}")
+    
+    def set_auto_protect(self):
+        """Turn the automatic overload protection on or off (applied live)"""
+        enabled = bool(self.protect_switch.get())
+        self.processor.set_auto_protect(enabled)
+        self.add_log(f"✓ Proteção automática {'ativada' if enabled else 'desativada'}")
+    
+    def set_auto_notches(self):
+        """Turn the adaptive notch bank on or off (applied live)"""
+        enabled = bool(self.auto_notch_switch.get())
+        self.processor.set_auto_notches(DEFAULT_NOTCH_COUNT if enabled else 0)
+        self.add_log(f"✓ Notch automático {'ativado' if enabled else 'desativado'}")
+    
+    def set_auto_tune(self):
+        """Turn the buffer size auto-tuning on or off (applied live)"""
+        enabled = bool(self.auto_tune_switch.get())
+        self.processor.set_auto_tune(enabled)
+        self.add_log(f"✓ Buffer automático {'ativado' if enabled else 'desativado'}")
+    
+    def measure_latency(self):
+        """Measure the round-trip latency of the selected devices in the background"""
+        if self.latency_thread is not None:
+            return
+        if self.processor.running:
+            self.add_log("⚠ Pare o áudio antes de medir a latência")
+            return
+        input_idx, output_idx = self.get_selected_devices()
+        if input_idx is None or output_idx is None:
+            self.add_log("✗ Selecione os dispositivos de entrada e saída")
+            return
+        self.latency_btn.configure(state="disabled")
+        self.add_log("📏 Tocando um chirp na saída e procurando na entrada...")
+        self.latency_thread = threading.Thread(target=self.run_latency_measurement,
+                                               args=(input_idx, output_idx), daemon=True)
+        self.latency_thread.start()
+    
+    def run_latency_measurement(self, input_idx, output_idx):
+        """Background half of measure_latency; only posts to the log"""
+        try:
+            latency, snr_db = self.processor.measure_latency(input_idx, output_idx)
+            if latency is None:
+                self.add_log("✗ Chirp não encontrado: a saída precisa voltar para a entrada "
+                             "(cabo ou cabo virtual)")
+            else:
+                self.add_log(f"✓ Latência ida e volta: {latency * 1e3:.1f} ms "
+                             f"(buffer de {self.processor.chunk_size} amostras, pico {snr_db:.0f} dB)")
+        except Exception as e:
+            self.add_log(f"✗ Erro ao medir latência: {str(e)}")
+    
+    def toggle_recording(self):
+        """Start recording the running stream, or finish the recording"""
+        if self.recording:
+            self.finish_recording()
+            return
+        if not self.processor.running:
+            self.add_log("⚠ Inicie o áudio antes de gravar")
+            return
+        sources = ('input', 'output') if self.record_input_switch.get() else ('output',)
+        try:
+            base = self.processor.start_recording(sources=sources, max_seconds=RECORD_PART_SECONDS)
+        except OSError as e:
+            self.add_log(f"✗ Erro ao gravar: {str(e)}")
+            return
+        self.recording = True
+        self.record_btn.configure(text="⏹ Parar gravação", fg_color=self.color_error, hover_color="#ff7675")
+        self.add_log(f"⏺ Gravando em {base}_*.wav")
+    
+    def finish_recording(self):
+        """Close the recording files, if recording, and log where they are"""
+        if not self.recording:
+            return
+        self.recording = False
+        self.record_btn.configure(text="⏺ Gravar", fg_color=self.color_inactive, hover_color="#95a5a6")
+        recorder = self.processor.stop_recording()
+        if recorder is not None:
+            self.add_log(recorder.summary())
+    
+    def update_spectrum(self):
+        """Redraw the level bars and spectrum when a new snapshot is out, at most SPECTRUM_FPS times per second"""
+        if self.processor.running:
+            sequence, input_db, output_db = self.processor.get_spectrum()
+            if sequence != self.spectrum_sequence:
+                self.spectrum_sequence = sequence
+                self.draw_spectrum(input_db, output_db)
+                meter = self.processor.get_meter()
+                for bar, peak in zip(self.level_bars, (meter['input_peak'], meter['output_peak'])):
+                    level_db = 20 * math.log10(max(peak, 1e-6))
+                    bar.set(min(max(1 - level_db / METER_FLOOR_DB, 0.0), 1.0))
+        elif self.spectrum_sequence is not None:
+            self.spectrum_sequence = None
+            self.draw_spectrum(np.full(SPECTRUM_BANDS, SPECTRUM_FLOOR_DB), np.full(SPECTRUM_BANDS, SPECTRUM_FLOOR_DB))
+            for bar in self.level_bars:
+                bar.set(0)
+        self.root.after(1000 // SPECTRUM_FPS, self.update_spectrum)
+    
+    def draw_spectrum(self, input_db, output_db):
+        """Move the spectrum rectangles to the given band levels"""
+        levels = np.clip(1 - np.stack([input_db, output_db]) / SPECTRUM_FLOOR_DB, 0.0, 1.0)
+        tops = (SPECTRUM_HEIGHT * (1 - levels)).tolist()
+        band_width = SPECTRUM_WIDTH / SPECTRUM_BANDS
+        for i, (input_rect, output_rect) in enumerate(self.spectrum_bars):
+            left = i * band_width
+            self.spectrum_canvas.coords(input_rect, left, tops[0][i], left + band_width - 1, SPECTRUM_HEIGHT)
+            self.spectrum_canvas.coords(output_rect, left + 1, tops[1][i], left + band_width - 2, SPECTRUM_HEIGHT)
+    
+    def update_meters(self):
+        """Refresh the level and performance readouts from the processor"""
+        if self.processor.running:
+            meter = self.processor.get_meter()
+            input_db = 20 * math.log10(max(meter['input_rms'], 1e-5))
+            output_db = 20 * math.log10(max(meter['output_rms'], 1e-5))
+            self.levels_label.configure(
+                text=f"Entrada: {input_db:5.1f} dB | Saída: {output_db:5.1f} dB | "
+                     f"Limitador: -{meter['gain_reduction_db']:4.1f} dB | "
+                     f"Proteção: {meter['protection']:4.0%}"
+                     + (f" (tom {meter['tone_hz']:.0f} Hz)" if meter['tone_hz'] else ""),
+                text_color=self.color_text
+            )
+            
+            metrics = self.processor.get_metrics()
+            if metrics:
+                # Highlight the readout when the audio path is glitching
+                glitching = metrics['deadline_misses'] or metrics['underruns'] or metrics['overflows']
+                self.metrics_label.configure(
+                    text=(
+                        f"Carga: {metrics['load']:6.1%}  Prazo: {metrics['deadline_ms']:.1f} ms"
+                        f" ({metrics['chunk_size']} amostras)\n"
+                        f"Chunk p99: {metrics['p99_ms']:.2f} ms  máx: {metrics['max_ms']:.2f} ms\n"
+                        f"Atrasos: {metrics['deadline_misses']}  Underruns: {metrics['underruns']}  "
+                        f"Overflows: {metrics['overflows']}\n"
+                        f"Fila: {metrics['queue_depth']}  Latência: {metrics['latency_ms']:.1f} ms\n"
+                        + "  ".join(f"{stage['name']}: {stage['mean_ms'] * 1e3:.0f} µs"
+                                    for stage in metrics.get('stages', []))
+                    ),
+                    text_color=self.color_warning if glitching else self.color_text
+                )
+        else:
+            self.levels_label.configure(text="Entrada: -- dB | Saída: -- dB", text_color=self.color_inactive)
+            self.metrics_label.configure(text_color=self.color_inactive)
+        self.root.after(200, self.update_meters)
+    
     def get_selected_devices(self):
         """Get selected device indices"""
         try:
@@ -463,14 +871,11 @@ class AudioFilterGUI:
         self.status_label.configure(text=f"● {status_text.upper()}", text_color=color)
     
     def toggle_passthrough(self):
-        """Toggle passthrough mode on/off"""
-        if self.processor.running:
-            if self.processor.mode == 'passthrough':
-                # Stop passthrough
-                self.processor.close()
-                self.reset_passthrough_button()
-            else:
-                self.add_log("⚠ Pare o filtro antes de iniciar o passthrough")
+        """Start passthrough, switch to it from the filter, or stop it"""
+        if self.processor.running and self.processor.mode == 'passthrough':
+            self.finish_recording()
+            self.processor.stop()
+            self.reset_passthrough_button()
             return
         
         input_idx, output_idx = self.get_selected_devices()
@@ -478,37 +883,39 @@ class AudioFilterGUI:
             self.add_log("✗ Selecione os dispositivos de entrada e saída")
             return
         
+        switching = self.processor.running
+        # While running on the same devices this only switches the mode, in-band
         success = self.processor.start(input_idx, output_idx, 'passthrough', self.add_log)
-        if success:
-            self.update_status("PASSTHROUGH ATIVO", "#0984e3")
-            self.passthrough_btn.configure(
-                text="⏹ PARAR PASSTHROUGH",
-                fg_color=self.color_error,
-                hover_color="#ff7675"
-            )
-            self.filter_btn.configure(state="disabled")
+        if not success:
+            self.add_log("⚠ Pare o áudio antes de trocar de dispositivo")
+            return
+        if switching:
+            self.reset_filter_button(stopped=False)
+            self.add_log("✓ Trocado para passthrough")
+        self.update_status("PASSTHROUGH ATIVO", "#0984e3")
+        self.passthrough_btn.configure(
+            text="⏹ PARAR PASSTHROUGH",
+            fg_color=self.color_error,
+            hover_color="#ff7675"
+        )
     
-    def reset_passthrough_button(self):
+    def reset_passthrough_button(self, stopped=True):
         """Reset passthrough button to initial state"""
-        self.update_status("INATIVO", self.color_inactive)
         self.passthrough_btn.configure(
             text="▶ INICIAR PASSTHROUGH\n(Sem Filtro)",
             fg_color="#0984e3",
             hover_color="#74b9ff"
         )
-        self.filter_btn.configure(state="normal")
-        self.add_log("✓ Passthrough parado")
+        if stopped:
+            self.update_status("INATIVO", self.color_inactive)
+            self.add_log("✓ Passthrough parado")
     
     def toggle_filter(self):
-        """Toggle filter mode on/off"""
-        if self.processor.running:
-            if self.processor.mode == 'filter':
-                # Stop filter
-                self.reset_filter_button()
-                self.processor.close()
-                
-            else:
-                self.add_log("⚠ Pare o passthrough antes de iniciar o filtro")
+        """Start the filter, switch to it from passthrough, or stop it"""
+        if self.processor.running and self.processor.mode == 'filter':
+            self.finish_recording()
+            self.processor.stop()
+            self.reset_filter_button()
             return
         
         input_idx, output_idx = self.get_selected_devices()
@@ -519,31 +926,37 @@ class AudioFilterGUI:
         # Apply frequencies before starting
         self.apply_frequencies()
         
+        switching = self.processor.running
+        # While running on the same devices this only switches the mode, in-band
         success = self.processor.start(input_idx, output_idx, 'filter', self.add_log)
-        if success:
-            self.update_status("FILTRO ATIVO", self.color_active)
-            self.filter_btn.configure(
-                text="⏹ PARAR FILTRO",
-                fg_color=self.color_error,
-                hover_color="#ff7675"
-            )
-            self.passthrough_btn.configure(state="disabled")
+        if not success:
+            self.add_log("⚠ Pare o áudio antes de trocar de dispositivo")
+            return
+        if switching:
+            self.reset_passthrough_button(stopped=False)
+            self.add_log("✓ Trocado para filtro")
+        self.update_status("FILTRO ATIVO", self.color_active)
+        self.filter_btn.configure(
+            text="⏹ PARAR FILTRO",
+            fg_color=self.color_error,
+            hover_color="#ff7675"
+        )
     
-    def reset_filter_button(self):
+    def reset_filter_button(self, stopped=True):
         """Reset filter button to initial state"""
-        self.update_status("INATIVO", self.color_inactive)
         self.filter_btn.configure(
             text="▶ INICIAR FILTRO\n(Proteção Ativa)",
             fg_color=self.color_active,
             hover_color="#55efc4"
         )
-        self.passthrough_btn.configure(state="normal")
-        self.add_log("✓ Filtro parado")
+        if stopped:
+            self.update_status("INATIVO", self.color_inactive)
+            self.add_log("✓ Filtro parado")
     
     def on_closing(self):
         """Handle window close event"""
-        if(self.processor.running): 
-            self.processor.close()
+        self.finish_recording()
+        self.processor.close()
         self.root.destroy()
     
     def run(self):
@@ -553,5 +966,11 @@ class AudioFilterGUI:
 
 
 if __name__ == "__main__":
-    app = AudioFilterGUI()
+    # --daemon [socket]: control a running daemon.py instead of hosting the audio
+    processor = None
+    if "--daemon" in sys.argv:
+        from daemon import DaemonClient, RemoteProcessor, parse_address
+        rest = sys.argv[sys.argv.index("--daemon") + 1:]
+        processor = RemoteProcessor(DaemonClient(parse_address(rest[0] if rest else None)))
+    app = AudioFilterGUI(processor)
     app.run()
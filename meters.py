@@ -0,0 +1,168 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from buffers import INT16
+
+# Layout of the meter values, all float64
+METER_FIELDS = ('chunks', 'input_rms', 'output_rms', 'input_peak', 'output_peak', 'gain_reduction_db',
+                'protection', 'tone_hz')
+
+
+class LevelMeter:
+    """Input and output levels of the latest chunk, relative to full scale"""
+    def __init__(self, values=None):
+        if values is None:
+            values = np.zeros(len(METER_FIELDS), dtype=np.float64)
+        self.values = values
+
+    def update(self, raw_in, raw_out, gain_reduction_db=0.0, detector=None, sample_format=INT16):
+        """Measure one chunk before and after processing (stream bytes of sample_format)"""
+        samples_in = sample_format.samples(raw_in)
+        samples_out = sample_format.samples(raw_out)
+        full_scale = sample_format.full_scale
+        values = self.values
+        values[1] = np.sqrt(np.mean(np.square(samples_in, dtype=np.float32))) / full_scale
+        values[2] = np.sqrt(np.mean(np.square(samples_out, dtype=np.float32))) / full_scale
+        # max and -min instead of abs, which overflows on the most negative integer
+        values[3] = max(float(samples_in.max()), -float(samples_in.min())) / full_scale
+        values[4] = max(float(samples_out.max()), -float(samples_out.min())) / full_scale
+        values[5] = gain_reduction_db
+        if detector is not None:
+            values[6] = detector.protection
+            values[7] = detector.tone_hz
+        values[0] += 1
+
+    def snapshot(self):
+        """Copy of the current values as a dict"""
+        return dict(zip(METER_FIELDS, self.values.tolist()))
+
+
+class SharedLevelMeter(LevelMeter):
+    """LevelMeter whose values live in shared memory, readable across processes"""
+    def __init__(self, name=None):
+        size = len(METER_FIELDS) * np.dtype(np.float64).itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        super().__init__(np.ndarray((len(METER_FIELDS),), dtype=np.float64, buffer=self.shm.buf))
+        if name is None:
+            self.values.fill(0)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self, unlink=False):
+        """Release the shared memory (the creating side also unlinks it)"""
+        self.values = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+# Log-spaced bands of the spectrum view, and how often it is refreshed
+SPECTRUM_BANDS = 48
+SPECTRUM_MIN_HZ = 40.0
+SPECTRUM_RATE = 30.0
+
+
+class SpectrumMeter:
+    """Band magnitudes of the input and output, published through a double buffer
+
+    The audio thread only does work every interval-th chunk (about rate
+    times per second): one rfft per side, a product with a band matrix,
+    written into the back buffer before the front index flips. Readers copy
+    the front buffer and retry if a new snapshot was published meanwhile,
+    so they never block the audio thread nor see a half-written snapshot.
+
+    values holds [sequence, front, buffer 0, buffer 1], each buffer being
+    the input then the output band magnitudes relative to full scale.
+    """
+    def __init__(self, sample_rate=44100, bands=SPECTRUM_BANDS, rate=SPECTRUM_RATE, values=None):
+        self.sample_rate = sample_rate
+        self.bands = bands
+        self.rate = rate
+        if values is None:
+            values = np.zeros(2 + 4 * bands, dtype=np.float64)
+        self.values = values
+        self.buffers = values[2:].reshape(2, 2, bands)
+        self.edges = np.geomspace(SPECTRUM_MIN_HZ, 0.5 * sample_rate, bands + 1)
+        # Geometric centre of every band, for labelling
+        self.centres = np.sqrt(self.edges[:-1] * self.edges[1:])
+        self.frames = 0
+        self.countdown = 0
+
+    def set_sample_rate(self, sample_rate):
+        """Band edges for another stream rate, from the next chunk on (between sessions only)"""
+        self.sample_rate = sample_rate
+        self.edges = np.geomspace(SPECTRUM_MIN_HZ, 0.5 * sample_rate, self.bands + 1)
+        self.centres = np.sqrt(self.edges[:-1] * self.edges[1:])
+        self.frames = 0
+
+    def resize(self, frames):
+        """Window and band matrix for chunks of a given length"""
+        self.frames = frames
+        self.interval = max(1, int(round(self.sample_rate / (frames * self.rate))))
+        self.window = np.hanning(frames).astype(np.float32)
+        freqs = np.fft.rfftfreq(frames, 1.0 / self.sample_rate)
+        matrix = (freqs[:, None] >= self.edges[:-1]) & (freqs[:, None] < self.edges[1:])
+        # Bands narrower than a bin show the bin nearest to their centre
+        empty = ~matrix.any(axis=0)
+        matrix[np.abs(freqs[:, None] - self.centres[empty]).argmin(axis=0), np.flatnonzero(empty)] = True
+        # Power of a full-scale sine summed over the one-sided spectrum (Parseval)
+        full_scale_power = 0.25 * frames * float(np.sum(self.window ** 2)) * 32768.0 ** 2
+        self.band_matrix = (matrix / full_scale_power).astype(np.float32)
+
+    def update(self, raw_in, raw_out, channels=1, sample_format=INT16):
+        """Publish a snapshot of one chunk (stream bytes of sample_format) if one is due"""
+        self.countdown -= 1
+        if self.countdown > 0:
+            return
+        frames = len(raw_in) // (sample_format.width * channels)
+        if frames != self.frames:
+            self.resize(frames)
+        self.countdown = self.interval
+
+        back = 1 - int(self.values[1])
+        for side, raw in enumerate((raw_in, raw_out)):
+            samples = sample_format.samples(raw).reshape(frames, channels)
+            mono = samples.mean(axis=1, dtype=np.float32) if channels > 1 else samples[:, 0].astype(np.float32)
+            spectrum = np.fft.rfft(mono * self.window)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            if sample_format.scale != 1.0:
+                # The band matrix expects int16 scale
+                power *= sample_format.scale ** 2
+            np.sqrt(power @ self.band_matrix, out=self.buffers[back, side])
+        self.values[1] = back
+        self.values[0] += 1
+
+    def snapshot(self):
+        """(sequence, input dBFS per band, output dBFS per band), consistent with one publish"""
+        while True:
+            sequence = self.values[0]
+            magnitudes = self.buffers[int(self.values[1])].copy()
+            if self.values[0] == sequence:
+                break
+        levels = 20 * np.log10(np.maximum(magnitudes, 1e-6))
+        return int(sequence), levels[0], levels[1]
+
+
+class SharedSpectrumMeter(SpectrumMeter):
+    """SpectrumMeter whose values live in shared memory, readable across processes"""
+    def __init__(self, name=None, sample_rate=44100, bands=SPECTRUM_BANDS, rate=SPECTRUM_RATE):
+        size = (2 + 4 * bands) * np.dtype(np.float64).itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        values = np.ndarray((2 + 4 * bands,), dtype=np.float64, buffer=self.shm.buf)
+        if name is None:
+            values.fill(0)
+        super().__init__(sample_rate, bands, rate, values)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self, unlink=False):
+        """Release the shared memory (the creating side also unlinks it)"""
+        self.values = self.buffers = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
@@ -0,0 +1,82 @@
+import bisect
+
+import pyaudio
+import numpy as np
+
+
+class AudioMetrics:
+    """Real-time performance counters of one audio stream
+
+    Chunk processing times go into a log-spaced histogram, so recording a
+    chunk costs one bisect and an increment, and percentiles can be read
+    at any time without keeping every sample.
+    """
+    def __init__(self, sample_rate=44100, chunk_size=512):
+        # Histogram bucket upper edges, 10 us to 100 ms
+        self.bucket_edges = np.geomspace(10e-6, 100e-3, 25).tolist()
+        self.configure(sample_rate, chunk_size)
+
+    def configure(self, sample_rate, chunk_size):
+        """Set the stream parameters and clear all counters"""
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.deadline = chunk_size / sample_rate
+        self.reset()
+
+    def reset(self):
+        """Clear all counters"""
+        self.histogram = np.zeros(len(self.bucket_edges) + 1, dtype=np.int64)
+        self.chunks = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.deadline_misses = 0
+        self.underruns = 0
+        self.overflows = 0
+        self.queue_depth = 0
+        self.latency = 0.0
+
+    def record_chunk(self, elapsed):
+        """Record the processing time of one chunk, in seconds"""
+        self.histogram[bisect.bisect_left(self.bucket_edges, elapsed)] += 1
+        self.chunks += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        if elapsed > self.deadline:
+            self.deadline_misses += 1
+
+    def record_status(self, status):
+        """Count xruns reported by PortAudio in a callback's status flags"""
+        if status & (pyaudio.paInputOverflow | pyaudio.paOutputOverflow):
+            self.overflows += 1
+        if status & (pyaudio.paInputUnderflow | pyaudio.paOutputUnderflow):
+            self.underruns += 1
+
+    def percentile(self, q):
+        """Upper bucket edge below which q percent of the chunks finished"""
+        if self.chunks == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.histogram), self.chunks * q / 100.0))
+        if index >= len(self.bucket_edges):
+            return self.max_time
+        return min(self.bucket_edges[index], self.max_time)
+
+    def snapshot(self):
+        """Copy of the current metrics as a plain dict"""
+        mean_time = self.total_time / self.chunks if self.chunks else 0.0
+        return {
+            'chunks': self.chunks,
+            'chunk_size': self.chunk_size,
+            'deadline_ms': self.deadline * 1e3,
+            'mean_ms': mean_time * 1e3,
+            'p99_ms': self.percentile(99) * 1e3,
+            'max_ms': self.max_time * 1e3,
+            'load': mean_time / self.deadline,
+            'deadline_misses': self.deadline_misses,
+            'underruns': self.underruns,
+            'overflows': self.overflows,
+            'queue_depth': self.queue_depth,
+            'latency_ms': self.latency * 1e3,
+            'histogram_edges_ms': [edge * 1e3 for edge in self.bucket_edges],
+            'histogram': self.histogram.tolist(),
+        }
@@ -0,0 +1,314 @@
+import math
+
+import numpy as np
+
+from buffers import INT16, BlockFifo
+from filters import SOSFilter
+
+# Stopband attenuation of the anti-alias/anti-image filters, in dB
+MULTIRATE_ATTENUATION = 80.0
+
+# The internal rate must be at least this multiple of highcut, which leaves
+# the resampling filters a transition band wide enough to stay short
+MIN_RATE_RATIO = 2.5
+
+# Fraction of the lower Nyquist the device-rate Resampler passes untouched;
+# from there to Nyquist it falls to the stopband
+RESAMPLER_PASSBAND = 0.8
+
+# Device-rate samples per matrix product in Decimator and Interpolator. The
+# banded matrix covers one such sub-block, so its size and the work per
+# sample stay the same whatever the chunk size.
+RESAMPLING_BLOCK = 512
+
+
+def choose_decimation(highcut, sample_rate, chunk_size, max_factor=16):
+    """Largest decimation factor that divides the chunk and keeps highcut well below Nyquist
+
+    Returns 1 when the band is too wide for multirate processing to help.
+    """
+    limit = min(max_factor, int(sample_rate / (MIN_RATE_RATIO * highcut)))
+    for factor in range(limit, 1, -1):
+        if chunk_size % factor == 0:
+            return factor
+    return 1
+
+
+def design_resampling_fir(factor, highcut, sample_rate, attenuation=MULTIRATE_ATTENUATION):
+    """Kaiser-window lowpass for decimating/interpolating by factor
+
+    Everything the bandpass keeps lies below highcut, so only content that
+    would alias (or image) onto that range needs rejecting: the stopband
+    starts at internal_rate - highcut. The tap count is rounded up to a
+    multiple of factor so the taps split evenly into polyphase branches.
+    """
+    internal_rate = sample_rate / factor
+    transition = internal_rate - 2 * highcut
+    cutoff = 0.5 * internal_rate
+
+    numtaps = int(math.ceil((attenuation - 7.95) / (2.285 * 2 * math.pi * transition / sample_rate))) + 1
+    numtaps = factor * int(math.ceil(numtaps / factor))
+    beta = 0.1102 * (attenuation - 8.7)
+
+    n = np.arange(numtaps) - (numtaps - 1) / 2
+    taps = np.sinc(2 * cutoff / sample_rate * n) * np.kaiser(numtaps, beta)
+    return taps / taps.sum()
+
+
+class Decimator:
+    """Stateful FIR decimator by an integer factor
+
+    Only every factor-th output is computed (the polyphase form of the
+    filter). The taps are laid out once as a banded matrix covering a
+    sub-block of about RESAMPLING_BLOCK inputs, and a chunk is one matrix
+    product per sub-block for all channels.
+    """
+    def __init__(self, taps, factor, channels=1, block_size=RESAMPLING_BLOCK):
+        self.factor = factor
+        self.taps = np.asarray(taps[::-1], dtype=np.float32)
+        self.history = len(taps) - 1
+        self.channels = channels
+        # Inputs per sub-block, a multiple of factor
+        self.step = factor * max(1, block_size // factor)
+        # Column k holds the taps under the window of output k
+        outputs = self.step // factor
+        self.matrix = np.zeros((self.history + self.step, outputs), dtype=np.float32)
+        for k in range(outputs):
+            start = k * factor
+            self.matrix[start:start + len(self.taps), k] = self.taps
+        self.resize(0)
+
+    def resize(self, frames):
+        """(Re)allocate the work buffers for chunks of a given length"""
+        self.frames = frames
+        self.buffer = np.zeros((self.channels, self.history + frames), dtype=np.float32)
+        self.out = np.zeros((self.channels, frames // self.factor), dtype=np.float32)
+
+    def reset(self):
+        self.buffer.fill(0)
+
+    def process(self, block):
+        """Decimate a (channels, n) block, n a multiple of factor; returns a view"""
+        frames = block.shape[1]
+        if frames != self.frames:
+            history = self.buffer[:, :self.history].copy()
+            self.resize(frames)
+            self.buffer[:, :self.history] = history
+
+        self.buffer[:, self.history:] = block
+        for start in range(0, frames, self.step):
+            # A shorter last sub-block uses the top-left corner of the matrix
+            inputs = min(self.step, frames - start)
+            outputs = inputs // self.factor
+            np.matmul(self.buffer[:, start:start + self.history + inputs],
+                      self.matrix[:self.history + inputs, :outputs],
+                      out=self.out[:, start // self.factor:start // self.factor + outputs])
+        # Keep the last samples as history for the next chunk
+        self.buffer[:, :self.history] = self.buffer[:, frames:]
+        return self.out
+
+
+class Interpolator:
+    """Stateful FIR interpolator by an integer factor
+
+    Each input sample produces factor outputs, one per polyphase branch of
+    the taps, so the zero-stuffed signal is never built. As in Decimator,
+    the branches are laid out once as a banded matrix covering a sub-block
+    of about RESAMPLING_BLOCK outputs.
+    """
+    def __init__(self, taps, factor, channels=1, block_size=RESAMPLING_BLOCK):
+        self.factor = factor
+        branch_length = len(taps) // factor
+        # branches[i, p] weighs window element i (oldest first) for output phase p
+        branches = np.asarray(taps).reshape(branch_length, factor)[::-1] * factor
+        self.branches = np.ascontiguousarray(branches, dtype=np.float32)
+        self.history = branch_length - 1
+        self.channels = channels
+        # Low-rate inputs per sub-block
+        self.step = max(1, block_size // factor)
+        # Columns k * factor + p hold branch p under the window of input k
+        self.matrix = np.zeros((self.history + self.step, self.step * factor), dtype=np.float32)
+        for k in range(self.step):
+            self.matrix[k:k + self.history + 1, k * factor:(k + 1) * factor] = self.branches
+        self.resize(0)
+
+    def resize(self, frames):
+        """(Re)allocate the work buffers for low-rate chunks of a given length"""
+        self.frames = frames
+        self.buffer = np.zeros((self.channels, self.history + frames), dtype=np.float32)
+        self.out = np.zeros((self.channels, frames * self.factor), dtype=np.float32)
+
+    def reset(self):
+        self.buffer.fill(0)
+
+    def process(self, block):
+        """Interpolate a (channels, k) block to (channels, k * factor); returns a view"""
+        frames = block.shape[1]
+        if frames != self.frames:
+            history = self.buffer[:, :self.history].copy()
+            self.resize(frames)
+            self.buffer[:, :self.history] = history
+
+        self.buffer[:, self.history:] = block
+        for start in range(0, frames, self.step):
+            inputs = min(self.step, frames - start)
+            np.matmul(self.buffer[:, start:start + self.history + inputs],
+                      self.matrix[:self.history + inputs, :inputs * self.factor],
+                      out=self.out[:, start * self.factor:(start + inputs) * self.factor])
+        self.buffer[:, :self.history] = self.buffer[:, frames:]
+        return self.out
+
+
+class MultirateBandpass:
+    """Bandpass run at a lower internal rate: decimate, filter, interpolate
+
+    A drop-in for SOSFilter (same process_inplace/reset interface) for
+    narrow bands, where most of the device rate only carries content the
+    bandpass would throw away anyway.
+    """
+    def __init__(self, lowcut, highcut, sample_rate, order=4, channels=1, factor=None,
+                 chunk_size=512):
+        if factor is None:
+            factor = choose_decimation(highcut, sample_rate, chunk_size)
+        self.factor = factor
+        self.channels = channels
+        self.internal_rate = sample_rate / factor
+
+        taps = design_resampling_fir(factor, highcut, sample_rate)
+        self.decimator = Decimator(taps, factor, channels)
+        self.interpolator = Interpolator(taps, factor, channels)
+        self.band = SOSFilter.bandpass(lowcut, highcut, self.internal_rate, order, channels)
+        # Only set up once a chunk length is not a multiple of factor
+        self.fifo = None
+
+    @property
+    def order(self):
+        return self.band.order
+
+    @property
+    def latency(self):
+        """Delay added by the resampling filters (and the FIFO, if in use), in device-rate samples"""
+        return len(self.decimator.taps) - 1 + (self.fifo.delay if self.fifo is not None else 0)
+
+    def reset(self):
+        """Clear the filter state"""
+        self.decimator.reset()
+        self.interpolator.reset()
+        self.band.reset()
+        self.fifo = None
+
+    def process(self, samples):
+        """Filter one 1-D chunk or (channels, n) block, carrying state to the next"""
+        block = np.array(samples, dtype=np.float32, ndmin=2)
+        self.process_inplace(block)
+        return block[0] if np.ndim(samples) == 1 else block
+
+    def process_inplace(self, block):
+        """Filter a (channels, n) float32 block in place
+
+        Lengths that are multiples of factor are filtered directly. From the
+        first chunk of another length on, chunks go through a BlockFifo,
+        which costs factor - 1 samples of delay.
+        """
+        if self.fifo is None and block.shape[1] % self.factor == 0:
+            return self.process_blocks(block)
+        if self.fifo is None:
+            self.fifo = BlockFifo(self.channels, self.factor)
+        return self.fifo.process_inplace(block, self.process_blocks)
+
+    def process_blocks(self, block):
+        """Filter a block whose length is a multiple of factor, in place"""
+        low_rate = self.decimator.process(block)
+        self.band.process_inplace(low_rate)
+        block[...] = self.interpolator.process(low_rate)
+        return block
+
+
+class Resampler:
+    """Stateful rational-ratio resampler between two device rates, e.g. 48000 -> 44100 Hz
+
+    The ratio is reduced to up/down (147/160 for that example) and a
+    Kaiser lowpass designed at up times the input rate is split into up
+    polyphase branches of taps_per_phase taps each (by default as many as
+    reaching the stopband at the lower Nyquist takes); output sample n is
+    branch (n * down) % up applied to the taps_per_phase input samples
+    ending at (n * down) // up. The last inputs are kept as history and
+    the output index carries over, so consecutive chunks resample as one
+    continuous signal: a chunk yields a varying number of frames (about
+    its length times up / down), never a seam.
+    """
+    def __init__(self, input_rate, output_rate, channels=1, taps_per_phase=None,
+                 attenuation=MULTIRATE_ATTENUATION):
+        input_rate, output_rate = int(input_rate), int(output_rate)
+        common = math.gcd(input_rate, output_rate)
+        self.up = output_rate // common
+        self.down = input_rate // common
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.channels = channels
+
+        # Pass up to RESAMPLER_PASSBAND of the lower Nyquist, reject from that Nyquist on
+        nyquist = 0.5 * min(input_rate, output_rate)
+        cutoff = 0.5 * (1 + RESAMPLER_PASSBAND) * nyquist
+        if taps_per_phase is None:
+            transition = (1 - RESAMPLER_PASSBAND) * nyquist
+            taps_per_phase = int(math.ceil((attenuation - 7.95) / (2.285 * 2 * math.pi * transition / input_rate))) + 1
+        self.taps_per_phase = taps_per_phase
+        numtaps = self.up * taps_per_phase
+        beta = 0.1102 * (attenuation - 8.7)
+        n = np.arange(numtaps) - (numtaps - 1) / 2
+        prototype = np.sinc(2 * cutoff / (input_rate * self.up) * n) * np.kaiser(numtaps, beta)
+        prototype *= self.up / prototype.sum()
+        # phases[p, k] weighs input (i - k) for outputs on phase p
+        self.phases = np.ascontiguousarray(prototype.reshape(taps_per_phase, self.up).T, dtype=np.float32)
+        self.offsets = np.arange(taps_per_phase)
+        self.reset()
+
+    @property
+    def latency(self):
+        """Delay added, in seconds (half the prototype filter, at up times the input rate)"""
+        return (self.up * self.taps_per_phase - 1) / 2 / (self.input_rate * self.up)
+
+    def reset(self):
+        """Clear the history; the next chunk starts a new signal"""
+        self.history = np.zeros((self.channels, self.taps_per_phase - 1), dtype=np.float32)
+        # Global index of the next input sample and of the next output sample
+        self.input_index = 0
+        self.output_index = 0
+
+    def process(self, block):
+        """Resample a (channels, n) float block; returns a new (channels, m) float32 block"""
+        frames = block.shape[1]
+        start = self.input_index
+        end = start + frames
+        # Every output whose newest input sample has arrived
+        stop = -(-end * self.up // self.down)
+        positions = np.arange(self.output_index, stop) * self.down
+        newest = positions // self.up - start + self.history.shape[1]
+        buffer = np.concatenate([self.history, block.astype(np.float32, copy=False)], axis=1)
+        # np.take is several times faster than fancy indexing for this gather
+        windows = np.take(buffer, newest[:, None] - self.offsets, axis=1)
+        out = np.einsum('cok,ok->co', windows, self.phases[positions % self.up])
+
+        self.history = buffer[:, frames:]
+        self.input_index = end
+        self.output_index = stop
+        # Both indices advance by whole periods of the ratio; keep them small
+        periods = self.output_index // self.up
+        self.output_index -= periods * self.up
+        self.input_index -= periods * self.down
+        return out
+
+    def process_bytes(self, data, sample_format=INT16):
+        """Resample interleaved stream bytes of a buffers.SampleFormat, as read from or written to a stream"""
+        samples = sample_format.decode(data).reshape(-1, self.channels)
+        return sample_format.encode(self.process(samples.T).T)
+
+
+def make_bandpass(lowcut, highcut, sample_rate, order=4, channels=1, chunk_size=512,
+                  multirate=False):
+    """Bandpass for a stream: multirate when enabled and the band is narrow enough"""
+    if multirate and choose_decimation(highcut, sample_rate, chunk_size) > 1:
+        return MultirateBandpass(lowcut, highcut, sample_rate, order, channels,
+                                 chunk_size=chunk_size)
+    return SOSFilter.bandpass(lowcut, highcut, sample_rate, order, channels)
@@ -0,0 +1,233 @@
+import math
+
+import numpy as np
+
+from filters import SOSFilter, design_notch_sos
+
+# Tones tracked at once unless asked otherwise
+DEFAULT_NOTCH_COUNT = 4
+
+
+class AdaptiveNotchBank:
+    """Notches that find and follow up to max_notches steady tones
+
+    Tones are acquired by an occasional spectral search: every
+    search_seconds the latest search_size samples are transformed once and
+    the strongest peaks standing prominence_db over the median bin get a
+    notch. Between searches each notch follows its tone on its own, with
+    one complex oscillator per notch: the phase drift of the tone against
+    the oscillator from one chunk to the next is its frequency error. That
+    tracking costs O(notches * chunk) and no FFT; the search is spread over
+    many chunks.
+
+    All notches run as one SOS cascade. Only the sections of notches that
+    moved, appeared or went away are redesigned, the state of the others is
+    kept, and with no tone tracked the audio is not touched at all.
+    """
+    def __init__(self, sample_rate=44100, channels=1, max_notches=DEFAULT_NOTCH_COUNT, q=30.0,
+                 search_size=4096, search_seconds=0.25, prominence_db=20.0, floor_db=-60.0,
+                 release_seconds=0.5, min_hz=40.0, min_bandwidth_hz=8.0, retune_fraction=0.05,
+                 retune_seconds=0.1, tracking_gain=0.1, tones=()):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.max_notches = max_notches
+        self.q = q
+        self.search_size = search_size
+        self.search_interval = max(1, int(round(search_seconds * sample_rate)))
+        self.prominence = 10 ** (prominence_db / 10)
+        self.release_searches = max(1, int(math.ceil(release_seconds / search_seconds)))
+        self.min_hz = min_hz
+        self.max_hz = 0.45 * sample_rate
+        # Low tones get a wider notch than q alone gives, so slight drift stays inside it
+        self.min_bandwidth_hz = min_bandwidth_hz
+        # A notch is redesigned once its tone drifts this fraction of its bandwidth
+        self.retune_fraction = retune_fraction
+        # ... but at most once per retune_seconds, as restacking the cascade is the costly part
+        self.retune_interval = max(1, int(round(retune_seconds * sample_rate)))
+        # Fraction of the measured frequency error corrected per chunk
+        self.tracking_gain = tracking_gain
+
+        self.window = np.hanning(search_size).astype(np.float32)
+        # Power of a full-scale sine at its spectral peak, the reference for floor_db
+        full_scale_power = (0.5 * 32768.0 * float(np.sum(self.window))) ** 2
+        self.floor_power = full_scale_power * 10 ** (floor_db / 10)
+        self.bin_hz = sample_rate / search_size
+        # Mono history for the search, newest sample last
+        self.history = np.zeros(search_size, dtype=np.float32)
+        self.taper = self.steps = np.zeros(0, dtype=np.float32)
+        self.reset()
+        # Tones already known (e.g. from the bank this one replaces) are notched from the start
+        for freq in list(tones)[:max_notches]:
+            self.add(freq)
+        self.rebuild()
+
+    @property
+    def order(self):
+        return len(self.freqs)
+
+    def reset(self):
+        """Forget every tracked tone and the history"""
+        self.history.fill(0)
+        self.since_search = 0
+        self.since_rebuild = 0
+        # One entry per tracked tone, in cascade order
+        self.freqs = np.zeros(0)
+        self.designed = np.zeros(0)  # frequency the section was designed for
+        self.phase = np.zeros(0)
+        self.last = np.zeros(0, dtype=np.complex128)  # oscillator output of the previous chunk
+        self.misses = np.zeros(0, dtype=np.int64)
+        self.sections = np.zeros((0, 6), dtype=np.float32)
+        self.section_index = np.zeros(0, dtype=np.int64)  # position in the running cascade, -1 if new
+        self.filter = None
+
+    def search(self):
+        """Find prominent peaks in the history; returns their frequencies, strongest first"""
+        spectrum = np.fft.rfft(self.history * self.window)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        low = max(1, int(self.min_hz / self.bin_hz))
+        high = min(len(power) - 1, int(self.max_hz / self.bin_hz))
+        region = power[low - 1:high + 1]
+        centre = region[1:-1]
+        median = np.partition(centre, len(centre) // 2)[len(centre) // 2]
+        peaks = np.flatnonzero((centre > region[:-2]) & (centre >= region[2:])
+                               & (centre > median * self.prominence) & (centre > self.floor_power))
+        peaks = peaks[np.argsort(centre[peaks])[::-1]][:2 * self.max_notches]
+
+        # Parabolic interpolation of the log power around each peak bin
+        before, at, after = np.log(region[peaks[:, None] + np.arange(3)] + 1e-12).T
+        offset = 0.5 * (before - after) / (before - 2 * at + after)
+        return (low + peaks + offset) * self.bin_hz
+
+    def bandwidth(self, freq):
+        """-3 dB width of the notch for a tone at freq, in Hz"""
+        return np.maximum(freq / self.q, self.min_bandwidth_hz)
+
+    def design(self, freq):
+        """Notch section for a tone at freq"""
+        return design_notch_sos(freq, self.sample_rate, freq / self.bandwidth(freq))
+
+    def keep(self, mask):
+        """Drop the notches where mask is False"""
+        self.freqs = self.freqs[mask]
+        self.designed = self.designed[mask]
+        self.phase = self.phase[mask]
+        self.last = self.last[mask]
+        self.misses = self.misses[mask]
+        self.sections = self.sections[mask]
+        self.section_index = self.section_index[mask]
+
+    def add(self, freq):
+        """Start notching a new tone at freq"""
+        self.freqs = np.append(self.freqs, freq)
+        self.designed = np.append(self.designed, freq)
+        self.phase = np.append(self.phase, 0.0)
+        self.last = np.append(self.last, 0.0)
+        self.misses = np.append(self.misses, 0)
+        self.sections = np.vstack([self.sections, self.design(freq)])
+        self.section_index = np.append(self.section_index, -1)
+
+    def update_notches(self, peaks):
+        """Keep, release and add notches from the peaks of a search; True if any changed"""
+        # Each notch claims the nearest unclaimed peak within its bandwidth
+        claimed = np.zeros(len(peaks), dtype=bool)
+        for index, freq in enumerate(self.freqs.tolist()):
+            distance = np.abs(peaks - freq)
+            distance[claimed] = np.inf
+            nearest = int(np.argmin(distance)) if len(peaks) else -1
+            if nearest >= 0 and distance[nearest] < max(self.bandwidth(freq), 2 * self.bin_hz):
+                claimed[nearest] = True
+                self.misses[index] = 0
+            else:
+                self.misses[index] += 1
+
+        # Release tones gone for release_seconds, and notches that converged
+        # on the same tone as an earlier one
+        keep = self.misses < self.release_searches
+        for index in range(1, len(self.freqs)):
+            earlier = self.freqs[:index][keep[:index]]
+            if np.any(np.abs(earlier - self.freqs[index]) < self.bandwidth(self.freqs[index])):
+                keep[index] = False
+        changed = not keep.all()
+        if changed:
+            self.keep(keep)
+
+        for freq in peaks[~claimed][:self.max_notches - len(self.freqs)].tolist():
+            self.add(freq)
+            changed = True
+        return changed
+
+    def track(self, mono):
+        """Follow every notch's tone through one chunk; True if a notch needs redesigning"""
+        n = len(mono)
+        if len(self.taper) != n:
+            # Tapered, so strong tones elsewhere do not leak into the estimate
+            self.taper = np.hanning(n).astype(np.float32)
+            self.steps = np.arange(n, dtype=np.float32)
+        omega = 2 * np.pi * self.freqs / self.sample_rate
+        # One complex oscillator per notch, continuing from the previous chunk,
+        # as real cos/sin rows in float32
+        angles = np.multiply.outer(omega.astype(np.float32), self.steps)
+        angles += self.phase.astype(np.float32)[:, None]
+        tapered = mono * self.taper
+        amplitudes = np.cos(angles) @ tapered - 1j * (np.sin(angles) @ tapered)
+        self.phase = (self.phase + omega * n) % (2 * np.pi)
+
+        # The tone drifts against the oscillator by its frequency error per
+        # sample (zero for a notch that has no previous chunk yet)
+        error = np.angle(amplitudes * self.last.conj()) / n
+        self.last = amplitudes
+        self.freqs = np.clip(self.freqs + self.tracking_gain * error * self.sample_rate / (2 * np.pi),
+                             self.min_hz, self.max_hz)
+
+        if self.since_rebuild < self.retune_interval:
+            return False
+        moved = np.flatnonzero(np.abs(self.freqs - self.designed)
+                               > self.retune_fraction * self.bandwidth(self.freqs))
+        for index in moved.tolist():
+            self.designed[index] = self.freqs[index]
+            self.sections[index] = self.design(self.freqs[index])[0]
+        return len(moved) > 0
+
+    def rebuild(self):
+        """Restack the cascade from the current notches, keeping the state of surviving ones"""
+        previous = self.filter
+        if not len(self.freqs):
+            self.filter = None
+            return
+        self.filter = SOSFilter(self.sections, self.channels)
+        if previous is not None:
+            kept = self.section_index >= 0
+            self.filter.zi[:, kept] = previous.zi[:, self.section_index[kept]]
+        self.section_index = np.arange(len(self.freqs))
+
+    def process(self, samples):
+        """Filter one 1-D chunk or (channels, n) block, carrying state to the next"""
+        block = np.array(samples, dtype=np.float32, ndmin=2)
+        self.process_inplace(block)
+        return block[0] if np.ndim(samples) == 1 else block
+
+    def process_inplace(self, block):
+        """Track the tones in a (channels, n) float32 block and notch them out in place"""
+        frames = block.shape[1]
+        self.since_rebuild += frames
+        mono = block[0] if self.channels == 1 else block.mean(axis=0)
+        changed = self.track(mono) if len(self.freqs) else False
+
+        # Slide the chunk into the search history
+        if frames >= self.search_size:
+            self.history[:] = mono[-self.search_size:]
+        else:
+            self.history[:-frames] = self.history[frames:]
+            self.history[-frames:] = mono
+        self.since_search += frames
+        if self.since_search >= self.search_interval:
+            self.since_search = 0
+            if self.update_notches(self.search()):
+                changed = True
+
+        if changed:
+            self.rebuild()
+            self.since_rebuild = 0
+        if self.filter is not None:
+            self.filter.process_inplace(block)
+        return block
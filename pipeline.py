@@ -0,0 +1,272 @@
+import time
+
+import numpy as np
+
+from filters import SOSFilter
+
+
+class Stage:
+    """One step of a Pipeline, working in place on the shared work block
+
+    Subclasses implement process_inplace(block) on a (channels, n) float32
+    block at int16 scale; name labels the stage in the timing report.
+    """
+    name = 'stage'
+    # Samples of pure delay the stage adds (a look-ahead or resampling filters)
+    delay = 0
+
+    def process_inplace(self, block):
+        raise NotImplementedError
+
+    def reset(self):
+        """Clear any state carried between chunks"""
+
+    def resize(self, frames):
+        """Allocate any work buffers for chunks of a given length"""
+
+
+class GainStage(Stage):
+    """Fixed gain in dB"""
+    name = 'gain'
+
+    def __init__(self, gain_db):
+        self.gain_db = gain_db
+        self.gain = np.float32(10 ** (gain_db / 20))
+
+    def process_inplace(self, block):
+        block *= self.gain
+        return block
+
+
+class FilterStage(Stage):
+    """Any stateful filter with process_inplace/reset (bandpass, notch, EQ, ...)"""
+    def __init__(self, filter, name='filter'):
+        self.filter = filter
+        self.name = name
+
+    @property
+    def delay(self):
+        # Only resampling filters (MultirateBandpass) have a pure delay
+        return getattr(self.filter, 'latency', 0)
+
+    def process_inplace(self, block):
+        return self.filter.process_inplace(block)
+
+    def reset(self):
+        self.filter.reset()
+
+
+class LimiterStage(Stage):
+    """Look-ahead limiter"""
+    name = 'limiter'
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    @property
+    def gain_reduction_db(self):
+        return self.limiter.gain_reduction_db
+
+    @property
+    def delay(self):
+        return self.limiter.lookahead
+
+    def resize(self, frames):
+        self.limiter.resize(frames)
+
+    def process_inplace(self, block):
+        return self.limiter.process_inplace(block)
+
+    def reset(self):
+        self.limiter.reset()
+
+
+class MeterStage(Stage):
+    """Level of the block at this point of the pipeline, relative to full scale"""
+    def __init__(self, name='meter'):
+        self.name = name
+        self.rms = 0.0
+        self.peak = 0.0
+
+    def process_inplace(self, block):
+        self.rms = float(np.sqrt(np.mean(np.square(block)))) / 32768.0
+        self.peak = float(np.max(np.abs(block))) / 32768.0
+        return block
+
+
+class AnalyzerStage(Stage):
+    """Feeds the block to an OverloadDetector without changing it"""
+    name = 'analyzer'
+
+    def __init__(self, detector):
+        self.detector = detector
+
+    def process_inplace(self, block):
+        self.detector.analyze(block)
+        return block
+
+    def reset(self):
+        self.detector.reset()
+
+
+class ProtectionStage(Stage):
+    """Blends a protective filter in as the detector's protection level rises
+
+    The mix ramps linearly across the chunk from the previous level to the
+    current one, so engaging and releasing never step. While protection is
+    zero the filter is skipped entirely; it restarts from silence when it
+    engages again, hidden by the ramp starting at zero.
+    """
+    name = 'protection'
+
+    def __init__(self, detector, filter):
+        self.detector = detector
+        self.filter = filter
+        self.resize(0)
+
+    def resize(self, frames):
+        """(Re)allocate the scratch block and ramps for chunks of a given length"""
+        self.frames = frames
+        self.scratch = np.zeros((self.filter.channels, frames), dtype=np.float32)
+        self.unit_ramp = np.linspace(0, 1, frames, dtype=np.float32)
+        self.ramp = np.zeros(frames, dtype=np.float32)
+
+    def process_inplace(self, block):
+        start = self.detector.previous_protection
+        end = self.detector.protection
+        if start == 0.0 and end == 0.0:
+            return block
+        if start == 0.0:
+            self.filter.reset()
+        if block.shape[1] != self.frames:
+            self.resize(block.shape[1])
+
+        np.copyto(self.scratch, block)
+        self.filter.process_inplace(self.scratch)
+        # block += (filtered - block) * ramp, without temporaries
+        np.multiply(self.unit_ramp, end - start, out=self.ramp)
+        self.ramp += start
+        np.subtract(self.scratch, block, out=self.scratch)
+        self.scratch *= self.ramp
+        block += self.scratch
+        return block
+
+    def reset(self):
+        self.filter.reset()
+
+
+def is_sos_stage(stage):
+    """Whether a stage is a plain SOSFilter, which can be merged with others"""
+    return isinstance(stage, FilterStage) and type(stage.filter) is SOSFilter
+
+
+def fold_gain(gain_stage, sos_stage, name):
+    """SOS stage with a gain folded into the numerator of its first section"""
+    sos = sos_stage.filter.sos.copy()
+    sos[0, :3] *= gain_stage.gain
+    return FilterStage(SOSFilter(sos, sos_stage.filter.channels), name)
+
+
+def fuse_stages(stages):
+    """Merge neighbouring stages that can run as one
+
+    Consecutive gains become one gain, consecutive SOS filters become one
+    cascade (a single pass of the block kernel instead of one per stage)
+    and a gain next to an SOS filter is folded into its coefficients. All
+    of these are linear and time-invariant, so the result is the same;
+    fusing is done on fresh stages, before any state has built up.
+    """
+    fused = []
+    for stage in stages:
+        previous = fused[-1] if fused else None
+        if isinstance(previous, GainStage) and isinstance(stage, GainStage):
+            fused[-1] = GainStage(previous.gain_db + stage.gain_db)
+        elif is_sos_stage(previous) and is_sos_stage(stage):
+            sos = np.vstack([previous.filter.sos, stage.filter.sos])
+            fused[-1] = FilterStage(SOSFilter(sos, stage.filter.channels),
+                                    f"{previous.name}+{stage.name}")
+        elif isinstance(previous, GainStage) and is_sos_stage(stage):
+            fused[-1] = fold_gain(previous, stage, f"{previous.name}+{stage.name}")
+        elif is_sos_stage(previous) and isinstance(stage, GainStage):
+            fused[-1] = fold_gain(stage, previous, f"{previous.name}+{stage.name}")
+        else:
+            fused.append(stage)
+    return fused
+
+
+class Pipeline:
+    """Ordered processing stages sharing one preallocated work buffer
+
+    Chunks are converted from the stream's sample format once on the way
+    in and back once on the way out; every stage works in place on the same float32 block in
+    between and is timed separately. An empty pipeline passes the bytes
+    through untouched.
+    """
+    def __init__(self, stages, buffers, fuse=True):
+        stages = list(stages)
+        self.stages = fuse_stages(stages) if fuse else stages
+        self.buffers = buffers
+        # Allocate now, in the thread building the pipeline, not on its first chunk
+        if buffers is not None:
+            for stage in self.stages:
+                stage.resize(buffers.chunk_size)
+        self.reset_timings()
+
+    def reset_timings(self):
+        """Clear the per-stage timing counters"""
+        self.chunks = 0
+        self.stage_total = [0.0] * len(self.stages)
+        self.stage_max = [0.0] * len(self.stages)
+
+    def reset(self):
+        """Clear the state of every stage"""
+        for stage in self.stages:
+            stage.reset()
+
+    @property
+    def detector(self):
+        """OverloadDetector of the analyzer stage, or None"""
+        for stage in self.stages:
+            if isinstance(stage, AnalyzerStage):
+                return stage.detector
+        return None
+
+    @property
+    def delay(self):
+        """Samples of pure delay through every stage"""
+        return sum(stage.delay for stage in self.stages)
+
+    @property
+    def gain_reduction_db(self):
+        """Gain reduction of the limiter stages on the latest chunk"""
+        return sum(stage.gain_reduction_db for stage in self.stages if isinstance(stage, LimiterStage))
+
+    def process_inplace(self, block):
+        """Run every stage on a (channels, n) float32 block, timing each"""
+        clock = time.perf_counter
+        start = clock()
+        for index, stage in enumerate(self.stages):
+            stage.process_inplace(block)
+            now = clock()
+            elapsed = now - start
+            self.stage_total[index] += elapsed
+            if elapsed > self.stage_max[index]:
+                self.stage_max[index] = elapsed
+            start = now
+        self.chunks += 1
+        return block
+
+    def process(self, audio_data):
+        """Process one chunk of interleaved stream bytes"""
+        if not self.stages:
+            return audio_data
+        self.process_inplace(self.buffers.load(audio_data))
+        return self.buffers.store()
+
+    def stage_snapshot(self):
+        """Mean and max time of every stage as a list of dicts, in ms"""
+        chunks = max(self.chunks, 1)
+        return [
+            {'name': stage.name, 'mean_ms': total / chunks * 1e3, 'max_ms': longest * 1e3}
+            for stage, total, longest in zip(self.stages, self.stage_total, self.stage_max)
+        ]
@@ -0,0 +1,734 @@
+import pyaudio
+import numpy as np
+import threading
+import time
+
+from analyzer import OverloadDetector
+from autotune import BufferTuner, measure_round_trip
+from audio_worker import AudioProcessHost
+from buffers import ChunkBuffers
+from convolution import DEFAULT_FIR_TAPS, PartitionedConvolver, design_fir_from_response
+from devices import DeviceRegistry, negotiate_format, negotiate_rates
+from dynamics import Limiter
+from filters import SOSFilter, check_band, crossfade_filters
+from meters import LevelMeter, SpectrumMeter
+from metrics import AudioMetrics
+from multirate import Resampler, make_bandpass
+from notches import AdaptiveNotchBank
+from recorder import AudioRecorder, recording_base
+from pipeline import (AnalyzerStage, FilterStage, GainStage, LimiterStage, Pipeline,
+                      ProtectionStage)
+from streaming import CallbackEngine
+
+# Largest chunk a stream may be opened with, in frames (186 ms at 44.1 kHz)
+MAX_CHUNK_SIZE = 8192
+
+# Named settings for common situations, applied with AudioProcessor.apply_preset
+PRESETS = {
+    # Narrow band around the speech fundamentals, the default
+    'padrao': {'lowcut': 700.0, 'highcut': 1300.0, 'filter_order': 3, 'auto_notches': 0,
+               'auto_protect': False},
+    # Telephone band: speech stays intelligible, rumble and hiss go
+    'fala': {'lowcut': 300.0, 'highcut': 3400.0, 'filter_order': 3, 'auto_notches': 0,
+             'auto_protect': False},
+    # Wide band with the protection on guard for spikes and piercing tones
+    'suave': {'lowcut': 150.0, 'highcut': 6000.0, 'filter_order': 2, 'auto_notches': 0,
+              'auto_protect': True},
+    # Almost everything passes, steady tones (whine, hum, beeps) are notched out
+    'tons': {'lowcut': 60.0, 'highcut': 12000.0, 'filter_order': 2, 'auto_notches': 4,
+             'auto_protect': False},
+}
+
+
+class AudioProcessor:
+    """Handles both passthrough and filtering audio processing"""
+    def __init__(self, sample_rate=44100, chunk_size=512, filter_order=3,
+                 stream_mode='blocking', jitter_chunks=2, isolation='thread', channels=1,
+                 multirate=False, limiter=True, auto_protect=False, auto_notches=0,
+                 auto_tune=False, native_rate=True, output_rate=None, sample_format='int16', auto_format=True,
+                 backend=pyaudio.PyAudio):
+        # Rate of the capture and of all processing; playback runs at output_rate,
+        # through a resampler when the two differ
+        self.sample_rate = sample_rate
+        self.output_rate = sample_rate if output_rate is None else output_rate
+        # Pick both rates per device pair at start() instead of always using sample_rate
+        self.native_rate = native_rate
+        # Sample format of both streams (a name in buffers.SAMPLE_FORMATS), and
+        # whether start() picks the best one the devices support instead
+        self.sample_format = sample_format
+        self.auto_format = auto_format
+        self.chunk_size = chunk_size
+        self.channels = channels
+        self.filter_order = filter_order
+        self.running = False
+        self.mode = None  # 'passthrough' or 'filter'
+        self.stream_mode = stream_mode  # 'blocking' or 'callback'
+        self.jitter_chunks = jitter_chunks  # chunks buffered before playback in callback mode
+        self.isolation = isolation  # 'thread' or 'process' (audio loop in a child process)
+        self.multirate = multirate  # filter narrow bands at a decimated internal rate
+        # Follow the glitch rate with the chunk size instead of keeping chunk_size fixed
+        self.auto_tune = auto_tune
+        self.tuner = None
+        # Chunk size the audio thread should reopen its streams with, or None
+        self.next_chunk_size = None
+        
+        # Filter design
+        self.lowcut = 700.0
+        self.highcut = 1300.0
+        self.nyquist = 0.5 * self.sample_rate
+        # Custom FIR (e.g. an EQ curve) used instead of the bandpass when set
+        self.impulse_response = None
+        # (freqs, gains_db, numtaps) of an EQ curve, to redesign it for a new rate
+        self.response = None
+        # Fixed (frequency, q) notches applied after the band filter
+        self.notches = []
+        # Up to this many steady tones are found and notched automatically (0 = off)
+        self.auto_notches = auto_notches
+        self.gain_db = 0.0
+        # Look-ahead limiter in place of hard clipping
+        self.limiter_enabled = limiter
+        # Engage (or, when filtering, intensify) the band filter on overload
+        self.auto_protect = auto_protect
+        
+        # Per-stream work buffers reused for every chunk, shared by all stages
+        self.buffers = ChunkBuffers(self.chunk_size, self.channels, self.sample_format)
+        
+        self.pipeline = None
+        self.update_pipeline()
+        
+        # Input/output levels of the latest chunk
+        self.meter = LevelMeter()
+        # Input/output spectrum, refreshed a few dozen times per second
+        self.spectrum = SpectrumMeter(self.sample_rate)
+        
+        # Chunk timing, deadline misses, xruns and latency
+        self.metrics = AudioMetrics(self.sample_rate, self.chunk_size)
+        # WAV tap on the stream while recording, else None
+        self.recorder = None
+        
+        # Cached devices of every host API, and the PortAudio instance they belong to
+        self.registry = DeviceRegistry(backend)
+        self.stream_in = None
+        self.stream_out = None
+        self.processing_thread = None
+        self.host = None
+        # Devices of the open session, reused by start() for an in-band mode switch
+        self.devices = None
+    
+    def design_filter(self, lowcut, highcut, filter_order):
+        """Bandpass for the current stream settings"""
+        return make_bandpass(lowcut, highcut, self.sample_rate, filter_order, self.channels,
+                             self.chunk_size, self.multirate)
+    
+    def build_pipeline(self):
+        """Processing stages for the current mode and settings, with fresh state
+
+        Passthrough only keeps the gain, the limiter and the automatic
+        protection, so with all of them off it is an empty pipeline that
+        hands the captured bytes straight back.
+        """
+        stages = []
+        if self.auto_protect:
+            # Analyze the capture before anything changes it
+            detector = OverloadDetector(self.sample_rate)
+            stages.append(AnalyzerStage(detector))
+        if self.gain_db:
+            stages.append(GainStage(self.gain_db))
+        if self.mode != 'passthrough':
+            if self.impulse_response is not None:
+                eq = PartitionedConvolver(self.impulse_response, self.channels, self.chunk_size)
+                stages.append(FilterStage(eq, 'eq'))
+            else:
+                bandpass = self.design_filter(self.lowcut, self.highcut, self.filter_order)
+                stages.append(FilterStage(bandpass, 'bandpass'))
+            for freq, q in self.notches:
+                stages.append(FilterStage(SOSFilter.notch(freq, self.sample_rate, q, self.channels), 'notch'))
+        if self.auto_notches:
+            bank = AdaptiveNotchBank(self.sample_rate, self.channels, self.auto_notches,
+                                     tones=self.tracked_tones())
+            stages.append(FilterStage(bank, 'auto_notch'))
+        if self.auto_protect:
+            # Blends in the bandpass (a second pass of it when already filtering)
+            protective = self.design_filter(self.lowcut, self.highcut, self.filter_order)
+            stages.append(ProtectionStage(detector, protective))
+        if self.limiter_enabled:
+            stages.append(LimiterStage(Limiter(self.sample_rate, self.channels)))
+        return Pipeline(stages, self.buffers)
+    
+    def tracked_tones(self):
+        """Tones the running notch bank follows, so its replacement starts on them"""
+        if self.pipeline is not None:
+            for stage in self.pipeline.stages:
+                if stage.name == 'auto_notch':
+                    return stage.filter.freqs.tolist()
+        return []
+    
+    def update_pipeline(self):
+        """Rebuild the pipeline from the current settings, replacing the running one"""
+        self.pipeline = self.build_pipeline()
+        # Latest published pipeline, adopted by the audio thread at a chunk boundary
+        self.next_pipeline = self.pipeline
+    
+    def publish_pipeline(self):
+        """Hand a pipeline built from the current settings to the audio thread
+
+        It is built here, in the caller's thread, and only published; the
+        audio thread crossfades to it on its next chunk and never waits
+        for a design. When stopped it is installed directly. Each pipeline
+        keeps the ChunkBuffers it was built for, so one that loses a race
+        with a chunk-size change is rebuilt by the audio thread.
+        """
+        new_pipeline = self.build_pipeline()
+        if self.running:
+            self.next_pipeline = new_pipeline
+        else:
+            self.pipeline = self.next_pipeline = new_pipeline
+    
+    def apply_settings(self, **settings):
+        """Set attributes and publish the pipeline they make, all or nothing
+
+        If the pipeline cannot be built (a design error, say) every
+        attribute is restored before the error propagates, so one bad
+        value never breaks later changes or the next start(). With the
+        audio in a child process the child builds its own pipeline.
+        """
+        previous = {name: getattr(self, name) for name in settings}
+        for name, value in settings.items():
+            setattr(self, name, value)
+        if self.host is not None:
+            return
+        try:
+            self.publish_pipeline()
+        except Exception:
+            for name, value in previous.items():
+                setattr(self, name, value)
+            raise
+    
+    def set_mode(self, mode):
+        """Switch between 'passthrough' and 'filter' without touching the streams
+
+        The new pipeline is published like any other change and crossfaded
+        in at the next chunk boundary.
+        """
+        self.mode = mode
+        if self.host is not None:
+            self.host.send('set_mode', mode)
+            return
+        self.publish_pipeline()
+    
+    def retune(self, lowcut, highcut, filter_order=None):
+        """Change the filter band, live if audio is running; ValueError keeps the current band"""
+        if filter_order is None:
+            filter_order = self.filter_order
+        
+        check_band(lowcut, highcut, self.sample_rate, filter_order)
+        self.apply_settings(lowcut=lowcut, highcut=highcut, filter_order=filter_order,
+                            impulse_response=None, response=None)
+        if self.host is not None:
+            self.host.send('set_filter', lowcut, highcut, filter_order)
+    
+    def apply_preset(self, name):
+        """Switch to one of PRESETS (band, notch bank and protection), live, in one crossfade"""
+        if name not in PRESETS:
+            raise ValueError(f"Preset desconhecido: {name} (opções: {', '.join(PRESETS)})")
+        preset = PRESETS[name]
+        # e.g. a band reaching above Nyquist on a low-rate device
+        check_band(preset['lowcut'], preset['highcut'], self.sample_rate, preset['filter_order'])
+        self.apply_settings(impulse_response=None, response=None, **preset)
+        if self.host is not None:
+            self.host.send('set_filter', self.lowcut, self.highcut, self.filter_order)
+            self.host.send('set_auto_notches', self.auto_notches)
+            self.host.send('set_auto_protect', self.auto_protect)
+    
+    def set_response(self, freqs, gains_db, numtaps=DEFAULT_FIR_TAPS):
+        """Filter with an EQ curve given as (frequency, gain in dB) points instead of the bandpass"""
+        self.set_impulse_response(design_fir_from_response(freqs, gains_db, self.sample_rate, numtaps))
+        self.response = (freqs, gains_db, numtaps)
+    
+    def set_impulse_response(self, impulse_response):
+        """Filter with an arbitrary FIR instead of the bandpass, live if audio is running"""
+        self.apply_settings(impulse_response=impulse_response, response=None)
+        if self.host is not None:
+            self.host.send('set_impulse_response', impulse_response)
+    
+    def set_notches(self, notches):
+        """Notch out fixed tones, given as (frequency, q) pairs, after the band filter"""
+        self.apply_settings(notches=[(float(freq), float(q)) for freq, q in notches])
+        if self.host is not None:
+            self.host.send('set_notches', self.notches)
+    
+    def set_auto_notches(self, count):
+        """Track and notch out up to count steady tones (0 turns it off), live if audio is running"""
+        self.auto_notches = count
+        if self.host is not None:
+            self.host.send('set_auto_notches', count)
+            return
+        self.publish_pipeline()
+    
+    def set_gain(self, gain_db):
+        """Set the gain applied before the filters, in dB"""
+        self.gain_db = gain_db
+        if self.host is not None:
+            self.host.send('set_gain', gain_db)
+            return
+        self.publish_pipeline()
+    
+    def set_auto_protect(self, enabled):
+        """Turn the automatic overload protection on or off, live if audio is running"""
+        self.auto_protect = enabled
+        if self.host is not None:
+            self.host.send('set_auto_protect', enabled)
+            return
+        self.publish_pipeline()
+    
+    def set_limiter(self, enabled):
+        """Turn the look-ahead limiter on or off, live if audio is running"""
+        self.limiter_enabled = enabled
+        if self.host is not None:
+            self.host.send('set_limiter', enabled)
+            return
+        self.publish_pipeline()
+        
+    def start_recording(self, base=None, sources=('output',), max_seconds=None, max_bytes=None):
+        """Record the stream to WAV files named after base (timestamped by default); returns base
+
+        sources is 'input' (before processing), 'output' or both; files
+        rotate every max_seconds / max_bytes when given. Writing happens on
+        a background thread, so this is safe while audio is running.
+        """
+        if base is None:
+            base = recording_base()
+        if self.host is not None:
+            self.host.send('start_recording', base, sources, max_seconds, max_bytes)
+            return base
+        self.stop_recording()
+        self.recorder = AudioRecorder(base, self.sample_rate, self.channels, sources, max_seconds,
+                                      max_bytes, sample_format=self.sample_format)
+        return base
+    
+    def stop_recording(self):
+        """Finish the recording; returns the closed AudioRecorder, or None
+
+        In a child process the recorder lives there and reports through the log.
+        """
+        if self.host is not None:
+            self.host.send('stop_recording')
+            return None
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+        return recorder
+    
+    def set_sample_rate(self, sample_rate):
+        """Process at another rate from the next session on, redesigning every filter for it"""
+        self.sample_rate = sample_rate
+        self.nyquist = 0.5 * sample_rate
+        if self.response is not None:
+            freqs, gains_db, numtaps = self.response
+            self.impulse_response = design_fir_from_response(freqs, gains_db, sample_rate, numtaps)
+        self.spectrum.set_sample_rate(sample_rate)
+        self.metrics.configure(sample_rate, self.chunk_size)
+        self.update_pipeline()
+    
+    def negotiate_rates(self, input_device, output_device, log_callback):
+        """Capture and play at rates the devices run natively; see devices.negotiate_rates"""
+        input_rate, output_rate = negotiate_rates(self.p, input_device, output_device, self.channels,
+                                                  self.sample_rate, 2 * self.highcut)
+        if input_rate != self.sample_rate:
+            self.set_sample_rate(input_rate)
+        self.output_rate = output_rate
+        if output_rate != input_rate:
+            log_callback(f"⚙ Entrada a {input_rate} Hz, saída a {output_rate} Hz: reamostrando a saída")
+        else:
+            log_callback(f"⚙ Taxa de amostragem: {input_rate} Hz")
+    
+    def negotiate_format(self, input_device, output_device, log_callback):
+        """Use the best sample format both devices support; see devices.negotiate_format"""
+        self.sample_format = negotiate_format(self.p, input_device, output_device, self.channels,
+                                              self.sample_rate, self.output_rate)
+        self.buffers = ChunkBuffers(self.chunk_size, self.channels, self.sample_format)
+        self.update_pipeline()
+        log_callback(f"⚙ Formato das amostras: {self.sample_format}")
+    
+    @property
+    def p(self):
+        """PortAudio instance the device indices belong to"""
+        return self.registry.p
+    
+    def get_devices(self):
+        """(index, label) of the input and output devices of every host API, from the cache"""
+        input_devices = [(device.index, device.label) for device in self.registry.inputs]
+        output_devices = [(device.index, device.label) for device in self.registry.outputs]
+        return input_devices, output_devices
+    
+    def refresh_devices(self):
+        """Re-enumerate the devices in the background; registry.version changes when done"""
+        return self.registry.refresh_async()
+    
+    def recommend_devices(self):
+        """(input, output) AudioDevice pair with the lowest advertised latency"""
+        return self.registry.recommend()
+    
+    def process_chunk(self, audio_data):
+        """Process one captured chunk through the pipeline"""
+        start = time.perf_counter()
+        
+        # A reference read is atomic, so a pipeline published mid-chunk is
+        # simply picked up on the next one
+        pipeline = self.pipeline
+        next_pipeline = self.next_pipeline
+        if next_pipeline is not pipeline:
+            if next_pipeline.buffers is not self.buffers:
+                # Built from buffers a chunk-size change has since replaced:
+                # build it again, from the same settings, for the current ones
+                rebuilt = self.build_pipeline()
+                if self.next_pipeline is next_pipeline:
+                    self.next_pipeline = rebuilt
+                next_pipeline = rebuilt
+            block = self.buffers.load(audio_data)
+            crossfade_filters(pipeline, next_pipeline, block,
+                              self.buffers.scratch_block, self.buffers.fade_in)
+            self.pipeline = pipeline = next_pipeline
+            processed_data = self.buffers.store()
+        else:
+            processed_data = pipeline.process(audio_data)
+        
+        sample_format = self.buffers.format
+        self.meter.update(audio_data, processed_data, pipeline.gain_reduction_db, pipeline.detector,
+                          sample_format)
+        self.spectrum.update(audio_data, processed_data, self.channels, sample_format)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.tap(audio_data, processed_data)
+        self.metrics.record_chunk(time.perf_counter() - start)
+        return processed_data
+    
+    def get_meter(self):
+        """Snapshot of the latest input/output levels"""
+        if self.host is not None:
+            return self.host.meter.snapshot()
+        return self.meter.snapshot()
+    
+    def get_spectrum(self):
+        """Latest (sequence, input dBFS, output dBFS) spectrum snapshot, per band"""
+        if self.host is not None:
+            return self.host.spectrum.snapshot()
+        return self.spectrum.snapshot()
+    
+    def get_metrics(self):
+        """Snapshot of the real-time performance metrics"""
+        if self.host is not None:
+            return self.host.get_metrics()
+        snapshot = self.metrics.snapshot()
+        snapshot['stages'] = self.pipeline.stage_snapshot()
+        return snapshot
+    
+    def process_audio(self, input_device, output_device, mode, log_callback, held=False):
+        """Main audio processing loop
+
+        The streams are opened here and closed here when the loop ends, so
+        only the audio thread ever touches them; mode and pipeline changes
+        arrive in-band through publish_pipeline. A new chunk size (set by
+        hand or by the auto-tuner) is the one change that reopens them.
+        held means start() already took the registry hold for this session
+        and set running; it is released here either way.
+        """
+        self.mode = mode
+        self.next_chunk_size = None
+        if held:
+            # A stop() between start() and this thread wins
+            if not self.running:
+                self.registry.release()
+                return
+        else:
+            self.running = True
+            # No device rescan may swap the PortAudio instance under open streams
+            self.registry.hold()
+        
+        # Everything from here on is undone by the finally below, so a
+        # failed setup still leaves running False and the registry free
+        try:
+            # Reset buffers, stage state and counters
+            self.buffers = ChunkBuffers(self.chunk_size, self.channels, self.sample_format)
+            self.update_pipeline()
+            self.metrics.configure(self.sample_rate, self.chunk_size)
+            self.tuner = BufferTuner(self.chunk_size) if self.auto_tune else None
+            
+            first = True
+            while True:
+                if self.stream_mode == 'callback':
+                    self.run_callback(input_device, output_device, mode, log_callback, first)
+                else:
+                    self.run_blocking(input_device, output_device, mode, log_callback, first)
+                first = False
+                # Back here only to stop, or to reopen at a new chunk size
+                if not self.running or self.next_chunk_size is None:
+                    break
+                self.apply_chunk_size(log_callback)
+
+        except Exception as e:
+            log_callback(f"✗ Erro: {str(e)}")
+        finally:
+            self.close_streams()
+            self.registry.release()
+            self.running = False
+            log_callback(f"✓ {self.mode.upper()} parado")
+    
+    def run_blocking(self, input_device, output_device, mode, log_callback, first=True):
+        """Read, process and write chunks on blocking streams until stopped or resized"""
+        sample_format = self.buffers.format
+        self.stream_in = self.p.open(
+            format=sample_format.pa_format,
+            channels=self.channels,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=input_device,
+            frames_per_buffer=self.chunk_size
+        )
+        
+        self.stream_out = self.p.open(
+            format=sample_format.pa_format,
+            channels=self.channels,
+            rate=self.output_rate,
+            output=True,
+            output_device_index=output_device,
+            frames_per_buffer=self.chunk_size * self.output_rate // self.sample_rate
+        )
+        
+        if first:
+            log_callback(f"✓ {mode.upper()} iniciado com sucesso")
+        
+        # Only when no rate suits both devices
+        resampler = None
+        if self.output_rate != self.sample_rate:
+            resampler = Resampler(self.sample_rate, self.output_rate, self.channels)
+        
+        device_latency = self.stream_in.get_input_latency() + self.stream_out.get_output_latency()
+        if resampler is not None:
+            device_latency += resampler.latency
+        
+        try:
+            while self.running and self.next_chunk_size is None:
+                try:
+                    data = self.stream_in.read(self.chunk_size, exception_on_overflow=True)
+                except OSError as e:
+                    # The chunk is lost either way, count it instead of hiding it
+                    if e.errno != pyaudio.paInputOverflowed:
+                        raise
+                    self.metrics.overflows += 1
+                    continue
+                
+                processed_data = self.process_chunk(data)
+                if resampler is not None:
+                    processed_data = resampler.process_bytes(processed_data, sample_format)
+                
+                queued = self.stream_in.get_read_available()
+                self.metrics.queue_depth = queued
+                self.metrics.latency = device_latency + (queued + self.chunk_size) / self.sample_rate
+                
+                try:
+                    self.stream_out.write(processed_data, exception_on_underflow=True)
+                except OSError as e:
+                    if e.errno != pyaudio.paOutputUnderflowed:
+                        raise
+                    self.metrics.underruns += 1
+                
+                self.check_tuner()
+        finally:
+            self.close_streams()
+    
+    def check_tuner(self):
+        """Let the buffer auto-tuner look at the glitch counters, asking for a new size if needed"""
+        tuner = self.tuner
+        if tuner is not None and self.next_chunk_size is None:
+            self.next_chunk_size = tuner.observe(self.metrics)
+    
+    def apply_chunk_size(self, log_callback):
+        """Switch to the requested chunk size between two runs of the streams (audio thread only)"""
+        size, self.next_chunk_size = self.next_chunk_size, None
+        if size == self.chunk_size:
+            return
+        self.chunk_size = size
+        self.buffers = ChunkBuffers(size, self.channels, self.sample_format)
+        self.update_pipeline()
+        self.metrics.configure(self.sample_rate, size)
+        if self.tuner is not None:
+            self.tuner.begin(size)
+        log_callback(f"⚙ Buffer ajustado para {size} amostras ({size / self.sample_rate * 1e3:.1f} ms)")
+    
+    def set_chunk_size(self, chunk_size):
+        """Use chunk_size frames per buffer; a running session reopens its streams for it
+
+        Sizes outside 1..MAX_CHUNK_SIZE raise ValueError and change nothing.
+        """
+        if isinstance(chunk_size, bool) or chunk_size != int(chunk_size) or not 1 <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"Tamanho de buffer inválido: {chunk_size} (de 1 a {MAX_CHUNK_SIZE} amostras)")
+        chunk_size = int(chunk_size)
+        if self.host is not None:
+            self.chunk_size = chunk_size
+            self.host.send('set_chunk_size', chunk_size)
+            return
+        if self.running:
+            self.next_chunk_size = chunk_size
+            return
+        self.apply_settings(chunk_size=chunk_size,
+                            buffers=ChunkBuffers(chunk_size, self.channels, self.sample_format))
+        self.metrics.configure(self.sample_rate, chunk_size)
+    
+    def set_auto_tune(self, enabled):
+        """Let the chunk size follow the glitch rate (smallest size that stays clean)"""
+        self.auto_tune = enabled
+        if self.host is not None:
+            self.host.send('set_auto_tune', enabled)
+            return
+        self.tuner = BufferTuner(self.chunk_size) if enabled and self.running else None
+    
+    def measure_latency(self, input_device, output_device):
+        """Round-trip latency through a loopback from output to input, by chirp; see measure_round_trip
+
+        Opens its own streams, so only while stopped. Returns (seconds or
+        None if the chirp did not come back, correlation peak in dB).
+        """
+        if self.running:
+            raise RuntimeError("Pare o áudio antes de medir a latência")
+        self.registry.hold()
+        try:
+            return measure_round_trip(self.p, input_device, output_device, self.sample_rate,
+                                      self.chunk_size, self.channels)
+        finally:
+            self.registry.release()
+    
+    def close_streams(self):
+        """Stop and close both blocking streams, if open"""
+        for stream in (self.stream_in, self.stream_out):
+            if stream is not None:
+                stream.stop_stream()
+                stream.close()
+        self.stream_in = None
+        self.stream_out = None
+    
+    def run_callback(self, input_device, output_device, mode, log_callback, first=True):
+        """Run capture and playback on PortAudio callbacks until stopped or resized"""
+        engine = CallbackEngine(self.p, self.sample_rate, self.chunk_size, self.jitter_chunks,
+                                metrics=self.metrics, channels=self.channels, output_rate=self.output_rate,
+                                sample_format=self.sample_format)
+        engine.start(input_device, output_device, self.process_chunk)
+        if first:
+            log_callback(f"✓ {mode.upper()} iniciado com sucesso (callback)")
+        
+        try:
+            while self.running and engine.is_active() and self.next_chunk_size is None:
+                time.sleep(0.05)
+                self.check_tuner()
+        finally:
+            engine.stop()
+    
+    def start(self, input_device, output_device, mode, log_callback):
+        """Start audio processing in a separate thread (or child process)
+
+        With a session already open on the same devices this only switches
+        the mode, in-band; other devices need a stop() first.
+        """
+        if self.running:
+            if self.devices != (input_device, output_device):
+                return False
+            self.set_mode(mode)
+            return True
+        
+        # Hold the PortAudio instance from the first device query on, so no
+        # rescan renumbers the devices under the negotiation; the audio
+        # thread takes the hold over, any other way out releases it
+        self.registry.hold()
+        handed_over = False
+        try:
+            self.devices = (input_device, output_device)
+            if self.native_rate:
+                self.negotiate_rates(input_device, output_device, log_callback)
+            if self.auto_format:
+                self.negotiate_format(input_device, output_device, log_callback)
+            if self.recorder is not None:
+                self.recorder.set_stream(self.sample_rate, self.sample_format)
+            # Running from here on, so a caller polling running right after
+            # start() does not see the session end before the thread begins
+            self.mode = mode
+            self.running = True
+            if self.isolation == 'process':
+                # The child opens its own PortAudio instance
+                if self.host is not None:
+                    # Left over from a child whose audio ended on its own
+                    self.host.stop()
+                host = self.host = AudioProcessHost(type(self), self.get_settings(), (self.lowcut, self.highcut))
+                self.host.start(input_device, output_device, mode, log_callback,
+                                lambda: self.host_exited(host))
+                if self.impulse_response is not None:
+                    self.host.send('set_impulse_response', self.impulse_response)
+                if self.notches:
+                    self.host.send('set_notches', self.notches)
+                if self.gain_db:
+                    self.host.send('set_gain', self.gain_db)
+                return True
+            
+            self.processing_thread = threading.Thread(
+                target=self.process_audio,
+                args=(input_device, output_device, mode, log_callback, True),
+                daemon=True
+            )
+            self.processing_thread.start()
+            handed_over = True
+            return True
+        except Exception:
+            self.running = False
+            self.devices = None
+            raise
+        finally:
+            if not handed_over:
+                self.registry.release()
+    
+    def host_exited(self, host):
+        """The child of host is no longer playing audio; called from the host's listener thread"""
+        # A host replaced by a later start() must not end the new session
+        if host is self.host:
+            self.running = False
+
+    def get_settings(self):
+        """Constructor arguments needed to recreate this processor in a child process"""
+        return {
+            'sample_rate': self.sample_rate,
+            'output_rate': self.output_rate,
+            'sample_format': self.sample_format,
+            # Already negotiated here, with the same devices
+            'native_rate': False,
+            'auto_format': False,
+            'chunk_size': self.chunk_size,
+            'filter_order': self.filter_order,
+            'stream_mode': self.stream_mode,
+            'jitter_chunks': self.jitter_chunks,
+            'channels': self.channels,
+            'multirate': self.multirate,
+            'limiter': self.limiter_enabled,
+            'auto_protect': self.auto_protect,
+            'auto_notches': self.auto_notches,
+            'auto_tune': self.auto_tune,
+        }
+    
+    def stop(self, timeout=2.0):
+        """Stop audio processing and close the session's streams"""
+        self.running = False
+        self.devices = None
+
+        if self.host is not None:
+            self.host.stop()
+            self.host = None
+
+        # The audio thread closes its own streams once it sees running is
+        # False, at most one chunk later
+        thread = self.processing_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.processing_thread = None
+        self.stop_recording()
+    
+    def close(self):
+        """Stop and release PortAudio"""
+        self.stop()
+        self.registry.close()
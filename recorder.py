@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+import wave
+from collections import deque
+
+from buffers import SAMPLE_FORMATS
+
+# Where the GUI puts its recordings, relative to the working directory
+RECORDINGS_DIR = "gravacoes"
+
+
+class RotatingWavWriter:
+    """PCM WAV output (16-bit, or 24-bit with sample_width=3) split into numbered parts of bounded length
+
+    A part is closed and the next one opened once it holds max_seconds of
+    audio or max_bytes of samples, whichever comes first (None for no
+    limit). Parts are named <base>_001.wav, <base>_002.wav, ...; with no
+    limit at all the single file is <base>.wav.
+    """
+    def __init__(self, base, sample_rate, channels, max_seconds=None, max_bytes=None, sample_width=2):
+        self.base = base
+        self.channels = channels
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.configure(sample_rate, sample_width)
+        self.part = 0
+        self.part_written = 0
+        self.wav = None
+        self.paths = []
+
+    def configure(self, sample_rate, sample_width):
+        """Set the rate and sample width of the parts still to be opened"""
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_bytes = sample_width * self.channels
+        limits = []
+        if self.max_seconds:
+            limits.append(int(self.max_seconds * sample_rate) * self.frame_bytes)
+        if self.max_bytes:
+            limits.append(max(self.frame_bytes, self.max_bytes // self.frame_bytes * self.frame_bytes))
+        self.part_bytes = min(limits) if limits else None
+
+    def open_part(self):
+        self.part += 1
+        path = f"{self.base}_{self.part:03d}.wav" if self.part_bytes else f"{self.base}.wav"
+        self.wav = wave.open(path, 'wb')
+        self.wav.setnchannels(self.channels)
+        self.wav.setsampwidth(self.sample_width)
+        self.wav.setframerate(self.sample_rate)
+        self.part_written = 0
+        self.paths.append(path)
+
+    def write(self, data):
+        """Append interleaved PCM bytes, rotating parts as they fill up"""
+        data = memoryview(data).cast('B')
+        while len(data):
+            if self.wav is None:
+                self.open_part()
+            room = len(data) if self.part_bytes is None else self.part_bytes - self.part_written
+            # writeframes also patches the header, so every part stays playable
+            # even if the program dies mid-recording
+            self.wav.writeframes(data[:room])
+            self.part_written += min(room, len(data))
+            data = data[room:]
+            if self.part_bytes is not None and self.part_written >= self.part_bytes:
+                self.wav.close()
+                self.wav = None
+
+    def close(self):
+        if self.wav is not None:
+            self.wav.close()
+            self.wav = None
+
+
+class AudioRecorder:
+    """Tap recording the input and/or output of the live stream to WAV files
+
+    tap() runs on the audio thread and only appends references to the
+    chunk bytes to a bounded deque (no lock, no I/O); a writer thread
+    drains it every poll_seconds and writes one batch per file. If the
+    writer falls behind by more than max_pending chunks, new chunks are
+    dropped and counted instead of stalling the audio. sources picks the
+    sides to record: 'input' (before any processing), 'output' (what is
+    played) or both, each to its own <base>_<source> files.
+
+    Chunks are in the stream's sample_format (a name in
+    buffers.SAMPLE_FORMATS). 16 and 24-bit streams are written as they
+    are; the wave module only writes integer PCM, so float32 streams are
+    converted to 24-bit by the writer thread.
+    """
+    def __init__(self, base, sample_rate=44100, channels=1, sources=('output',), max_seconds=None,
+                 max_bytes=None, max_pending=512, poll_seconds=0.05, sample_format='int16'):
+        self.sources = tuple(sources)
+        for source in self.sources:
+            if source not in ('input', 'output'):
+                raise ValueError(f"Unknown recording source {source!r}")
+        directory = os.path.dirname(base)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.writers = {
+            source: RotatingWavWriter(f"{base}_{source}", sample_rate, channels, max_seconds, max_bytes)
+            for source in self.sources
+        }
+        self.set_stream(sample_rate, sample_format)
+        self.record_input = 'input' in self.sources
+        self.record_output = 'output' in self.sources
+        self.max_pending = max_pending
+        self.poll_seconds = poll_seconds
+        # (input bytes or None, output bytes or None) per chunk, oldest first
+        self.pending = deque()
+        self.dropped = 0
+        self.chunks = 0
+        self.error = None
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @property
+    def paths(self):
+        """Every file written so far"""
+        return [path for writer in self.writers.values() for path in writer.paths]
+
+    def set_stream(self, sample_rate, sample_format):
+        """Rate and sample format of the chunks to come, once negotiated; only before the first tap"""
+        self.format = SAMPLE_FORMATS[sample_format]
+        self.file_format = SAMPLE_FORMATS['int24' if self.format.dtype.kind == 'f' else sample_format]
+        for writer in self.writers.values():
+            writer.configure(sample_rate, self.file_format.width)
+
+    def tap(self, raw_in, raw_out):
+        """Queue one chunk of each recorded side; never blocks"""
+        if len(self.pending) >= self.max_pending or self.error is not None:
+            self.dropped += 1
+            return
+        self.pending.append((raw_in if self.record_input else None,
+                             raw_out if self.record_output else None))
+
+    def drain(self):
+        """Write everything queued so far, one batch per file"""
+        count = len(self.pending)
+        if not count:
+            return
+        batch = [self.pending.popleft() for _ in range(count)]
+        if self.record_input:
+            self.writers['input'].write(self.to_file(b''.join(chunk[0] for chunk in batch)))
+        if self.record_output:
+            self.writers['output'].write(self.to_file(b''.join(chunk[1] for chunk in batch)))
+        self.chunks += count
+
+    def to_file(self, data):
+        """Stream bytes converted to the sample format of the files"""
+        if self.file_format is self.format:
+            return data
+        return self.file_format.encode(self.format.decode(data))
+
+    def run(self):
+        """Writer thread: drain the queue until closed, then once more"""
+        try:
+            while self.running:
+                self.drain()
+                time.sleep(self.poll_seconds)
+            self.drain()
+        except OSError as e:
+            # Disk full, folder gone, ...: stop recording, keep the audio going
+            self.error = e
+            self.pending.clear()
+        finally:
+            for writer in self.writers.values():
+                writer.close()
+
+    def close(self, timeout=5.0):
+        """Finish writing what is queued and close the files"""
+        self.running = False
+        self.thread.join(timeout)
+        return self.paths
+
+    def summary(self):
+        """Log line describing the finished recording"""
+        if self.error is not None:
+            return f"✗ Gravação interrompida: {self.error}"
+        text = f"✓ Gravação salva ({len(self.paths)} arquivo(s)): {', '.join(self.paths)}"
+        if self.dropped:
+            text += f" ⚠ {self.dropped} chunks perdidos (disco lento)"
+        return text
+
+
+def recording_base(directory=RECORDINGS_DIR):
+    """Timestamped path prefix for a new recording in directory"""
+    return os.path.join(directory, time.strftime("gravacao_%Y%m%d_%H%M%S"))
@@ -0,0 +1,145 @@
+import pyaudio
+import numpy as np
+
+from buffers import SAMPLE_FORMATS, RingBuffer
+from metrics import AudioMetrics
+from multirate import Resampler
+
+
+class CallbackEngine:
+    """Capture and playback driven by PortAudio callbacks
+
+    The capture callback processes each chunk and pushes it into a ring
+    buffer, the playback callback pulls from it. Playback only starts once
+    the ring holds the jitter margin, so short stalls in either callback
+    (or in the Python thread that owns them) are absorbed instead of
+    turning into underruns.
+
+    Playback may run at another output_rate than the capture; processed
+    chunks are then resampled before they enter the ring, which holds
+    output-rate samples.
+
+    The ring holds the stream bytes as they are, so it works the same for
+    every sample format (a name in buffers.SAMPLE_FORMATS); silence is
+    all zero bytes in each of them.
+    """
+    def __init__(self, p, sample_rate=44100, chunk_size=512, jitter_chunks=2, ring_chunks=8,
+                 metrics=None, channels=1, output_rate=None, sample_format='int16'):
+        self.p = p
+        self.sample_rate = sample_rate
+        self.output_rate = sample_rate if output_rate is None else output_rate
+        self.chunk_size = chunk_size
+        self.channels = channels
+        self.format = SAMPLE_FORMATS[sample_format]
+        self.resampler = None
+        if self.output_rate != sample_rate:
+            self.resampler = Resampler(sample_rate, self.output_rate, channels)
+        # Chunk length once played
+        self.output_chunk_size = chunk_size * self.output_rate // sample_rate
+        # The ring holds interleaved stream bytes, so sizes are in bytes, not frames
+        self.frame_bytes = channels * self.format.width
+        self.jitter_margin = self.output_chunk_size * self.frame_bytes * jitter_chunks
+        self.ring = RingBuffer(self.output_chunk_size * self.frame_bytes * max(ring_chunks, jitter_chunks + 2),
+                               dtype=np.uint8)
+        self.out = np.zeros(self.output_chunk_size * self.frame_bytes, dtype=np.uint8)
+        self.process = None
+        self.primed = False
+        self.stream_in = None
+        self.stream_out = None
+        self.metrics = metrics if metrics is not None else AudioMetrics(sample_rate, chunk_size)
+        # Device latencies reported by PortAudio once the streams are open
+        self.device_latency = 0.0
+
+    def capture_callback(self, in_data, frame_count, time_info, status):
+        """Process captured audio and queue it for playback"""
+        if status:
+            self.metrics.record_status(status)
+        
+        data = self.process(in_data) if self.process else in_data
+        if self.resampler is not None:
+            data = self.resampler.process_bytes(data, self.format)
+        chunk = np.frombuffer(data, dtype=np.uint8)
+        if self.ring.write(chunk) < len(chunk):
+            # Playback is not keeping up, the newest samples were dropped
+            self.metrics.overflows += 1
+        return (None, pyaudio.paContinue)
+
+    def playback_callback(self, in_data, frame_count, time_info, status):
+        """Play queued audio, outputting silence until the jitter margin is filled"""
+        if status:
+            self.metrics.record_status(status)
+        
+        size = frame_count * self.frame_bytes
+        if len(self.out) != size:
+            self.out = np.zeros(size, dtype=np.uint8)
+
+        if not self.primed:
+            self.primed = self.ring.available >= self.jitter_margin
+
+        if self.primed:
+            read = self.ring.read_into(self.out)
+            if read < size:
+                # Underrun: pad with silence and wait for the margin again
+                self.out[read:] = 0
+                self.primed = False
+                self.metrics.underruns += 1
+        else:
+            self.out.fill(0)
+        
+        # Queue depth in frames, like the blocking loop reports it
+        queued = self.ring.available // self.frame_bytes
+        self.metrics.queue_depth = queued
+        self.metrics.latency = self.device_latency + (queued + frame_count) / self.output_rate
+
+        return (self.out.tobytes(), pyaudio.paContinue)
+
+    def start(self, input_device=None, output_device=None, process=None):
+        """Open both streams and start the callbacks"""
+        self.process = process
+        self.primed = False
+        self.ring.clear()
+        if self.resampler is not None:
+            self.resampler.reset()
+
+        self.stream_out = self.p.open(
+            format=self.format.pa_format,
+            channels=self.channels,
+            rate=self.output_rate,
+            output=True,
+            output_device_index=output_device,
+            frames_per_buffer=self.output_chunk_size,
+            stream_callback=self.playback_callback,
+            start=False
+        )
+        self.stream_in = self.p.open(
+            format=self.format.pa_format,
+            channels=self.channels,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=input_device,
+            frames_per_buffer=self.chunk_size,
+            stream_callback=self.capture_callback,
+            start=False
+        )
+
+        self.device_latency = (self.stream_in.get_input_latency()
+                               + self.stream_out.get_output_latency())
+        if self.resampler is not None:
+            self.device_latency += self.resampler.latency
+        
+        self.stream_out.start_stream()
+        self.stream_in.start_stream()
+
+    def is_active(self):
+        """Whether both callbacks are still running"""
+        return (self.stream_in is not None and self.stream_in.is_active()
+                and self.stream_out is not None and self.stream_out.is_active())
+
+    def stop(self):
+        """Stop and close both streams"""
+        for stream in (self.stream_in, self.stream_out):
+            if stream is not None:
+                stream.stop_stream()
+                stream.close()
+        self.stream_in = None
+        self.stream_out = None
@@ -1,11 +1,16 @@
 import pyaudio
 
+from pipeline import Pipeline
+
 class AudioPassthrough:
     def __init__(self, sample_rate=44100, chunk_size=512):
         self.sample_rate = sample_rate
         self.chunk_size = chunk_size
         self.running = False
         
+        # No stages: the captured bytes are handed back untouched
+        self.pipeline = Pipeline([], None)
+        
         # Initialize PyAudio
         self.p = pyaudio.PyAudio()
         
@@ -65,8 +70,8 @@ class AudioPassthrough:
                 # Read audio data from input
                 data = stream_in.read(self.chunk_size, exception_on_overflow=False)
                 
-                # Filter goes here
-                
+                # Filter goes here (stages added to the pipeline)
+                data = self.pipeline.process(data)
                 
                 # Output directly to speakers (no filtering)
                 stream_out.write(data)
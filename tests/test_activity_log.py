@@ -0,0 +1,95 @@
+import pytest
+
+import activity_log
+from activity_log import ActivityLog
+
+
+class Clock:
+    """Stand-in for the time module, advanced by hand"""
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1700000000.0 + self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(activity_log, 'time', clock)
+    return clock
+
+
+def messages(lines):
+    """Rendered lines without their timestamps"""
+    return [line.split('] ', 1)[1] for line in lines]
+
+
+def drain(log):
+    new_last, added = log.drain()
+    return (None if new_last is None else messages([new_last])[0]), messages(added)
+
+
+def test_repeats_in_one_batch_collapse(clock):
+    log = ActivityLog()
+    for message in ("a", "a", "a", "b"):
+        log.post(message)
+    assert drain(log) == (None, ["a (×3)", "b"])
+
+
+def test_repeat_of_the_shown_line_only_updates_it(clock):
+    log = ActivityLog()
+    log.post("a")
+    assert drain(log) == (None, ["a"])
+    log.post("a")
+    log.post("a")
+    assert drain(log) == ("a (×3)", [])
+    log.post("a")
+    log.post("b")
+    assert drain(log) == ("a (×4)", ["b"])
+    assert len(log.lines) == 2
+
+
+def test_updated_line_evicted_in_the_same_batch_is_not_reported(clock):
+    log = ActivityLog(max_lines=2)
+    log.post("a")
+    drain(log)
+    for message in ("a", "b", "c"):
+        log.post(message)
+    assert drain(log) == (None, ["b", "c"])
+
+
+def test_lines_added_and_evicted_in_one_batch_are_never_shown(clock):
+    log = ActivityLog(max_lines=3)
+    for number in range(5):
+        log.post(f"line {number}")
+    assert drain(log) == (None, ["line 2", "line 3", "line 4"])
+
+
+def test_flood_is_rate_limited_then_summarized(clock):
+    log = ActivityLog(max_per_second=5)
+    for number in range(20):
+        log.post(f"line {number}")
+    assert drain(log) == (None, [f"line {number}" for number in range(5)])
+
+    # No token left for the summary until the limiter refills
+    clock.now += 0.1
+    assert drain(log) == (None, [])
+    clock.now += 0.2
+    assert drain(log) == (None, ["… 15 mensagens suprimidas"])
+
+    # Repeats are never rate limited
+    clock.now += 1.0
+    for _ in range(10):
+        log.post("same")
+    assert drain(log)[1] == ["same (×10)"]
+
+
+def test_lines_dropped_by_the_queue_are_counted(clock):
+    log = ActivityLog(max_pending=10, max_per_second=100)
+    for number in range(30):
+        log.post(f"line {number}")
+    assert drain(log) == (None, ["… 20 mensagens suprimidas"] + [f"line {number}" for number in range(20, 30)])
@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+
+from analyzer import OverloadDetector
+
+RATE = 44100
+CHUNK = 512
+
+
+def noise(seconds, rms, seed=0):
+    return np.random.default_rng(seed).standard_normal(int(seconds * RATE)).astype(np.float32) * rms
+
+
+def tone(seconds, freq, amplitude):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def feed(detector, signal, chunk=CHUNK):
+    """Protection level and reason after every chunk of a mono signal"""
+    trace = []
+    for start in range(0, len(signal) - chunk + 1, chunk):
+        detector.analyze(signal[None, start:start + chunk])
+        trace.append((detector.protection, detector.reason))
+    return trace
+
+
+def test_steady_noise_never_triggers():
+    detector = OverloadDetector(RATE)
+    trace = feed(detector, noise(4.0, 300.0))
+    assert all(protection == 0.0 and reason is None for protection, reason in trace)
+    assert abs(detector.level_db - detector.baseline_db) < 3
+
+
+def test_spike_attacks_fast_and_releases_slowly():
+    detector = OverloadDetector(RATE)
+    feed(detector, noise(2.0, 100.0))
+    burst = feed(detector, noise(0.1, 10000.0, seed=1))
+    assert burst[0][1] == 'spike'
+    # 20 ms attack: most of the way up within the burst
+    assert burst[-1][0] > 0.9
+
+    after = feed(detector, noise(1.0, 100.0, seed=2))
+    levels = [protection for protection, reason in after]
+    assert all(a >= b for a, b in zip(levels, levels[1:]))
+    # 1.5 s release: a second later the protection has only partly faded
+    released = burst[-1][0] * math.exp(-len(after) * CHUNK / RATE / 1.5)
+    assert abs(levels[-1] - released) < 0.05
+
+
+def test_baseline_catches_up_with_a_louder_scene():
+    detector = OverloadDetector(RATE)
+    feed(detector, noise(2.0, 100.0))
+    louder = feed(detector, noise(8.0, 2000.0, seed=1))
+    assert louder[0][1] == 'spike'
+    # Once the baseline has followed, the same level is no longer a spike
+    assert all(reason is None for protection, reason in louder[-50:])
+    assert louder[-1][0] < 0.1
+
+
+def test_sustained_high_tone_triggers_after_tone_seconds():
+    detector = OverloadDetector(RATE)
+    feed(detector, noise(1.0, 300.0))
+    # Quiet enough not to be a spike: only the tonality counts
+    signal = tone(1.5, 4000.0, 300.0) + noise(1.5, 300.0, seed=1)
+    trace = feed(detector, signal)
+    first = next(index for index, (protection, reason) in enumerate(trace) if reason == 'tone')
+    assert all(reason is None for protection, reason in trace[:first])
+    # Needs 0.5 s of tonal frames
+    assert 0.45 <= first * CHUNK / RATE <= 0.65
+    assert abs(detector.tone_hz - 4000.0) < RATE / detector.frame_size
+    assert detector.protection > 0.9
+
+
+def test_low_tone_is_not_a_high_tone():
+    detector = OverloadDetector(RATE)
+    feed(detector, noise(1.0, 300.0))
+    trace = feed(detector, tone(1.5, 1000.0, 300.0) + noise(1.5, 300.0, seed=1))
+    assert all(reason is None for protection, reason in trace)
+
+
+def test_chunk_length_does_not_change_the_analysis():
+    signal = np.concatenate([noise(1.0, 100.0), noise(0.2, 8000.0, seed=1), noise(0.5, 100.0, seed=2)])
+    levels = []
+    for chunk in (256, 1024):
+        detector = OverloadDetector(RATE)
+        seen = set()
+        for start in range(0, len(signal) - 1024 + 1, 1024):
+            for offset in range(0, 1024, chunk):
+                detector.analyze(signal[None, start + offset:start + offset + chunk])
+                seen.add(detector.reason)
+        levels.append((detector.level_db, detector.baseline_db, seen))
+    assert levels[0][2] == levels[1][2] == {None, 'spike'}
+    np.testing.assert_allclose(levels[0][:2], levels[1][:2], rtol=1e-5)
@@ -0,0 +1,50 @@
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from batch import filter_file, make_processor, run_job
+
+
+def write_wav(path, samples, sample_rate=44100):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(samples.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.astype(np.int16).tobytes())
+
+
+def read_wav(path):
+    with wave.open(str(path), 'rb') as f:
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16).reshape(-1, f.getnchannels())
+
+
+def test_output_lines_up_with_the_input(tmp_path):
+    rng = np.random.default_rng(4)
+    # Not a whole number of chunks
+    samples = (rng.standard_normal((3000, 2)) * 8000).clip(-32768, 32767).astype(np.int16)
+    write_wav(tmp_path / "in.wav", samples)
+    filter_file(str(tmp_path / "in.wav"), str(tmp_path / "out.wav"), {'preset': 'fala'})
+    output = read_wav(tmp_path / "out.wav")
+
+    # The same pipeline run live, with enough silence after to flush it
+    processor = make_processor(44100, 2, {'preset': 'fala'})
+    pipeline = processor.pipeline
+    assert pipeline.delay > 0
+    padded = np.concatenate([samples, np.zeros((2 * 512 - 3000 % 512 + 512, 2), dtype=np.int16)])
+    live = np.concatenate([np.frombuffer(pipeline.process(padded[i:i + 512].tobytes()), dtype=np.int16)
+                           for i in range(0, len(padded), 512)]).reshape(-1, 2)
+    processor.close()
+
+    assert output.shape == samples.shape
+    np.testing.assert_array_equal(output, live[pipeline.delay:pipeline.delay + len(samples)])
+
+
+@pytest.mark.parametrize('fmt', [b'fmt \x10\x00\x00\x00\x01\x00', b'fmt \x02\x00\x00\x00\x01\x00',
+                                 b'fmt \x10\x00\x00\x00' + struct.pack('<HHIIHH', 1, 0, 44100, 0, 0, 16)])
+def test_broken_header_is_reported_not_raised(tmp_path, fmt):
+    path = tmp_path / "broken.wav"
+    path.write_bytes(b'RIFF' + struct.pack('<I', 4 + len(fmt)) + b'WAVE' + fmt)
+    result = run_job((str(path), str(tmp_path / "out.wav"), {}))
+    assert 'error' in result
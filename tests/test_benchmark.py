@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import benchmark
+from benchmark import REGRESSION_FLOOR, find_regressions
+
+BASELINE = {'filter/512/2/48000/1': {'mean': 0.10, 'p99': 0.20, 'max': 0.40}}
+
+
+def result(**fractions):
+    return {'filter/512/2/48000/1': dict(BASELINE['filter/512/2/48000/1'], **fractions)}
+
+
+def test_changes_within_the_thresholds_pass():
+    # +20% mean, +45% p99, +190% max: all under the limits
+    assert find_regressions(result(mean=0.12, p99=0.29, max=1.16), BASELINE) == []
+
+
+@pytest.mark.parametrize('key, value', [('mean', 0.13), ('p99', 0.31), ('max', 1.21)])
+def test_each_threshold_flags_its_own_number(key, value):
+    regressions = find_regressions(result(**{key: value}), BASELINE)
+    assert len(regressions) == 1 and regressions[0].startswith(f"filter/512/2/48000/1 {key}:")
+
+
+def test_growth_below_the_floor_is_timer_noise():
+    baseline = {'loop/128/2/48000/1': {'mean': 0.001, 'p99': 0.002, 'max': 0.004}}
+    # Doubled, but by less than REGRESSION_FLOOR of the deadline
+    results = {'loop/128/2/48000/1': {'mean': 0.002, 'p99': 0.004, 'max': 0.004 + REGRESSION_FLOOR / 2}}
+    assert find_regressions(results, baseline) == []
+
+
+def test_cases_missing_from_the_baseline_are_skipped():
+    assert find_regressions({'loop/4096/8/96000/2': {'mean': 9.0, 'p99': 9.0, 'max': 9.0}}, BASELINE) == []
+
+
+def test_check_with_scaled_tolerance(tmp_path, monkeypatch):
+    path = tmp_path / 'baseline.json'
+    path.write_text(json.dumps(BASELINE))
+    monkeypatch.setattr(benchmark, 'run_sweep', lambda **grid: result(mean=0.13))
+    assert benchmark.main(['--check', str(path)]) == 1
+    assert benchmark.main(['--check', str(path), '--tolerance', '2']) == 0
+
+
+def test_check_against_a_baseline_without_these_cases_fails(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'baseline.json'
+    path.write_text(json.dumps({'loop/4096/8/96000/2': BASELINE['filter/512/2/48000/1']}))
+    monkeypatch.setattr(benchmark, 'run_sweep', lambda **grid: result())
+    assert benchmark.main(['--check', str(path)]) == 1
+    assert "FAIL" in capsys.readouterr().out
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from buffers import SAMPLE_FORMATS, RingBuffer
+
+
+def test_ring_buffer_wraps_around_in_order():
+    ring = RingBuffer(8)
+    out = np.zeros(5, dtype=np.int16)
+    expected = []
+    for start in range(0, 60, 5):
+        chunk = np.arange(start, start + 5, dtype=np.int16)
+        assert ring.write(chunk) == 5
+        expected.extend(chunk)
+        assert ring.read_into(out) == 5
+        assert out.tolist() == expected[:5]
+        del expected[:5]
+
+
+def test_ring_buffer_never_overwrites_unread_samples():
+    ring = RingBuffer(8)
+    assert ring.write(np.arange(6, dtype=np.int16)) == 6
+    # Only two slots free
+    assert ring.write(np.arange(6, 12, dtype=np.int16)) == 2
+    out = np.zeros(10, dtype=np.int16)
+    assert ring.read_into(out) == 8
+    assert out[:8].tolist() == list(range(8))
+    assert ring.available == 0 and ring.free == 8
+
+
+@pytest.mark.parametrize('name', list(SAMPLE_FORMATS))
+def test_sample_formats_round_trip_at_int16_scale(name):
+    sample_format = SAMPLE_FORMATS[name]
+    block = np.array([-32768.0, -1000.5, 0.0, 1234.0, 32767.0], dtype=np.float32)
+    data = sample_format.encode(block.copy())
+    assert len(data) == len(block) * sample_format.width
+    # int16 rounds to whole steps, the others keep more resolution
+    np.testing.assert_allclose(sample_format.decode(data), block, atol=1.0 if name == 'int16' else 1e-2)
+
+
+def test_over_full_scale_is_clipped_not_wrapped():
+    for sample_format in SAMPLE_FORMATS.values():
+        decoded = sample_format.decode(sample_format.encode(np.array([40000.0, -40000.0], dtype=np.float32)))
+        assert decoded[0] > 32760 and decoded[1] == -32768
@@ -0,0 +1,28 @@
+import numpy as np
+from scipy import signal
+
+from convolution import PartitionedConvolver, design_fir_from_response
+
+
+def test_matches_direct_convolution():
+    rng = np.random.default_rng(2)
+    impulse = rng.standard_normal(300).astype(np.float32)
+    samples = rng.standard_normal(1024).astype(np.float32)
+    engine = PartitionedConvolver(impulse, block_size=128)
+    output = np.concatenate([engine.process(samples[a:a + 256]) for a in range(0, 1024, 256)])
+    np.testing.assert_allclose(output, signal.lfilter(impulse, 1.0, samples)[:1024], atol=1e-3)
+
+
+def test_odd_chunk_lengths_are_delayed_not_rejected():
+    rng = np.random.default_rng(3)
+    impulse = design_fir_from_response([100, 1000, 4000], [0, -6, 0], 44100, numtaps=256)
+    samples = rng.standard_normal((2, 2048)).astype(np.float32)
+    expected = PartitionedConvolver(impulse, 2, block_size=128).process(samples)
+
+    engine = PartitionedConvolver(impulse, 2, block_size=128)
+    bounds = [0, 100, 101, 700, 1024, 2048]
+    output = np.concatenate([engine.process(samples[:, a:b]) for a, b in zip(bounds, bounds[1:])], axis=1)
+
+    delay = 127
+    assert output.shape == samples.shape
+    np.testing.assert_allclose(output[:, delay:], expected[:, :-delay], atol=1e-4)
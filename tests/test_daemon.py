@@ -0,0 +1,108 @@
+import os
+import socket
+import stat
+import threading
+
+import pytest
+
+import daemon as daemon_module
+from daemon import AudioDaemon, DaemonClient, DaemonError
+from processor import AudioProcessor
+
+
+@pytest.fixture
+def runtime(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def serve(fake_backend, runtime):
+    """Start a daemon on an address; yields a function doing so, stops them all after the test"""
+    daemons = []
+
+    def start(address=None):
+        daemon = AudioDaemon(AudioProcessor(backend=fake_backend), address)
+        daemon.log = lambda message: None
+        daemon.listen()
+        thread = threading.Thread(target=daemon.serve, daemon=True)
+        thread.start()
+        daemons.append((daemon, thread))
+        return daemon
+    yield start
+    for daemon, thread in daemons:
+        daemon.shutdown()
+        thread.join(5)
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="Unix sockets only")
+def test_unix_socket_is_private(serve, runtime):
+    daemon = serve()
+    assert os.path.dirname(daemon.address) == str(runtime)
+    assert stat.S_IMODE(os.stat(daemon.address).st_mode) == 0o600
+    client = DaemonClient(daemon.address)
+    assert client.call('ping') == 'pong'
+    client.close()
+
+
+def test_tcp_needs_the_token(serve):
+    daemon = serve(('127.0.0.1', 0))
+    assert stat.S_IMODE(os.stat(daemon.token_file).st_mode) == 0o600
+    client = DaemonClient(daemon.address)
+    assert client.call('ping') == 'pong'
+    client.close()
+
+    intruder = DaemonClient(daemon.address, token="guess")
+    with pytest.raises(DaemonError):
+        intruder.call('ping')
+    intruder.close()
+
+
+def test_non_json_lines_close_the_connection(serve):
+    daemon = serve(('127.0.0.1', 0))
+    with socket.create_connection(daemon.address, timeout=5) as sock:
+        # What a web page posting to the port would send first
+        sock.sendall(b'POST / HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n{"cmd": "shutdown"}\n')
+        assert sock.recv(1024) == b''
+    assert not daemon.stopped.is_set()
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason="POSIX permissions only")
+def test_shared_fallback_directory_is_refused(tmp_path, monkeypatch):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(daemon_module.tempfile, 'tempdir', str(tmp_path))
+    assert stat.S_IMODE(os.stat(daemon_module.runtime_dir()).st_mode) == 0o700
+    os.chmod(daemon_module.runtime_dir(), 0o777)
+    with pytest.raises(DaemonError):
+        daemon_module.runtime_dir()
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="Unix sockets only")
+def test_stale_socket_that_cannot_be_removed(fake_backend, runtime, monkeypatch):
+    path = os.path.join(runtime, "stale.sock")
+    open(path, 'w').close()
+
+    def refuse(path):
+        raise PermissionError(13, "Permission denied", path)
+    monkeypatch.setattr(daemon_module.os, 'unlink', refuse)
+    with pytest.raises(DaemonError):
+        AudioDaemon(AudioProcessor(backend=fake_backend), path).listen()
+
+
+@pytest.mark.parametrize('command, arguments', [
+    ('set_chunk_size', {'chunk_size': 0}),
+    ('set_chunk_size', {'chunk_size': -512}),
+    ('set_chunk_size', {'chunk_size': 'big'}),
+    ('set_auto_notches', {'count': -1}),
+    ('set_band', {'lowcut': 700, 'highcut': 1300, 'order': 2.5}),
+])
+def test_bad_values_get_an_error_reply(serve, command, arguments):
+    daemon = serve(('127.0.0.1', 0))
+    client = DaemonClient(daemon.address)
+    with pytest.raises(DaemonError):
+        client.call(command, **arguments)
+    # The daemon still answers, with its settings untouched
+    status = client.call('status')
+    assert status['chunk_size'] == 512 and status['auto_notches'] == 0
+    assert client.call('metrics')['deadline_ms'] > 0
+    client.close()
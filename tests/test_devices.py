@@ -0,0 +1,43 @@
+import pyaudio
+import pytest
+
+from devices import FakePyAudio, NullPyAudio, negotiate_format, negotiate_rates
+from processor import AudioProcessor
+
+
+def make_backend(input_info, output_info):
+    return FakePyAudio([("ALSA", [dict({'name': "Mic", 'maxInputChannels': 2}, **input_info),
+                                  dict({'name': "Speakers", 'maxOutputChannels': 2}, **output_info)])])
+
+
+def test_shared_native_rate_wins():
+    p = make_backend({'defaultSampleRate': 48000.0, 'supportedRates': (44100, 48000)},
+                     {'defaultSampleRate': 48000.0, 'supportedRates': (44100, 48000)})
+    assert negotiate_rates(p, 0, 1) == (48000, 48000)
+
+
+def test_no_common_rate_gives_each_side_its_own():
+    p = make_backend({'defaultSampleRate': 48000.0, 'supportedRates': (48000,)},
+                     {'defaultSampleRate': 44100.0, 'supportedRates': (44100,)})
+    assert negotiate_rates(p, 0, 1) == (48000, 44100)
+
+
+def test_rates_too_low_for_the_band_are_skipped():
+    p = make_backend({'defaultSampleRate': 16000.0, 'supportedRates': (16000, 44100)},
+                     {'defaultSampleRate': 16000.0, 'supportedRates': (16000, 44100)})
+    assert negotiate_rates(p, 0, 1, min_rate=2 * 12000) == (44100, 44100)
+
+
+def test_best_format_both_devices_support():
+    formats = (pyaudio.paInt16, pyaudio.paInt24)
+    p = make_backend({'supportedFormats': formats + (pyaudio.paFloat32,)}, {'supportedFormats': formats})
+    assert negotiate_format(p, 0, 1) == 'int24'
+    assert negotiate_format(make_backend({}, {}), 0, 1) == 'int16'
+
+
+def test_null_backend_lists_nothing_and_opens_nothing():
+    processor = AudioProcessor(backend=NullPyAudio)
+    assert processor.registry.devices == [] and processor.recommend_devices() == (None, None)
+    with pytest.raises(OSError):
+        processor.p.open(rate=48000, channels=1, format=pyaudio.paInt16, input=True)
+    processor.close()
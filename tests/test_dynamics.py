@@ -0,0 +1,33 @@
+import numpy as np
+
+from dynamics import Limiter
+
+
+def run(limiter, signal, chunk=512):
+    block = signal.astype(np.float32).copy()
+    for start in range(0, block.shape[1], chunk):
+        part = np.ascontiguousarray(block[:, start:start + chunk])
+        limiter.process_inplace(part)
+        block[:, start:start + chunk] = part
+    return block
+
+
+def test_peaks_stay_under_the_ceiling():
+    t = np.arange(44100) / 44100
+    # 6 dB over full scale, on one channel only
+    loud = np.vstack([65536 * np.sin(2 * np.pi * 440 * t), 1000 * np.sin(2 * np.pi * 880 * t)])
+    limiter = Limiter(44100, channels=2, threshold_db=-1.0)
+    output = run(limiter, loud)
+    ceiling = 32768 * 10 ** (-1.0 / 20)
+    assert np.abs(output).max() <= ceiling * 1.001
+    # Both channels get the same gain, so the quiet one is turned down too
+    assert np.abs(output[1, 22050:]).max() < 600
+
+
+def test_quiet_audio_only_gets_delayed():
+    rng = np.random.default_rng(5)
+    quiet = rng.standard_normal((1, 3000)) * 3000
+    limiter = Limiter(44100)
+    output = run(limiter, quiet)
+    delay = limiter.lookahead
+    np.testing.assert_allclose(output[:, delay:], quiet[:, :-delay], rtol=1e-5, atol=1e-2)
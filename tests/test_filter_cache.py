@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from filter_cache import FilterDesignCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FilterDesignCache(str(tmp_path))
+
+
+def test_designs_survive_a_new_cache(cache):
+    key = cache.make_key(700, 1300, 3, 44100, 'bandpass')
+    cache.put(key, np.arange(6, dtype=np.float32).reshape(1, 6))
+    np.testing.assert_array_equal(FilterDesignCache(cache.directory).get(key), cache.get(key))
+
+
+@pytest.mark.parametrize('contents', [b'', b'PK\x03\x04 truncated', b'not a zip file at all'])
+def test_corrupt_file_is_a_miss(cache, contents):
+    key = cache.make_key(700, 1300, 3, 44100, 'bandpass')
+    cache.put(key, np.ones((1, 6), dtype=np.float32))
+    with open(cache.path_for(key), 'wb') as f:
+        f.write(contents)
+    assert FilterDesignCache(cache.directory).get(key) is None
+
+
+def test_put_leaves_no_temporary_files(cache, tmp_path):
+    for order in (1, 2, 3):
+        cache.put(cache.make_key(700, 1300, order, 44100, 'bandpass'), np.ones((order, 6), dtype=np.float32))
+    assert sorted(p.name.startswith('bandpass') for p in tmp_path.iterdir()) == [True] * 3
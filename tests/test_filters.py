@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from filters import KERNEL_BLOCK, MAX_FILTER_ORDER, SOSFilter, design_bandpass_sos
+
+
+def test_chunked_filtering_matches_sosfilt():
+    rng = np.random.default_rng(0)
+    samples = rng.standard_normal(4 * KERNEL_BLOCK + 77).astype(np.float32) * 1000
+    sos = design_bandpass_sos(700.0, 1300.0, 44100, 4, cache=None)
+    expected = signal.sosfilt(sos.astype(np.float64), samples)
+
+    engine = SOSFilter(sos)
+    # Chunks shorter, longer and not a multiple of the kernel block
+    bounds = [0, 100, 100 + KERNEL_BLOCK, 2 * KERNEL_BLOCK + 300, len(samples)]
+    output = np.concatenate([engine.process(samples[a:b]) for a, b in zip(bounds, bounds[1:])])
+    np.testing.assert_allclose(output, expected, atol=1e-3 * np.abs(expected).max())
+
+
+def test_channels_keep_separate_state():
+    rng = np.random.default_rng(1)
+    block = rng.standard_normal((2, 600)).astype(np.float32)
+    stereo = SOSFilter.bandpass(300.0, 3000.0, 44100, 3, channels=2).process(block.copy())
+    for channel in range(2):
+        mono = SOSFilter.bandpass(300.0, 3000.0, 44100, 3).process(block[channel].copy())
+        np.testing.assert_allclose(stereo[channel], mono, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize('order', [0, MAX_FILTER_ORDER + 1])
+def test_order_out_of_range_is_rejected(order):
+    with pytest.raises(ValueError):
+        design_bandpass_sos(700.0, 1300.0, 44100, order, cache=None)
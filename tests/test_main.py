@@ -0,0 +1,15 @@
+import threading
+
+import main
+from processor import AudioProcessor
+
+
+def test_cli_runs_the_processor_until_it_stops(fake_backend, capsys):
+    processor = AudioProcessor(filter_order=2, backend=fake_backend)
+    threading.Timer(0.5, processor.stop).start()
+    main.run_filter(processor, 0, 1)
+    processor.close()
+
+    out = capsys.readouterr().out
+    assert "FILTER iniciado" in out and "Filter stopped" in out
+    assert processor.get_metrics()['chunks'] > 0
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from buffers import SAMPLE_FORMATS
+from meters import LevelMeter, SharedLevelMeter, SharedSpectrumMeter, SpectrumMeter
+
+RATE = 48000
+
+
+def sine(freq, frames, amplitude=32767.0, channels=1):
+    t = np.arange(frames) / RATE
+    mono = (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+    return np.repeat(mono[:, None], channels, axis=1)
+
+
+@pytest.mark.parametrize('name', sorted(SAMPLE_FORMATS))
+def test_levels_are_relative_to_full_scale_in_every_format(name):
+    sample_format = SAMPLE_FORMATS[name]
+    meter = LevelMeter()
+    raw_in = sample_format.encode(sine(1000.0, 4800))
+    raw_out = sample_format.encode(sine(1000.0, 4800, amplitude=3277.0))
+    meter.update(raw_in, raw_out, gain_reduction_db=-3.0, sample_format=sample_format)
+
+    values = meter.snapshot()
+    assert values['chunks'] == 1 and values['gain_reduction_db'] == -3.0
+    assert abs(values['input_rms'] - 0.5 ** 0.5) < 1e-3 and abs(values['input_peak'] - 1.0) < 1e-3
+    assert abs(values['output_rms'] - 0.1 * 0.5 ** 0.5) < 1e-3 and abs(values['output_peak'] - 0.1) < 1e-3
+
+
+def test_most_negative_sample_does_not_overflow_the_peak():
+    meter = LevelMeter()
+    raw = np.array([0, -32768, 100], dtype=np.int16).tobytes()
+    meter.update(raw, raw)
+    assert meter.snapshot()['input_peak'] == 1.0
+
+
+def test_spectrum_shows_a_tone_in_its_band():
+    meter = SpectrumMeter(RATE)
+    raw_in = SAMPLE_FORMATS['int16'].encode(sine(1000.0, 1024, channels=2))
+    raw_out = SAMPLE_FORMATS['int16'].encode(sine(1000.0, 1024, amplitude=328.0, channels=2))
+    meter.update(raw_in, raw_out, channels=2)
+
+    sequence, input_db, output_db = meter.snapshot()
+    band = np.searchsorted(meter.edges, 1000.0) - 1
+    assert sequence == 1
+    assert abs(input_db[band] + 0.0) < 2.0 and abs(output_db[band] + 40.0) < 2.0
+    # Far from the tone only window leakage is left
+    assert input_db[meter.centres > 8000.0].max() < -60.0
+
+
+def test_spectrum_is_published_every_interval_chunks():
+    meter = SpectrumMeter(RATE, rate=30.0)
+    raw = SAMPLE_FORMATS['int16'].encode(sine(1000.0, 256))
+    for _ in range(50):
+        meter.update(raw, raw)
+    # 48000 / (256 * 30) rounds to one publish every 6 chunks
+    assert meter.interval == 6
+    assert meter.snapshot()[0] == 9
+
+
+def test_spectrum_follows_a_new_sample_rate():
+    meter = SpectrumMeter(44100)
+    meter.set_sample_rate(RATE)
+    meter.update(*[SAMPLE_FORMATS['int16'].encode(sine(1000.0, 1024))] * 2)
+    assert meter.edges[-1] == RATE / 2
+    assert meter.snapshot()[1].argmax() == np.searchsorted(meter.edges, 1000.0) - 1
+
+
+def test_shared_meters_are_visible_from_another_handle():
+    level, spectrum = SharedLevelMeter(), SharedSpectrumMeter(sample_rate=RATE)
+    reader_level, reader_spectrum = SharedLevelMeter(level.name), SharedSpectrumMeter(spectrum.name, RATE)
+    try:
+        raw = SAMPLE_FORMATS['int16'].encode(sine(1000.0, 1024))
+        level.update(raw, raw)
+        spectrum.update(raw, raw)
+        assert reader_level.snapshot() == level.snapshot()
+        sequence, input_db, output_db = reader_spectrum.snapshot()
+        assert sequence == 1
+        np.testing.assert_array_equal(input_db, spectrum.snapshot()[1])
+    finally:
+        reader_level.close()
+        reader_spectrum.close()
+        level.close(unlink=True)
+        spectrum.close(unlink=True)
@@ -0,0 +1,60 @@
+import numpy as np
+
+from multirate import MultirateBandpass, Resampler
+
+
+def test_odd_chunk_lengths_match_whole_blocks_delayed():
+    rng = np.random.default_rng(1)
+    samples = rng.standard_normal((2, 4096)).astype(np.float32)
+
+    reference = MultirateBandpass(700, 1300, 44100, 3, channels=2, chunk_size=512)
+    expected = np.concatenate([reference.process(samples[:, a:a + 512]) for a in range(0, 4096, 512)], axis=1)
+
+    engine = MultirateBandpass(700, 1300, 44100, 3, channels=2, chunk_size=512)
+    assert engine.factor > 1
+    bounds = [0, 441, 441 + 7, 2000, 2512, 4096]
+    output = np.concatenate([engine.process(samples[:, a:b]) for a, b in zip(bounds, bounds[1:])], axis=1)
+
+    delay = engine.factor - 1
+    assert output.shape == samples.shape
+    assert engine.latency == reference.latency + delay
+    np.testing.assert_allclose(output[:, delay:], expected[:, :-delay], atol=1e-4)
+    assert not output[:, :delay].any()
+
+
+def test_large_chunks_match_small_ones_with_a_fixed_matrix():
+    rng = np.random.default_rng(3)
+    samples = rng.standard_normal((2, 8192 + 520)).astype(np.float32)
+
+    reference = MultirateBandpass(700, 1300, 48000, 3, channels=2, chunk_size=8)
+    expected = np.concatenate([reference.process(samples[:, a:a + 8]) for a in range(0, samples.shape[1], 8)], axis=1)
+
+    engine = MultirateBandpass(700, 1300, 48000, 3, channels=2, chunk_size=8192)
+    assert engine.factor == reference.factor
+    sizes = (engine.decimator.matrix.shape, engine.interpolator.matrix.shape)
+    # 520 leaves a short last sub-block
+    output = np.concatenate([engine.process(samples[:, :8192]), engine.process(samples[:, 8192:])], axis=1)
+    np.testing.assert_allclose(output, expected, atol=1e-4)
+    assert (engine.decimator.matrix.shape, engine.interpolator.matrix.shape) == sizes
+    assert engine.decimator.matrix.nbytes < 1 << 20
+
+
+def test_resampler_chunks_match_one_pass():
+    rng = np.random.default_rng(8)
+    samples = rng.standard_normal((2, 48000 // 4)).astype(np.float32)
+    whole = Resampler(48000, 44100, channels=2).process(samples)
+
+    resampler = Resampler(48000, 44100, channels=2)
+    bounds = [0, 512, 1000, 1001, 7000, samples.shape[1]]
+    chunked = np.concatenate([resampler.process(samples[:, a:b]) for a, b in zip(bounds, bounds[1:])], axis=1)
+    assert chunked.shape == whole.shape
+    assert abs(whole.shape[1] - samples.shape[1] * 44100 / 48000) <= 1
+    np.testing.assert_allclose(chunked, whole, atol=1e-5)
+
+
+def test_resampler_keeps_a_tone_in_the_passband():
+    t = np.arange(48000) / 48000
+    tone = np.sin(2 * np.pi * 1000 * t)[None, :].astype(np.float32)
+    out = Resampler(48000, 44100).process(tone)[0, 4410:]
+    spectrum = np.abs(np.fft.rfft(out * np.hanning(len(out))))
+    assert abs(np.argmax(spectrum) * 44100 / len(out) - 1000) < 5
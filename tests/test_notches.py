@@ -0,0 +1,38 @@
+import numpy as np
+
+from notches import AdaptiveNotchBank
+
+
+def tone_level(signal, freq, sample_rate=44100):
+    t = np.arange(signal.shape[-1]) / sample_rate
+    return abs(np.mean(signal * np.exp(-2j * np.pi * freq * t)))
+
+
+def test_steady_tone_is_found_and_notched():
+    rng = np.random.default_rng(6)
+    sample_rate = 44100
+    t = np.arange(3 * sample_rate) / sample_rate
+    signal = (8000 * np.sin(2 * np.pi * 3150 * t) + 300 * rng.standard_normal(len(t))).astype(np.float32)
+    bank = AdaptiveNotchBank(sample_rate, channels=1, max_notches=2)
+    block = signal[None, :].copy()
+    for start in range(0, block.shape[1], 512):
+        part = np.ascontiguousarray(block[:, start:start + 512])
+        bank.process_inplace(part)
+        block[:, start:start + 512] = part
+
+    assert any(abs(freq - 3150) < 20 for freq in bank.freqs)
+    last_second = slice(2 * sample_rate, None)
+    assert tone_level(block[0, last_second], 3150) < 0.01 * tone_level(signal[last_second], 3150)
+
+
+def test_no_tone_leaves_the_audio_alone():
+    rng = np.random.default_rng(7)
+    noise = (1000 * rng.standard_normal((2, 44100))).astype(np.float32)
+    bank = AdaptiveNotchBank(44100, channels=2)
+    block = noise.copy()
+    for start in range(0, block.shape[1], 512):
+        part = np.ascontiguousarray(block[:, start:start + 512])
+        bank.process_inplace(part)
+        block[:, start:start + 512] = part
+    assert len(bank.freqs) == 0
+    np.testing.assert_array_equal(block, noise)
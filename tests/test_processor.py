@@ -0,0 +1,193 @@
+import time
+
+import numpy as np
+import pytest
+
+from autotune import JitterDevice
+from daemon import AudioDaemon, DaemonError
+from devices import FakePyAudio
+from processor import AudioProcessor
+
+HOST_APIS = [("Windows WASAPI", [{'name': "Mic", 'maxInputChannels': 2},
+                                 {'name': "Speakers", 'maxOutputChannels': 2}])]
+
+
+def simulated_card(rate, channels, frames):
+    return JitterDevice(rate, channels, frames, spike_rate=0.0)
+
+
+class NoDeviceProcessor(AudioProcessor):
+    """Processor whose streams fail to open, also in the child process"""
+    def __init__(self, **settings):
+        super().__init__(backend=FakePyAudio.factory([]), **settings)
+
+
+class SimulatedProcessor(AudioProcessor):
+    """Processor on a simulated card, also in the child process"""
+    def __init__(self, **settings):
+        super().__init__(backend=FakePyAudio.factory(HOST_APIS, device=simulated_card), **settings)
+
+
+def bandpass_order(processor):
+    return next(stage.filter.order for stage in processor.pipeline.stages
+                if getattr(stage, 'name', '').endswith('bandpass'))
+
+
+@pytest.fixture
+def processor(fake_backend):
+    p = AudioProcessor(backend=fake_backend)
+    yield p
+    p.stop()
+
+
+def test_invalid_retune_keeps_the_current_band(processor):
+    processor.set_mode('filter')
+    with pytest.raises(ValueError):
+        processor.retune(700, 1300, 12)
+    assert (processor.lowcut, processor.highcut, processor.filter_order) == (700, 1300, 3)
+
+    # Later changes still work
+    processor.set_gain(6.0)
+    assert bandpass_order(processor) == 3
+    processor.retune(300, 3400, 4)
+    assert bandpass_order(processor) == 4
+
+
+def test_invalid_band_while_running_keeps_the_stream(processor):
+    processor.start(0, 1, 'filter', lambda message: None)
+    with pytest.raises(ValueError):
+        processor.retune(700, 30000)
+    assert processor.running and processor.highcut == 1300
+    time.sleep(0.2)
+    assert processor.running
+
+
+def test_daemon_rejects_bad_settings(processor):
+    daemon = AudioDaemon(processor, address=('127.0.0.1', 0))
+    with pytest.raises(DaemonError):
+        daemon.handle('set_band', lowcut=700, highcut=1300, order=12)
+    with pytest.raises(DaemonError):
+        daemon.handle('configure', channels=2, stream_mode='polling')
+    with pytest.raises(DaemonError):
+        daemon.handle('configure', multirate=1)
+    assert processor.channels == 1 and processor.filter_order == 3
+
+    daemon.handle('configure', channels=2, multirate=True)
+    assert processor.channels == 2 and processor.multirate
+
+
+def test_failed_setup_stops_cleanly(processor, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("no metrics")
+    monkeypatch.setattr(processor.metrics, 'configure', broken)
+    messages = []
+    processor.process_audio(0, 1, 'filter', messages.append)
+    assert not processor.running
+    assert processor.registry.holds == 0
+    assert any("no metrics" in message for message in messages)
+
+
+def test_start_holds_the_registry_until_the_session_ends(processor, monkeypatch):
+    refreshes = []
+    original = processor.negotiate_rates
+
+    def negotiate_and_rescan(*args):
+        # A rescan racing the negotiation must not swap the PortAudio instance
+        refreshes.append(processor.registry.refresh())
+        return original(*args)
+    monkeypatch.setattr(processor, 'negotiate_rates', negotiate_and_rescan)
+    p = processor.p
+    processor.start(0, 1, 'filter', lambda message: None)
+    assert processor.p is p and refreshes == [False]
+    assert processor.registry.holds == 1
+    processor.stop()
+    assert processor.registry.holds == 0
+
+
+def test_running_is_set_when_start_returns(processor, monkeypatch):
+    spawned = []
+    # The audio thread has not run yet
+    monkeypatch.setattr(processor, 'process_audio', lambda *args: spawned.append(args))
+    processor.start(0, 1, 'filter', lambda message: None)
+    processor.processing_thread.join()
+    assert spawned and processor.running and processor.mode == 'filter'
+
+
+def test_stop_before_the_thread_runs_wins(processor):
+    processor.registry.hold()
+    processor.running = False
+    processor.process_audio(0, 1, 'filter', lambda message: None, held=True)
+    assert not processor.running and processor.registry.holds == 0
+    assert processor.stream_in is None
+
+
+def test_failed_start_releases_the_registry(processor, monkeypatch):
+    def broken(*args):
+        raise OSError("device gone")
+    monkeypatch.setattr(processor, 'negotiate_format', broken)
+    with pytest.raises(OSError):
+        processor.start(0, 1, 'filter', lambda message: None)
+    assert not processor.running and processor.devices is None
+    assert processor.registry.holds == 0
+
+
+def test_pipeline_built_before_a_resize_is_rebuilt(processor):
+    processor.set_mode('filter')
+    stale = processor.build_pipeline()
+    processor.set_chunk_size(256)
+    # A change published with the old buffers after the audio thread resized
+    processor.next_pipeline = stale
+
+    out = processor.process_chunk(np.zeros(256, dtype=np.int16).tobytes())
+    assert len(out) == 256 * 2
+    assert processor.pipeline is processor.next_pipeline is not stale
+    assert processor.pipeline.buffers is processor.buffers
+
+
+@pytest.mark.parametrize('size', [-5, 0, 100000, 256.5])
+def test_invalid_chunk_size_changes_nothing(processor, size):
+    buffers, pipeline = processor.buffers, processor.pipeline
+    with pytest.raises(ValueError):
+        processor.set_chunk_size(size)
+    assert processor.chunk_size == 512 and processor.next_chunk_size is None
+    assert processor.buffers is buffers and processor.pipeline is pipeline
+    assert processor.get_metrics()['deadline_ms'] > 0
+
+    processor.set_chunk_size(256)
+    assert processor.chunk_size == 256 and processor.buffers.chunk_size == 256
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_child_that_cannot_open_its_streams_ends_the_session():
+    processor = NoDeviceProcessor(isolation='process', native_rate=False, auto_format=False)
+    messages = []
+    processor.start(0, 1, 'filter', messages.append)
+    try:
+        assert wait_until(lambda: not processor.running)
+        assert any("no simulated device" in message for message in messages)
+    finally:
+        processor.close()
+
+
+def test_child_that_dies_ends_the_session():
+    processor = SimulatedProcessor(isolation='process', native_rate=False, auto_format=False)
+    messages = []
+    processor.start(0, 1, 'filter', messages.append)
+    try:
+        assert wait_until(lambda: processor.get_metrics().get('chunks', 0) > 0)
+        assert processor.running
+        processor.host.process.kill()
+        assert wait_until(lambda: not processor.running)
+        assert any("terminou inesperadamente" in message for message in messages)
+
+        # A new start replaces the dead child
+        processor.start(0, 1, 'filter', messages.append)
+        assert wait_until(lambda: processor.get_metrics().get('chunks', 0) > 0) and processor.running
+    finally:
+        processor.close()
@@ -0,0 +1,95 @@
+import wave
+
+import numpy as np
+import pytest
+
+from buffers import SAMPLE_FORMATS
+from recorder import AudioRecorder, RotatingWavWriter
+
+
+def frames(count, channels=2, seed=0):
+    return np.random.default_rng(seed).integers(-32768, 32767, (count, channels), dtype=np.int16)
+
+
+def write_in_pieces(writer, samples, pieces=(1, 333, 700, 4096)):
+    """Write samples in uneven pieces, so part boundaries fall mid-write"""
+    start = 0
+    for size in pieces * (len(samples) // sum(pieces) + 1):
+        if start >= len(samples):
+            break
+        writer.write(samples[start:start + size].tobytes())
+        start += size
+    writer.close()
+
+
+def read_parts(paths):
+    parts = []
+    for path in paths:
+        with wave.open(path, 'rb') as f:
+            parts.append((f.getnframes(), f.getframerate(), f.readframes(f.getnframes())))
+    return parts
+
+
+def test_parts_rotate_by_duration(tmp_path):
+    samples = frames(2500)
+    writer = RotatingWavWriter(str(tmp_path / "rec"), 1000, 2, max_seconds=1.0)
+    write_in_pieces(writer, samples)
+
+    assert writer.paths == [str(tmp_path / f"rec_{part:03d}.wav") for part in (1, 2, 3)]
+    parts = read_parts(writer.paths)
+    assert [count for count, rate, data in parts] == [1000, 1000, 500]
+    assert all(rate == 1000 for count, rate, data in parts)
+    assert b''.join(data for count, rate, data in parts) == samples.tobytes()
+
+
+def test_parts_rotate_by_size_on_whole_frames(tmp_path):
+    samples = frames(1000)
+    # 1001 bytes hold 250 stereo 16-bit frames
+    writer = RotatingWavWriter(str(tmp_path / "rec"), 1000, 2, max_bytes=1001)
+    write_in_pieces(writer, samples)
+
+    parts = read_parts(writer.paths)
+    assert [count for count, rate, data in parts] == [250] * 4
+    assert b''.join(data for count, rate, data in parts) == samples.tobytes()
+
+
+@pytest.mark.parametrize('max_seconds, max_bytes, part_frames', [(1.0, 2000, 500), (0.2, 2000, 200)])
+def test_the_tighter_limit_wins(tmp_path, max_seconds, max_bytes, part_frames):
+    writer = RotatingWavWriter(str(tmp_path / "rec"), 1000, 2, max_seconds=max_seconds, max_bytes=max_bytes)
+    write_in_pieces(writer, frames(1000))
+    assert all(count == part_frames for count, rate, data in read_parts(writer.paths))
+
+
+def test_no_limit_writes_one_unnumbered_file(tmp_path):
+    writer = RotatingWavWriter(str(tmp_path / "rec"), 1000, 2)
+    write_in_pieces(writer, frames(5000))
+    assert writer.paths == [str(tmp_path / "rec.wav")]
+    assert read_parts(writer.paths)[0][0] == 5000
+
+
+def test_24_bit_parts_hold_the_same_duration(tmp_path):
+    writer = RotatingWavWriter(str(tmp_path / "rec"), 1000, 2, max_seconds=0.5, sample_width=3)
+    writer.write(bytes(1000 * 2 * 3))
+    writer.close()
+    with wave.open(writer.paths[0], 'rb') as f:
+        assert f.getsampwidth() == 3 and f.getnframes() == 500
+    assert len(writer.paths) == 2
+
+
+def test_float_streams_are_recorded_as_24_bit(tmp_path):
+    float32 = SAMPLE_FORMATS['float32']
+    recorder = AudioRecorder(str(tmp_path / "rec"), sample_rate=1000, channels=1, sources=('input', 'output'),
+                             max_seconds=0.5, sample_format='float32')
+    block = np.linspace(-16384, 16384, 256, dtype=np.float32)[:, None]
+    for _ in range(4):
+        recorder.tap(float32.encode(block.copy()), float32.encode(block * 0.5))
+    paths = recorder.close()
+
+    assert sorted(paths) == sorted(str(tmp_path / f"rec_{source}_{part:03d}.wav")
+                                   for source in ('input', 'output') for part in (1, 2, 3))
+    assert recorder.chunks == 4 and recorder.dropped == 0
+    with wave.open(str(tmp_path / "rec_input_001.wav"), 'rb') as f:
+        assert f.getsampwidth() == 3 and f.getnframes() == 500
+        samples = SAMPLE_FORMATS['int24'].decode(f.readframes(256))
+    np.testing.assert_allclose(samples, block[:, 0], atol=1)
+    assert "6 arquivo(s)" in recorder.summary()